@@ -7,6 +7,7 @@ from flask import Flask
 from flask_cors import CORS
 
 from .config import get_settings
+from .db import ensure_indexes
 from .routes import api_blueprint
 from .scheduler import init_scheduler
 
@@ -22,6 +23,11 @@ def create_app() -> Flask:
 
     app.register_blueprint(api_blueprint, url_prefix="/api")
 
+    try:
+        ensure_indexes()
+    except Exception as exc:
+        print(f"WARNING: Could not create indexes: {exc}")
+
     scheduler = init_scheduler(app)
 
     @app.route("/health", methods=["GET"])
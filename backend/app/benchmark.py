@@ -0,0 +1,195 @@
+from __future__ import annotations
+
+import argparse
+import time
+from typing import Any, Callable
+
+import numpy as np
+import pandas as pd
+
+from .seed import CITIES, generate_readings
+
+
+def _timeit(func: Callable[[], Any], repeat: int) -> dict[str, float]:
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - started) * 1000)
+    return {
+        "median_ms": round(float(np.median(samples)), 3),
+        "p95_ms": round(float(np.percentile(samples, 95)), 3),
+    }
+
+
+def _synthetic_frame(days: int, interval: int) -> pd.DataFrame:
+    df = pd.DataFrame(generate_readings(days=days, interval_minutes=interval))
+    df["timestamp"] = pd.to_datetime(df["timestamp"])
+    df["hour"] = df["timestamp"].dt.hour
+    df["dayofweek"] = df["timestamp"].dt.dayofweek
+    return pd.get_dummies(df, columns=["city"], drop_first=True)
+
+
+def bench_intervals(days: int, interval: int, repeat: int) -> dict[str, Any]:
+    from sklearn.ensemble import RandomForestRegressor
+
+    from .services.intervals import per_tree_predictions, predict_with_intervals
+    from .services.model import build_horizon_frame
+
+    df = _synthetic_frame(days, interval)
+    features = df.drop(
+        columns=["state", "color", "category", "health", "timestamp", "aqi"],
+        errors="ignore",
+    )
+    model = RandomForestRegressor(n_estimators=300, max_depth=14, random_state=42, n_jobs=-1)
+    model.fit(features, df["aqi"])
+
+    baseline = dict(CITIES[0], pm25=45.0, pm10=80.0, co2=550.0, no2=30.0,
+                    temperature=31.0, humidity=55.0, timestamp=pd.Timestamp.now(tz="UTC"))
+    future, _ = build_horizon_frame(baseline, features.columns.tolist())
+    per_tree_predictions(model, future)  # warm the leaf table
+
+    return {
+        "training_records": int(len(df)),
+        "trees": len(model.estimators_),
+        "point_only": _timeit(lambda: model.predict(future), repeat),
+        "with_intervals": _timeit(lambda: predict_with_intervals(model, future), repeat),
+        "per_estimator_loop": _timeit(
+            lambda: np.stack([tree.predict(future.to_numpy()) for tree in model.estimators_]),
+            repeat,
+        ),
+    }
+
+
+def bench_backends(days: int, interval: int, repeat: int) -> dict[str, Any]:
+    import tempfile
+    from pathlib import Path
+
+    from .services.backends import BACKENDS
+
+    df = _synthetic_frame(days, interval)
+    features = df.drop(
+        columns=["state", "color", "category", "health", "timestamp", "aqi"],
+        errors="ignore",
+    )
+    target = df["aqi"]
+    sample = features.tail(48)
+
+    report: dict[str, Any] = {"training_records": int(len(df))}
+    with tempfile.TemporaryDirectory() as tmp:
+        models_dir = Path(tmp)
+        for name, backend in BACKENDS.items():
+            if not backend.available():
+                report[name] = "unavailable"
+                continue
+            started = time.perf_counter()
+            model, metrics = backend.fit(features, target)
+            fit_seconds = time.perf_counter() - started
+            backend.save(model, features.columns.tolist(), metrics, models_dir)
+            report[name] = {
+                "fit_seconds": round(fit_seconds, 3),
+                "predict": _timeit(lambda: backend.predict(model, sample), repeat),
+                "artifact_bytes": backend.artifact_bytes(models_dir),
+            }
+    return report
+
+
+def bench_out_of_core(days: int, interval: int, repeat: int) -> dict[str, Any]:
+    import tracemalloc
+
+    from .db import get_collection
+    from .services.backends import BACKENDS
+    from .services.training_data import columns_to_features, iter_reading_chunks, training_cities
+
+    readings = get_collection("readings")
+    report: dict[str, Any] = {}
+    for history_days in (days, days * 4):
+        readings.drop()
+        readings.insert_many(generate_readings(days=history_days, interval_minutes=interval))
+        cities = training_cities()
+
+        def chunks():
+            for columns in iter_reading_chunks(cities=cities, chunk_size=2000):
+                yield columns_to_features(columns, cities)
+
+        row = {}
+        for name in ("lr", "hgb"):
+            tracemalloc.start()
+            started = time.perf_counter()
+            BACKENDS[name].fit_chunks(chunks)
+            elapsed = time.perf_counter() - started
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            row[name] = {"fit_seconds": round(elapsed, 3), "peak_mib": round(peak / 2**20, 2)}
+        report[f"{history_days}d ({readings.count_documents({})} rows)"] = row
+    return report
+
+
+def bench_storage(days: int, interval: int, repeat: int) -> dict[str, Any]:
+    import tempfile
+    from datetime import timedelta
+    from pathlib import Path
+
+    from .columnar import ColumnarCollection
+    from .mock_db import MockCollection
+    from .services.training_data import CLEAN_FILTER
+    from .sqlite_db import SqliteClient
+
+    documents = generate_readings(days=days, interval_minutes=interval)
+    city = CITIES[0]["city"]
+    newest = max(document["timestamp"] for document in documents)
+    day = {"$gte": newest - timedelta(days=1), "$lt": newest}
+    latest = [{"$match": CLEAN_FILTER}, {"$sort": {"city": 1, "timestamp": -1}},
+              {"$group": {"_id": "$city", "doc": {"$first": "$$ROOT"}}}]
+
+    report: dict[str, Any] = {"records": len(documents)}
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "bench.db"
+        stores = {
+            "mock": lambda: MockCollection("readings", []),
+            "columnar": lambda: ColumnarCollection("readings"),
+            "sqlite": lambda: SqliteClient(path)["bench"]["readings"],
+        }
+        for name, make in stores.items():
+            collection = make()
+            started = time.perf_counter()
+            collection.insert_many([dict(document) for document in documents])
+            row: dict[str, Any] = {"insert_many_s": round(time.perf_counter() - started, 3)}
+            row["history"] = _timeit(
+                lambda: list(collection.find({"city": city, "timestamp": day}).sort("timestamp", -1).limit(200)),
+                repeat,
+            )
+            row["count_range"] = _timeit(lambda: collection.count_documents({"city": city, "timestamp": day}), repeat)
+            row["latest_per_city"] = _timeit(lambda: list(collection.aggregate(latest)), repeat)
+            if name == "sqlite":
+                row["file_mib"] = round(sum(file.stat().st_size for file in Path(tmp).iterdir()) / 2**20, 2)
+            report[name] = row
+    return report
+
+
+SUITES: dict[str, Callable[..., dict[str, Any]]] = {
+    "backends": bench_backends,
+    "out_of_core": bench_out_of_core,
+    "storage": bench_storage,
+    "intervals": bench_intervals,
+}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Run AeroSense micro-benchmarks.")
+    parser.add_argument("suite", choices=sorted(SUITES) + ["all"], help="Benchmark to run.")
+    parser.add_argument("--days", type=int, default=7, help="Days of synthetic data.")
+    parser.add_argument("--interval", type=int, default=60, help="Minutes between readings.")
+    parser.add_argument("--repeat", type=int, default=20, help="Timed repetitions.")
+    args = parser.parse_args()
+
+    names = sorted(SUITES) if args.suite == "all" else [args.suite]
+    for name in names:
+        result = SUITES[name](days=args.days, interval=args.interval, repeat=args.repeat)
+        print(f"[{name}]")
+        for key, value in result.items():
+            print(f"  {key}: {value}")
+
+
+if __name__ == "__main__":
+    main()
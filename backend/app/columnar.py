@@ -0,0 +1,638 @@
+from __future__ import annotations
+
+import threading
+from datetime import datetime, timedelta
+from typing import Any, Iterable, Iterator, Mapping
+
+import numpy as np
+from bson import ObjectId
+
+from .mock_db import (
+    _MISSING,
+    MockCursor,
+    _apply_projection,
+    _apply_update,
+    _condition_matches,
+    _matches,
+    _normalize,
+    _upsert_document,
+)
+
+DEFAULT_BLOCK_SIZE = 16_384
+
+_EPOCH = datetime(1970, 1, 1)
+_INT64_MIN = np.iinfo(np.int64).min
+_EXACT_FLOAT_INT = 2**53
+_NO_OID = np.void(b"\x00" * 12)
+_MATERIALIZE_BATCH = 1_024
+
+# Storage dtype and missing-value sentinel for each column kind. Ints share the
+# float64 layout and are converted back when a row is materialized.
+_LAYOUT: dict[str, tuple[Any, Any]] = {
+    "float": (np.float64, np.nan),
+    "int": (np.float64, np.nan),
+    "time": (np.int64, _INT64_MIN),
+    "str": (np.int32, -1),
+    "bool": (np.int8, -1),
+    "oid": ("V12", _NO_OID),
+}
+
+
+class _Unsupported(Exception):
+    """A filter or sort the vectorized path does not cover"""
+
+
+def _kind(value: Any) -> str | None:
+    if isinstance(value, (bool, np.bool_)):
+        return "bool"
+    if isinstance(value, (int, np.integer)):
+        return "int" if abs(int(value)) < _EXACT_FLOAT_INT else None
+    if isinstance(value, (float, np.floating)):
+        return "float"
+    if isinstance(value, str):
+        return "str"
+    if isinstance(value, datetime):
+        return "time"
+    if isinstance(value, ObjectId):
+        return "oid"
+    return None
+
+
+_TYPE_KINDS = {bool: "bool", int: "int", float: "float", str: "str", datetime: "time", ObjectId: "oid"}
+
+
+def _time_ns(value: datetime) -> int:
+    return (value - _EPOCH) // timedelta(microseconds=1) * 1_000
+
+
+class _Partition:
+    """Every row of one city: per-field lists of fixed-size blocks plus rare per-row extras"""
+
+    __slots__ = ("key", "size", "blocks", "extras", "cache", "deleted")
+
+    def __init__(self, key: Any) -> None:
+        self.key = key
+        self.size = 0
+        self.blocks: dict[str, list[np.ndarray]] = {}
+        # Values that do not fit their column (lists, None, mismatched types).
+        self.extras: dict[int, dict[str, Any]] = {}
+        self.cache: dict[str, np.ndarray] = {}
+        # Rows removed since the last compaction; None until the first delete.
+        self.deleted: np.ndarray | None = None
+
+
+class ColumnarCollection:
+    """Readings stored column-wise per city with interned strings, behind the collection API"""
+
+    def __init__(self, name: str, block_size: int = DEFAULT_BLOCK_SIZE) -> None:
+        self.name = name
+        self.block_size = block_size
+        self._lock = threading.RLock()
+        self._partitions: dict[Any, _Partition] = {}
+        self._kinds: dict[str, str] = {}
+        self._codes: dict[str, int] = {}
+        self._strings: list[str] = []
+        self._string_array = np.empty(0, dtype=object)
+
+    def _intern(self, value: str) -> int:
+        code = self._codes.get(value)
+        if code is None:
+            code = self._codes[value] = len(self._strings)
+            self._strings.append(value)
+        return code
+
+    def _lookup(self) -> np.ndarray:
+        if len(self._string_array) != len(self._strings):
+            self._string_array = np.array(self._strings + [None], dtype=object)[:-1]
+        return self._string_array
+
+    def _encode(self, kind: str, value: Any) -> Any:
+        if kind == "time":
+            return _time_ns(value)
+        if kind == "str":
+            return self._intern(value)
+        if kind == "oid":
+            return np.void(value.binary)
+        if kind == "bool":
+            return int(value)
+        return float(value)
+
+    def _accepts(self, key: str, kind: str | None) -> bool:
+        """Whether a value of `kind` can live in the column, widening int columns to float"""
+        current = self._kinds.get(key)
+        if kind is None:
+            return False
+        if current is None:
+            self._kinds[key] = kind
+            return True
+        if current == "int" and kind == "float":
+            self._kinds[key] = "float"
+            return True
+        return current == kind or (current == "float" and kind == "int")
+
+    def _ensure_capacity(self, partition: _Partition, rows: int) -> None:
+        for field in partition.blocks:
+            self._grow(partition, field, rows)
+
+    def _grow(self, partition: _Partition, field: str, rows: int) -> None:
+        blocks = partition.blocks.setdefault(field, [])
+        dtype, missing = _LAYOUT[self._kinds[field]]
+        while len(blocks) * self.block_size < rows:
+            blocks.append(np.full(self.block_size, missing, dtype=dtype))
+
+    def _set(self, partition: _Partition, field: str, row: int, value: Any) -> None:
+        if field not in partition.blocks:
+            self._grow(partition, field, max(partition.size, row + 1))
+        partition.blocks[field][row // self.block_size][row % self.block_size] = value
+
+    def _write(self, partition: _Partition, row: int, doc: Mapping[str, Any]) -> None:
+        for key, value in doc.items():
+            if key == "city":
+                continue
+            value = _normalize(value)
+            kind = _kind(value)
+            if self._accepts(key, kind):
+                self._set(partition, key, row, self._encode(self._kinds[key], value))
+            else:
+                partition.extras.setdefault(row, {})[key] = value
+
+    def _encode_many(self, kind: str, values: list[Any]) -> np.ndarray:
+        if kind == "time":
+            return np.array(values, dtype="datetime64[us]").astype("datetime64[ns]").view(np.int64)
+        if kind == "str":
+            return np.fromiter((self._intern(value) for value in values), dtype=np.int32, count=len(values))
+        if kind == "oid":
+            return np.array([value.binary for value in values], dtype="V12")
+        return np.array(values, dtype=_LAYOUT[kind][0])
+
+    def _uniform(self, field: str, values: list[Any]) -> str | None:
+        """The column kind when every present value shares one type that fits the column"""
+        types = set(map(type, values)) - {object}
+        kinds = {_TYPE_KINDS.get(kind_type) for kind_type in types}
+        if kinds == {"float", "int"}:
+            kinds = {"float"}
+        if len(kinds) != 1 or None in kinds:
+            return None
+        kind = kinds.pop()
+        return kind if self._accepts(field, kind) else None
+
+    def _append(self, partition: _Partition, docs: list[dict[str, Any]]) -> None:
+        """Write a batch column by column, encoding each field with one array conversion"""
+        start = partition.size
+        partition.size = start + len(docs)
+        self._ensure_capacity(partition, partition.size)
+        if partition.deleted is not None:
+            partition.deleted = np.r_[partition.deleted, np.zeros(len(docs), dtype=bool)]
+        for field in dict.fromkeys(key for doc in docs for key in doc):
+            if field == "city":
+                continue
+            column = [doc.get(field, _MISSING) for doc in docs]
+            kind = self._uniform(field, column)
+            if kind is not None:
+                offsets = [offset for offset, value in enumerate(column) if value is not _MISSING]
+                values = column if len(offsets) == len(column) else [column[offset] for offset in offsets]
+                if kind == "time":
+                    values = [_normalize(value) for value in values]
+                elif kind == "int" and max(map(abs, values)) >= _EXACT_FLOAT_INT:
+                    kind = None
+            if kind is None:
+                offsets, values = [], []
+                for offset, value in enumerate(column):
+                    if value is _MISSING:
+                        continue
+                    value = _normalize(value)
+                    if self._accepts(field, _kind(value)):
+                        offsets.append(offset)
+                        values.append(value)
+                    else:
+                        partition.extras.setdefault(start + offset, {})[field] = value
+            if not values:
+                continue
+            self._grow(partition, field, partition.size)
+            encoded = self._encode_many(self._kinds[field], values)
+            positions = start + np.array(offsets)
+            blocks = positions // self.block_size
+            for block in np.unique(blocks):
+                owned = blocks == block
+                partition.blocks[field][block][positions[owned] % self.block_size] = encoded[owned]
+        partition.cache.clear()
+
+    def _column(self, partition: _Partition, field: str) -> np.ndarray | None:
+        """The first `size` values of a field as one array, cached until the next write"""
+        if field not in partition.blocks:
+            return None
+        cached = partition.cache.get(field)
+        if cached is None or len(cached) != partition.size:
+            cached = np.concatenate(partition.blocks[field])[: partition.size]
+            partition.cache[field] = cached
+        return cached
+
+    def _missing(self, field: str, values: np.ndarray) -> np.ndarray:
+        kind = self._kinds[field]
+        if kind in ("float", "int"):
+            return np.isnan(values)
+        return values == _LAYOUT[kind][1]
+
+    def _compact(self, partition: _Partition, keep: np.ndarray) -> None:
+        """Swap in a copy of the partition holding only the kept rows"""
+        # Open cursors keep reading the old partition, so their row positions stay valid.
+        if partition.deleted is not None:
+            keep = keep & ~partition.deleted
+        compacted = _Partition(partition.key)
+        positions = np.cumsum(keep) - 1
+        compacted.size = int(keep.sum())
+        for field in partition.blocks:
+            values = self._column(partition, field)[keep]
+            dtype, missing = _LAYOUT[self._kinds[field]]
+            blocks = compacted.blocks[field] = []
+            for start in range(0, max(compacted.size, 1), self.block_size):
+                block = np.full(self.block_size, missing, dtype=dtype)
+                chunk = values[start:start + self.block_size]
+                block[: len(chunk)] = chunk
+                blocks.append(block)
+        compacted.extras = {int(positions[row]): extra for row, extra in partition.extras.items() if keep[row]}
+        self._partitions[partition.key] = compacted
+
+    def _delete(self, partition: _Partition, rows: np.ndarray) -> None:
+        """Tombstone rows, compacting at once only when most of the partition is gone"""
+        if partition.deleted is None:
+            partition.deleted = np.zeros(partition.size, dtype=bool)
+        partition.deleted[rows] = True
+        # Smaller deletes wait for `compact()`, so batched deletes stay cheap.
+        if partition.deleted.sum() * 2 >= partition.size:
+            self._compact(partition, np.ones(partition.size, dtype=bool))
+
+    def _docs(self, partition: _Partition, rows: np.ndarray, fields: set[str] | None = None) -> list[dict[str, Any]]:
+        """Dicts for the given rows, decoding each column once for the whole batch"""
+        decoded: list[tuple[str, list[Any], list[bool]]] = []
+        for field in partition.blocks:
+            if fields is not None and field not in fields:
+                continue
+            values = self._column(partition, field)[rows]
+            missing = self._missing(field, values)
+            kind = self._kinds[field]
+            if kind == "time":
+                python = np.where(missing, 0, values).astype("datetime64[ns]").astype("datetime64[us]").astype(object).tolist()
+            elif kind == "str":
+                python = self._lookup()[np.where(missing, 0, values)].tolist() if len(self._strings) else []
+            elif kind == "oid":
+                python = [ObjectId(value) for value in values.tolist()]
+            elif kind == "bool":
+                python = (values == 1).tolist()
+            elif kind == "int":
+                python = [int(value) if value == value else None for value in values.tolist()]
+            else:
+                python = values.tolist()
+            decoded.append((field, python, missing.tolist()))
+
+        include_city = partition.key is not _MISSING and (fields is None or "city" in fields)
+        docs = []
+        for position, row in enumerate(rows.tolist()):
+            doc: dict[str, Any] = {}
+            for field, python, missing in decoded:
+                if not missing[position]:
+                    doc[field] = python[position]
+                if field == "_id" and include_city:
+                    doc["city"] = partition.key
+            if include_city and "city" not in doc:
+                doc["city"] = partition.key
+            extra = partition.extras.get(row)
+            if extra:
+                doc.update(extra if fields is None else {k: v for k, v in extra.items() if k in fields})
+            docs.append(doc)
+        return docs
+
+    def _operand_mask(self, field: str, values: np.ndarray, missing: np.ndarray, operand: Any) -> np.ndarray:
+        kind = self._kinds[field]
+        operand_kind = _kind(operand)
+        if operand_kind is None or not (operand_kind == kind or {operand_kind, kind} <= {"int", "float"}):
+            return np.zeros(len(values), dtype=bool)
+        if kind == "str":
+            code = self._codes.get(operand)
+            return values == code if code is not None else np.zeros(len(values), dtype=bool)
+        return ~missing & (values == self._encode(kind, operand))
+
+    def _isin_mask(self, field: str, values: np.ndarray, missing: np.ndarray, operands: list[Any]) -> np.ndarray:
+        """One set-membership pass over the column instead of a scan per operand"""
+        kind = self._kinds[field]
+        if kind == "str":
+            codes = [self._codes[value] for value in operands if isinstance(value, str) and value in self._codes]
+            return np.isin(values, np.array(codes, dtype=np.int32))
+        accepted = [
+            value for value in operands
+            if _kind(value) == kind or {_kind(value), kind} <= {"int", "float"}
+        ]
+        if not accepted:
+            return np.zeros(len(values), dtype=bool)
+        if kind == "oid":
+            # Raw 12-byte keys compare as fixed-width bytes, which numpy can sort and search.
+            wanted = np.array([value.binary for value in accepted], dtype="V12").view("S12")
+            return ~missing & np.isin(values.view("S12"), wanted)
+        return ~missing & np.isin(values, np.array([self._encode(kind, value) for value in accepted]))
+
+    def _condition_mask(self, partition: _Partition, field: str, condition: Any) -> np.ndarray:
+        values = self._column(partition, field)
+        if values is None:
+            # No row stores this field in a column: every row is "missing".
+            return np.array([_condition_matches(_MISSING, condition)] * partition.size, dtype=bool)
+        missing = self._missing(field, values)
+        if not (isinstance(condition, dict) and condition and all(key.startswith("$") for key in condition)):
+            condition = {"$eq": condition}
+
+        result = np.ones(partition.size, dtype=bool)
+        for op, operand in condition.items():
+            operand = _normalize(operand)
+            if op == "$exists":
+                result &= ~missing if operand else missing
+            elif op in ("$eq", "$ne"):
+                hit = self._operand_mask(field, values, missing, operand)
+                result &= hit if op == "$eq" else ~hit
+            elif op in ("$in", "$nin"):
+                hit = self._isin_mask(field, values, missing, [_normalize(value) for value in operand])
+                result &= hit if op == "$in" else ~hit
+            elif op in ("$gt", "$gte", "$lt", "$lte"):
+                kind, operand_kind = self._kinds[field], _kind(operand)
+                if not (operand_kind == kind or {operand_kind, kind} <= {"int", "float"}) or kind in ("oid", "bool"):
+                    result &= False
+                    continue
+                if kind == "str":
+                    left = self._lookup()[np.where(missing, 0, values)]
+                    right = operand
+                else:
+                    left, right = values, self._encode(kind, operand)
+                compare = {"$gt": np.greater, "$gte": np.greater_equal, "$lt": np.less, "$lte": np.less_equal}[op]
+                result &= ~missing & compare(left, right).astype(bool)
+            else:
+                raise _Unsupported(op)
+        return result
+
+    def _mask(self, partition: _Partition, filter: Mapping[str, Any]) -> np.ndarray:
+        mask = np.ones(partition.size, dtype=bool)
+        for field, condition in filter.items():
+            condition = _normalize(condition)
+            try:
+                if field.startswith("$") or "." in field:
+                    raise _Unsupported(field)
+                field_mask = self._condition_mask(partition, field, condition)
+                for row, extra in partition.extras.items():
+                    if field in extra:
+                        field_mask[row] = _condition_matches(extra[field], condition)
+            except _Unsupported:
+                docs = self._docs(partition, np.arange(partition.size))
+                field_mask = np.array([_matches(doc, {field: condition}) for doc in docs], dtype=bool)
+            mask &= field_mask
+            if not mask.any():
+                break
+        return mask
+
+    def _select(self, filter: Mapping[str, Any] | None) -> list[tuple[_Partition, np.ndarray]]:
+        filter = dict(filter or {})
+        city = filter.pop("city", _MISSING)
+        selection = []
+        for key, partition in self._partitions.items():
+            if not partition.size:
+                continue
+            if city is not _MISSING and not _condition_matches(key, _normalize(city)):
+                continue
+            rows = np.flatnonzero(self._mask(partition, filter)) if filter else np.arange(partition.size)
+            if partition.deleted is not None:
+                rows = rows[~partition.deleted[rows]]
+            if len(rows):
+                selection.append((partition, rows))
+        return selection
+
+    def _sort_keys(self, partition: _Partition, rows: np.ndarray, field: str) -> np.ndarray:
+        kind = self._kinds.get(field)
+        if kind not in ("time", "float", "int") or any(field in extra for extra in partition.extras.values()):
+            raise _Unsupported(field)
+        values = self._column(partition, field)
+        if values is None:
+            return np.full(len(rows), -np.inf)
+        values = values[rows].astype(np.float64)
+        # Missing values sort first, as nulls do in MongoDB.
+        if kind == "time":
+            values[self._column(partition, field)[rows] == _INT64_MIN] = -np.inf
+        return np.where(np.isnan(values), -np.inf, values)
+
+    # -- collection API --------------------------------------------------
+
+    def find(self, filter: dict[str, Any] | None = None, projection: Mapping[str, Any] | None = None) -> ColumnarCursor:
+        with self._lock:
+            return ColumnarCursor(self, self._select(filter), projection)
+
+    def find_one(self, filter: dict[str, Any] | None = None, projection: Mapping[str, Any] | None = None) -> dict[str, Any] | None:
+        return next(iter(self.find(filter, projection).limit(1)), None)
+
+    def distinct(self, key: str, filter: dict[str, Any] | None = None) -> list[Any]:
+        with self._lock:
+            selection = self._select(filter)
+            if key == "city":
+                return [partition.key for partition, _ in selection if partition.key is not _MISSING]
+            values: list[Any] = []
+            seen = set()
+            for partition, rows in selection:
+                for doc in self._docs(partition, rows, {key}):
+                    value = doc.get(key, _MISSING)
+                    if value is not _MISSING and value not in seen:
+                        seen.add(value)
+                        values.append(value)
+            return values
+
+    def count_documents(self, filter: dict[str, Any]) -> int:
+        with self._lock:
+            return sum(len(rows) for _, rows in self._select(filter))
+
+    def insert_one(self, document: dict[str, Any]) -> Any:
+        self.insert_many([document])
+
+        class InsertResult:
+            inserted_id = document["_id"]
+        return InsertResult()
+
+    def insert_many(self, documents: Iterable[dict[str, Any]], ordered: bool = True) -> Any:
+        documents = list(documents)
+        by_city: dict[Any, list[dict[str, Any]]] = {}
+        for document in documents:
+            if "_id" not in document:
+                document["_id"] = ObjectId()
+            by_city.setdefault(document.get("city", _MISSING), []).append(document)
+        with self._lock:
+            for city, docs in by_city.items():
+                partition = self._partitions.get(city)
+                if partition is None:
+                    partition = self._partitions[city] = _Partition(city)
+                self._append(partition, docs)
+
+        class InsertManyResult:
+            inserted_ids = [document["_id"] for document in documents]
+        return InsertManyResult()
+
+    def update_one(self, filter: dict[str, Any], update: dict[str, Any], upsert: bool = False) -> Any:
+        with self._lock:
+            selection = self._select(filter)
+            matched = int(bool(selection))
+            new_id = None
+            if selection:
+                partition, rows = selection[0]
+                row = rows[:1]
+                doc = self._docs(partition, row)[0]
+                _apply_update(doc, update, inserted=False)
+                if doc.get("city", _MISSING) == partition.key:
+                    for field in partition.blocks:
+                        self._set(partition, field, int(row[0]), _LAYOUT[self._kinds[field]][1])
+                    partition.extras.pop(int(row[0]), None)
+                    self._write(partition, int(row[0]), doc)
+                    partition.cache.clear()
+                else:
+                    self._delete(partition, row)
+                    self.insert_many([doc])
+            elif upsert:
+                doc = _upsert_document(filter)
+                _apply_update(doc, update, inserted=True)
+                new_id = self.insert_one(doc).inserted_id
+
+        class UpdateResult:
+            matched_count = matched
+            modified_count = matched
+            upserted_id = new_id
+        return UpdateResult()
+
+    def delete_many(self, filter: dict[str, Any]) -> Any:
+        removed = 0
+        with self._lock:
+            for partition, rows in self._select(filter):
+                removed += len(rows)
+                self._delete(partition, rows)
+
+        class DeleteResult:
+            deleted_count = removed
+        return DeleteResult()
+
+    def aggregate(self, pipeline: list[dict[str, Any]]) -> MockCursor:
+        """The latest-document-per-city pipeline, answered with one argmax per city"""
+        match = next((stage["$match"] for stage in pipeline if "$match" in stage), None)
+        result = []
+        with self._lock:
+            for partition, rows in self._select(match):
+                try:
+                    newest = rows[int(np.argmax(self._sort_keys(partition, rows, "timestamp")))]
+                except _Unsupported:
+                    docs = self._docs(partition, rows)
+                    newest = rows[max(range(len(docs)), key=lambda index: str(docs[index].get("timestamp", "")))]
+                result.append({"_id": partition.key, "doc": self._docs(partition, np.array([newest]))[0]})
+        return MockCursor(result)
+
+    def drop(self) -> None:
+        with self._lock:
+            self._partitions.clear()
+
+    def compact(self) -> int:
+        """Reclaim tombstoned rows and drop empty partitions; returns the bytes freed"""
+        with self._lock:
+            before = self._memory_bytes()
+            for key, partition in list(self._partitions.items()):
+                if partition.deleted is not None:
+                    self._compact(partition, np.ones(partition.size, dtype=bool))
+                if not self._partitions[key].size:
+                    del self._partitions[key]
+            return before - self._memory_bytes()
+
+    def _memory_bytes(self) -> int:
+        return sum(
+            block.nbytes
+            for partition in self._partitions.values()
+            for blocks in partition.blocks.values()
+            for block in blocks
+        )
+
+    def memory_bytes(self) -> int:
+        with self._lock:
+            return self._memory_bytes()
+
+    def __len__(self) -> int:
+        return sum(
+            partition.size - (0 if partition.deleted is None else int(partition.deleted.sum()))
+            for partition in self._partitions.values()
+        )
+
+
+class ColumnarCursor:
+    """Row positions into a `ColumnarCollection`; rows become dicts only as they are iterated"""
+
+    def __init__(
+        self,
+        collection: ColumnarCollection,
+        selection: list[tuple[_Partition, np.ndarray]],
+        projection: Mapping[str, Any] | None = None,
+    ) -> None:
+        self._collection = collection
+        self._projection = projection
+        self._partitions = [partition for partition, _ in selection]
+        self._owners = np.concatenate(
+            [np.full(len(rows), index, dtype=np.int64) for index, (_, rows) in enumerate(selection)]
+        ) if selection else np.empty(0, dtype=np.int64)
+        self._rows = np.concatenate([rows for _, rows in selection]) if selection else np.empty(0, dtype=np.int64)
+        self._docs: list[dict[str, Any]] | None = None
+
+    def _fields(self) -> set[str] | None:
+        if not self._projection:
+            return None
+        fields = {key for key, value in self._projection.items() if value and key != "_id"}
+        if not fields:
+            return None
+        return fields | ({"_id"} if self._projection.get("_id", 1) else set())
+
+    def _materialize(self, owners: np.ndarray, rows: np.ndarray) -> list[dict[str, Any]]:
+        fields = self._fields()
+        docs: list[dict[str, Any]] = []
+        # Consecutive rows from the same city are decoded together.
+        edges = np.flatnonzero(np.r_[True, owners[1:] != owners[:-1], True])
+        for start, end in zip(edges[:-1], edges[1:]):
+            partition = self._partitions[owners[start]]
+            docs.extend(self._collection._docs(partition, rows[start:end], fields))
+        return [_apply_projection(doc, self._projection) for doc in docs]
+
+    def sort(self, key_or_list: Any, direction: Any = None) -> ColumnarCursor:
+        if isinstance(key_or_list, (list, tuple)):
+            key_or_list, direction = key_or_list[0]
+        with self._collection._lock:
+            try:
+                keys = np.empty(len(self._rows))
+                for index, partition in enumerate(self._partitions):
+                    owned = self._owners == index
+                    keys[owned] = self._collection._sort_keys(partition, self._rows[owned], key_or_list)
+            except _Unsupported:
+                docs = self._materialize(self._owners, self._rows)
+                docs.sort(key=lambda doc: doc.get(key_or_list, 0), reverse=direction == -1)
+                self._docs = docs
+                return self
+        if direction == -1:
+            order = np.argsort(-keys, kind="stable")
+        else:
+            order = np.argsort(keys, kind="stable")
+        self._owners, self._rows = self._owners[order], self._rows[order]
+        return self
+
+    def limit(self, limit: int) -> ColumnarCursor:
+        if limit:
+            if self._docs is not None:
+                self._docs = self._docs[:limit]
+            self._owners, self._rows = self._owners[:limit], self._rows[:limit]
+        return self
+
+    def batch_size(self, batch_size: int) -> ColumnarCursor:
+        return self
+
+    def __iter__(self) -> Iterator[dict[str, Any]]:
+        if self._docs is not None:
+            yield from self._docs
+            return
+        for start in range(0, len(self._rows), _MATERIALIZE_BATCH):
+            with self._collection._lock:
+                docs = self._materialize(
+                    self._owners[start:start + _MATERIALIZE_BATCH], self._rows[start:start + _MATERIALIZE_BATCH]
+                )
+            yield from docs
+
+    def to_list(self, length: int | None = None) -> list[dict[str, Any]]:
+        return list(self)
@@ -22,17 +22,102 @@ class Settings(BaseSettings):
 
     mongo_uri: str = Field(default="mongodb://localhost:27017")
     mongo_db: str = Field(default="aerosense")
+    mongo_max_pool_size: int = Field(default=50)
+    mongo_min_pool_size: int = Field(default=0)
+    mongo_max_idle_time_ms: int = Field(default=60000)
+    mongo_wait_queue_timeout_ms: int = Field(default=5000)
+    mongo_server_selection_timeout_ms: int = Field(default=2000)
+    # "memory" keeps everything in process, "sqlite" persists to `sqlite_path`
+    # and "mongo" connects to `mongo_uri`.
+    storage_backend: str = Field(default="memory")
+    sqlite_path: Path = Field(default=Path("./data/aerosense.db"))
+    sqlite_batch_size: int = Field(default=5000)
+    # In-memory store: readings kept as typed column blocks per city instead of dicts.
+    columnar_store: bool = Field(default=True)
+    columnar_collections: list[str] = Field(default_factory=lambda: ["readings"])
+    columnar_block_size: int = Field(default=16384)
 
     models_dir: Path = Field(default=Path("./models"))
     model_filename: str = Field(default="rf_aqi_model.pkl")
+    ensemble_backends: list[str] = Field(default_factory=lambda: ["rf", "lr", "lstm"])
+    rf_n_estimators: int = Field(default=300)
+    rf_max_depth: int | None = Field(default=14)
+    hgb_max_iter: int = Field(default=200)
+    hgb_learning_rate: float = Field(default=0.1)
+    hgb_max_leaf_nodes: int = Field(default=31)
+    lstm_epochs: int = Field(default=20)
+    lstm_sequence_length: int = Field(default=24)
 
     retrain_interval_minutes: int = Field(default=30)
+    training_window: int = Field(default=1000)
+    training_chunk_size: int = Field(default=10000)
+    out_of_core_history_days: int = Field(default=90)
+    out_of_core_sample_rows: int = Field(default=200000)
+    histogram_max_bins: int = Field(default=64)
+    histogram_max_cells: int = Field(default=50000)
+    cv_folds: int = Field(default=4)
+    model_selection_budget_seconds: float = Field(default=120.0)
+    model_selection_workers: int = Field(default=0)
     refresh_latest_interval_seconds: int = Field(default=5)
     history_limit: int = Field(default=500)
+    downsample_source_limit: int = Field(default=50000)
+    export_chunk_size: int = Field(default=5000)
+    rollup_max_buckets: int = Field(default=5000)
+    rollup_flush_seconds: int = Field(default=60)
+    # Cold tier: clean readings older than this are sealed into compressed city-day blocks.
+    cold_after_days: int = Field(default=7)
+    cold_decimals: int = Field(default=2)
+    cold_compression_level: int = Field(default=6)
+    cold_seal_minutes: int = Field(default=60)
+    # Days to keep each collection (0 keeps it forever); rollups are kept per resolution.
+    retention_days: dict[str, int] = Field(
+        default_factory=lambda: {"readings": 30, "readings_cold": 365, "model_metrics": 90}
+    )
+    rollup_retention_days: dict[str, int] = Field(
+        default_factory=lambda: {"5m": 30, "1h": 365, "1d": 1825}
+    )
+    retention_interval_minutes: int = Field(default=60)
+    retention_batch_size: int = Field(default=500)
+    retention_max_batches: int = Field(default=200)
+    retention_pause_seconds: float = Field(default=0.05)
+    # Alerts close once every value falls below this fraction of its threshold.
+    alert_clear_ratio: float = Field(default=0.9)
+    alert_buffer_size: int = Field(default=100)
+    alert_retention_hours: int = Field(default=24)
+    alert_sweep_minutes: int = Field(default=15)
+    # Streaming sensor-fault detection at ingest.
+    anomaly_alpha: float = Field(default=0.05)
+    anomaly_z_threshold: float = Field(default=6.0)
+    anomaly_warmup: int = Field(default=30)
+    anomaly_stuck_count: int = Field(default=12)
+    # Clean readings replayed per city to rebuild its baseline after a restart.
+    anomaly_seed_readings: int = Field(default=200)
+    # Values outside these bounds are sensor faults, never real air quality.
+    anomaly_valid_ranges: dict[str, tuple[float, float]] = Field(
+        default={"pm25": (0.0, 1000.0), "pm10": (0.0, 2000.0), "co2": (0.0, 10000.0), "no2": (0.0, 2000.0)}
+    )
+    rolling_window: int = Field(default=12)
+    sse_heartbeat_seconds: float = Field(default=15.0)
+    sse_retry_ms: int = Field(default=3000)
+    # Deltas kept for Last-Event-ID resumes; older ids get the full snapshot.
+    sse_delta_log_size: int = Field(default=64)
+    response_cache_entries: int = Field(default=256)
+    response_compress_min_bytes: int = Field(default=512)
 
     telangana_geojson_path: Path = Field(
         default=Path("./data/geo/ts_ap_districts.geojson")
     )
+    # JSON list of alert rules; the built-in thresholds apply when it is missing.
+    alert_rules_path: Path | None = Field(default=Path("./data/alert_rules.json"))
+    # Simplification tolerances in degrees; clients pick one matching their zoom.
+    geojson_tolerances: list[float] = Field(default_factory=lambda: [0.0, 0.0005, 0.002, 0.01])
+    district_grid_size: int = Field(default=32)
+    # lon_min, lat_min, lon_max, lat_max covering Telangana and Andhra Pradesh
+    heatmap_bounds: list[float] = Field(default_factory=lambda: [76.7, 12.6, 84.8, 19.95])
+    heatmap_resolutions: list[int] = Field(default_factory=lambda: [64, 128, 256])
+    heatmap_neighbors: int = Field(default=8)
+    heatmap_power: float = Field(default=2.0)
+    nearby_max_results: int = Field(default=50)
 
 
 @lru_cache
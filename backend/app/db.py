@@ -3,9 +3,10 @@ from __future__ import annotations
 from functools import lru_cache
 from typing import Any
 
-from pymongo import MongoClient
+from pymongo import ASCENDING, DESCENDING, MongoClient
 from pymongo.collection import Collection
 from pymongo.database import Database
+from pymongo.errors import OperationFailure
 
 from .config import get_settings
 
@@ -13,7 +14,19 @@ from .config import get_settings
 @lru_cache
 def get_client() -> MongoClient[Any]:
     settings = get_settings()
-    # return MongoClient(settings.mongo_uri, serverSelectionTimeoutMS=2000)
+    if settings.storage_backend == "mongo":
+        return MongoClient(
+            settings.mongo_uri,
+            serverSelectionTimeoutMS=settings.mongo_server_selection_timeout_ms,
+            maxPoolSize=settings.mongo_max_pool_size,
+            minPoolSize=settings.mongo_min_pool_size,
+            maxIdleTimeMS=settings.mongo_max_idle_time_ms,
+            waitQueueTimeoutMS=settings.mongo_wait_queue_timeout_ms,
+        )
+    if settings.storage_backend == "sqlite":
+        from .sqlite_db import SqliteClient
+
+        return SqliteClient(settings.sqlite_path, batch_size=settings.sqlite_batch_size)
     # Fallback to Mock DB for this environment
     from .mock_db import MockClient
     print("WARNING: Using Mock Database")
@@ -31,9 +44,45 @@ def get_collection(name: str) -> Collection[Any]:
     return db[name]
 
 
-
-
-
-
-
-
+def alert_retention_seconds() -> int:
+    """How long a closed alert is kept, shared by the TTL index and the sweep job"""
+    return get_settings().alert_retention_hours * 3600
+
+
+def _indexes() -> dict[str, list[tuple[list[tuple[str, int]], dict[str, Any]]]]:
+    return {
+        # Serves latest-per-city ($sort + $group) and /history's find().sort().limit().
+        "readings": [
+            ([("city", ASCENDING), ("timestamp", DESCENDING)], {}),
+            ([("timestamp", DESCENDING)], {}),
+        ],
+        "readings_cold": [
+            ([("city", ASCENDING), ("day", ASCENDING)], {"unique": True}),
+            ([("city", ASCENDING), ("end", ASCENDING)], {}),
+        ],
+        # Closed alerts expire on their own; open ones have no closed_at and stay.
+        "alerts": [
+            ([("status", ASCENDING)], {}),
+            ([("timestamp", DESCENDING)], {}),
+            ([("closed_at", ASCENDING)], {"expireAfterSeconds": alert_retention_seconds()}),
+        ],
+        "rollups": [([("city", ASCENDING), ("resolution", ASCENDING), ("start", ASCENDING)], {"unique": True})],
+        "rollup_state": [([("city", ASCENDING)], {"unique": True})],
+        "model_metrics": [([("timestamp", DESCENDING)], {})],
+    }
+
+
+def ensure_indexes() -> None:
+    """Create the MongoDB indexes the read paths rely on; the embedded stores index themselves"""
+    if get_settings().storage_backend != "mongo":
+        return
+    db = get_database()
+    for name, indexes in _indexes().items():
+        for keys, options in indexes:
+            try:
+                db[name].create_index(keys, **options)
+            except OperationFailure:
+                if "expireAfterSeconds" not in options:
+                    raise
+                # A changed retention only needs the TTL updated in place.
+                db.command("collMod", name, index={"keyPattern": dict(keys), "expireAfterSeconds": options["expireAfterSeconds"]})
@@ -0,0 +1,40 @@
+from __future__ import annotations
+
+import argparse
+import sys
+
+from .services.export import EXPORT_COLUMNS, FORMATS, parquet_available, parse_columns, write_export
+from .services.readings import parse_time
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Stream readings to NDJSON, CSV or Parquet.")
+    parser.add_argument("--format", choices=sorted(FORMATS), default="ndjson", help="Output format.")
+    parser.add_argument("--city", help="Only export this city.")
+    # Parsed like the API's start/end, so offsets and "Z" are converted to stored UTC.
+    parser.add_argument("--start", type=parse_time, help="Inclusive ISO start time (UTC unless it has an offset).")
+    parser.add_argument("--end", type=parse_time, help="Exclusive ISO end time (UTC unless it has an offset).")
+    parser.add_argument(
+        "--columns", help=f"Comma-separated subset of: {', '.join(EXPORT_COLUMNS)}."
+    )
+    parser.add_argument("--output", help="Destination file (defaults to stdout).")
+    args = parser.parse_args()
+
+    if args.format == "parquet" and not parquet_available():
+        parser.error("Parquet export needs pyarrow installed.")
+    try:
+        columns = parse_columns(args.columns)
+    except ValueError as exc:
+        parser.error(str(exc))
+
+    options = {"city": args.city, "start": args.start, "end": args.end, "columns": columns}
+    if args.output:
+        with open(args.output, "wb") as output:
+            written = write_export(output, args.format, **options)
+        print(f"Wrote {written} bytes to {args.output}.", file=sys.stderr)
+    else:
+        write_export(sys.stdout.buffer, args.format, **options)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,19 +1,126 @@
 from __future__ import annotations
 
 import json
-from datetime import datetime
+from datetime import datetime, timezone
 from pathlib import Path
 from typing import Any, Generator, Iterable, Mapping
 
 from bson import ObjectId
 
 
+def _apply_projection(doc: dict[str, Any], projection: Mapping[str, Any] | None) -> dict[str, Any]:
+    if not projection:
+        return doc
+    include_id = projection.get("_id", 1)
+    fields = [key for key, value in projection.items() if value and key != "_id"]
+    if not fields:
+        return {key: value for key, value in doc.items() if projection.get(key, 1)}
+    projected = {key: doc[key] for key in fields if key in doc}
+    if include_id and "_id" in doc:
+        projected["_id"] = doc["_id"]
+    return projected
+
+
+def _normalize(value: Any) -> Any:
+    # Mirror a BSON round-trip: aware datetimes come back as naive UTC.
+    if isinstance(value, datetime) and value.tzinfo is not None:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+_MISSING = object()
+
+
+def _get_path(doc: dict[str, Any], path: str) -> Any:
+    value: Any = doc
+    for part in path.split("."):
+        if not isinstance(value, dict) or part not in value:
+            return _MISSING
+        value = value[part]
+    return value
+
+
+def _set_path(doc: dict[str, Any], path: str, value: Any) -> None:
+    *parents, leaf = path.split(".")
+    for part in parents:
+        doc = doc.setdefault(part, {})
+    doc[leaf] = value
+
+
+def _apply_update(doc: dict[str, Any], update: Mapping[str, Any], inserted: bool) -> None:
+    for op, fields in update.items():
+        for path, value in fields.items():
+            value = _normalize(value)
+            current = _get_path(doc, path)
+            if op == "$set" or (op == "$setOnInsert" and inserted):
+                _set_path(doc, path, value)
+            elif op == "$inc":
+                _set_path(doc, path, value if current is _MISSING else current + value)
+            elif op == "$min" and (current is _MISSING or value < current):
+                _set_path(doc, path, value)
+            elif op == "$max" and (current is _MISSING or value > current):
+                _set_path(doc, path, value)
+
+
+def _upsert_document(filter: Mapping[str, Any]) -> dict[str, Any]:
+    # Upserts start from the equality parts of the filter, like MongoDB.
+    return {
+        key: _normalize(value)
+        for key, value in filter.items()
+        if not (isinstance(value, dict) and any(k.startswith("$") for k in value))
+    }
+
+
+def _condition_matches(value: Any, condition: Any) -> bool:
+    if not (isinstance(condition, dict) and condition and all(k.startswith("$") for k in condition)):
+        return value is not _MISSING and value == condition
+
+    for op, operand in condition.items():
+        operand = _normalize(operand)
+        if op == "$exists":
+            if (value is not _MISSING) != bool(operand):
+                return False
+        elif op == "$ne":
+            if value is not _MISSING and value == operand:
+                return False
+        elif op == "$in":
+            if value is _MISSING or value not in operand:
+                return False
+        elif op == "$nin":
+            if value is not _MISSING and value in operand:
+                return False
+        else:
+            if value is _MISSING or value is None:
+                return False
+            try:
+                if op == "$gt" and not value > operand:
+                    return False
+                if op == "$gte" and not value >= operand:
+                    return False
+                if op == "$lt" and not value < operand:
+                    return False
+                if op == "$lte" and not value <= operand:
+                    return False
+            except TypeError:
+                return False
+    return True
+
+
+def _matches(doc: dict[str, Any], filter: Mapping[str, Any]) -> bool:
+    return all(
+        _condition_matches(doc.get(key, _MISSING), _normalize(condition))
+        for key, condition in filter.items()
+    )
+
+
 class MockCursor:
-    def __init__(self, data: list[dict[str, Any]]):
+    def __init__(self, data: list[dict[str, Any]], projection: Mapping[str, Any] | None = None):
         self._data = data
+        self._projection = projection
 
     def __iter__(self) -> Generator[dict[str, Any], None, None]:
-        yield from self._data
+        for doc in self._data:
+            yield _apply_projection(doc, self._projection)
 
     def sort(self, key_or_list: Any, direction: Any = None) -> MockCursor:
         # Basic sort support
@@ -27,8 +134,11 @@ class MockCursor:
         self._data = self._data[:limit]
         return self
     
+    def batch_size(self, batch_size: int) -> MockCursor:
+        return self
+
     def to_list(self, length: int | None = None) -> list[dict[str, Any]]:
-        return self._data
+        return list(self)
 
 
 class MockCollection:
@@ -36,24 +146,40 @@ class MockCollection:
         self.name = name
         self._data = data
 
-    def find(self, filter: dict[str, Any] | None = None) -> MockCursor:
+    def find(
+        self,
+        filter: dict[str, Any] | None = None,
+        projection: Mapping[str, Any] | None = None,
+    ) -> MockCursor:
         if not filter:
-            return MockCursor(list(self._data))
+            return MockCursor(list(self._data), projection)
         
-        result = []
+        result = [doc for doc in self._data if _matches(doc, filter)]
+        return MockCursor(result, projection)
+
+    def find_one(
+        self,
+        filter: dict[str, Any] | None = None,
+        projection: Mapping[str, Any] | None = None,
+    ) -> dict[str, Any] | None:
+        return next(iter(self.find(filter, projection).limit(1)), None)
+
+    def distinct(self, key: str, filter: dict[str, Any] | None = None) -> list[Any]:
+        values = []
+        seen = set()
         for doc in self._data:
-            match = True
-            for k, v in filter.items():
-                if doc.get(k) != v:
-                    match = False
-                    break
-            if match:
-                result.append(doc)
-        return MockCursor(result)
+            value = doc.get(key, _MISSING)
+            if value is _MISSING or value in seen or (filter and not _matches(doc, filter)):
+                continue
+            seen.add(value)
+            values.append(value)
+        return values
 
     def insert_one(self, document: dict[str, Any]) -> Any:
         if "_id" not in document:
             document["_id"] = ObjectId()
+        for key, value in document.items():
+            document[key] = _normalize(value)
         self._data.append(document)
         
         # Persist to file for continuity (optional, but good for "real" feel)
@@ -63,6 +189,43 @@ class MockCollection:
             inserted_id = document["_id"]
         return InsertResult()
 
+    def insert_many(self, documents: Iterable[dict[str, Any]], ordered: bool = True) -> Any:
+        ids = [self.insert_one(document).inserted_id for document in documents]
+
+        class InsertManyResult:
+            inserted_ids = ids
+        return InsertManyResult()
+
+    def update_one(self, filter: dict[str, Any], update: dict[str, Any], upsert: bool = False) -> Any:
+        doc = next((doc for doc in self._data if _matches(doc, filter)), None)
+        inserted = doc is None and upsert
+        if inserted:
+            doc = _upsert_document(filter)
+
+        if doc is not None:
+            _apply_update(doc, update, inserted)
+
+        matched = int(doc is not None and not inserted)
+        new_id = self.insert_one(doc).inserted_id if inserted else None
+
+        class UpdateResult:
+            matched_count = matched
+            modified_count = matched
+            upserted_id = new_id
+        return UpdateResult()
+
+    def delete_many(self, filter: dict[str, Any]) -> Any:
+        kept = [doc for doc in self._data if not _matches(doc, filter)]
+        removed = len(self._data) - len(kept)
+        self._data[:] = kept
+
+        class DeleteResult:
+            deleted_count = removed
+        return DeleteResult()
+
+    def drop(self) -> None:
+        self._data.clear()
+
     def count_documents(self, filter: dict[str, Any]) -> int:
         return len(list(self.find(filter)))
 
@@ -73,7 +236,10 @@ class MockCollection:
         # 1. Sort
         # We'll just take the latest for each city manually
         latest_by_city = {}
+        match = next((stage["$match"] for stage in pipeline if "$match" in stage), None)
         for doc in self._data:
+            if match and not _matches(doc, match):
+                continue
             city = doc.get("city")
             if not city:
                 continue
@@ -103,11 +269,26 @@ class MockCollection:
         result = [{"doc": doc} for doc in latest_by_city.values()]
         return MockCursor(result)
 
+    def compact(self) -> int:
+        # Deletes already rebuild the list, so there is nothing left to reclaim.
+        return 0
+
     def _save_to_file(self):
         # Simple persistence
         pass
 
 
+def _new_collection(name: str) -> Any:
+    from .config import get_settings
+
+    settings = get_settings()
+    if settings.columnar_store and name in settings.columnar_collections:
+        from .columnar import ColumnarCollection
+
+        return ColumnarCollection(name, block_size=settings.columnar_block_size)
+    return MockCollection(name, [])
+
+
 class MockDatabase:
     def __init__(self):
         self._collections: dict[str, MockCollection] = {}
@@ -116,7 +297,7 @@ class MockDatabase:
 
     def __getitem__(self, name: str) -> MockCollection:
         if name not in self._collections:
-            self._collections[name] = MockCollection(name, [])
+            self._collections[name] = _new_collection(name)
         return self._collections[name]
 
     def _seed_data(self):
@@ -133,7 +314,7 @@ class MockDatabase:
                 "no2": 20.0,
                 "temperature": 28.0,
                 "humidity": 60.0,
-                "timestamp": datetime.utcnow().isoformat()
+                "timestamp": datetime.utcnow()
             },
             {
                 "city": "Warangal",
@@ -146,10 +327,11 @@ class MockDatabase:
                 "no2": 15.0,
                 "temperature": 29.0,
                 "humidity": 55.0,
-                "timestamp": datetime.utcnow().isoformat()
+                "timestamp": datetime.utcnow()
             }
         ]
-        self._collections["readings"] = MockCollection("readings", readings)
+        self._collections["readings"] = _new_collection("readings")
+        self._collections["readings"].insert_many(readings)
 
 
 class MockClient:
@@ -159,3 +341,7 @@ class MockClient:
 
     def __getitem__(self, name: str) -> MockDatabase:
         return self._db
+
+    def compact(self) -> int:
+        """Reclaim space held by deleted documents in every collection; returns the bytes freed"""
+        return sum(collection.compact() for collection in list(self._db._collections.values()))
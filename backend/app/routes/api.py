@@ -1,68 +1,298 @@
 from __future__ import annotations
 
-from flask import Blueprint, jsonify, request
+import hashlib
+from typing import Any
 
-from ..services.alerts import get_recent_alerts
-from ..services.aqi import get_category_palette
+from flask import Blueprint, Response, jsonify, request, stream_with_context, url_for
+
+from ..config import get_settings
+from ..services import snapshot
+from ..services.alerts import evaluate_readings
+from ..services.cold_storage import ColdBlockError
+from ..services.districts import get_district_summaries
+from ..services.events import broadcaster, latest_payload, publish_snapshot
+from ..services.export import FORMATS, export_stream, parquet_available, parse_columns
+from ..services.geojson import simplified_variants
+from ..services.heatmap import (
+    aqi_grid,
+    encode_grid,
+    grid_shape,
+    located_readings,
+    nearest_resolution,
+    render_png,
+)
+from ..services.intervals import parse_quantiles
 from ..services.model import predict_next_24, train_model_if_needed
-from ..services.ml_models import predict_with_all_models, train_all_models
+from ..services.ml_models import (
+    artifacts_version,
+    predict_with_all_models,
+    train_all_models,
+    train_out_of_core,
+)
+from ..services.model_selection import train_with_cross_validation
+from ..services.rollups import RESOLUTIONS, get_rollups
+from ..services.stations import station_index
 from ..services.readings import (
     get_history,
     get_latest_cache,
     get_map_overlay,
-    save_reading,
+    parse_time,
+    save_readings,
 )
+from .responses import EncodedBody, dumps, encoded_response, response_cache
+
+settings = get_settings()
+
+# Immutable boundary variants keyed by content hash, encoded and compressed once.
+_geojson_bodies: dict[str, EncodedBody] = {}
+_geojson_levels: list[dict[str, Any]] | None = None
+
+
+def _snapshot_etag(since: int | None) -> str:
+    # Snapshot versions restart with the process, so an ETag can only be trusted
+    # while it does not claim a version we have not reached yet.
+    version = snapshot.current_version()
+    if since is None or since > version:
+        return str(version)
+    return f"{version}-{since}"
+
+
+def _conditional(etag: str, key: tuple, build, **options: Any):
+    if request.if_none_match.contains_weak(etag):
+        response = Response(status=304)
+    else:
+        response = encoded_response(response_cache.get(key, etag, build), **options)
+    response.set_etag(etag, weak=True)
+    response.headers["Cache-Control"] = "no-cache"
+    return response
+
+
+def _geojson_assets() -> list[dict[str, Any]]:
+    global _geojson_levels
+    if _geojson_levels is None:
+        levels = []
+        for level, (tolerance, collection) in enumerate(simplified_variants()):
+            data = dumps(collection)
+            digest = hashlib.sha256(data).hexdigest()[:20]
+            _geojson_bodies[digest] = EncodedBody(data, precompress=True)
+            levels.append({"level": level, "tolerance": tolerance, "hash": digest, "bytes": len(data)})
+        _geojson_levels = levels
+    return _geojson_levels
 
 
 def register_routes(bp: Blueprint) -> None:
     @bp.get("/latest")
     def latest():
-        latest = get_latest_cache(force=True)
-        data = {
-            "updated_at": latest[0]["timestamp"] if latest else None,
-            "readings": latest,
-            "alerts": get_recent_alerts(),
-            "palette": get_category_palette(),
-        }
-        return jsonify(data)
+        since = request.args.get("since", type=int)
+        get_latest_cache()
+        return _conditional(_snapshot_etag(since), ("latest", since), lambda: dumps(latest_payload(since)))
+
+    @bp.get("/stream")
+    def stream():
+        last_event_id = request.headers.get("Last-Event-ID") or request.args.get("since")
+        try:
+            last_seen = int(last_event_id) if last_event_id is not None else None
+        except ValueError:
+            last_seen = None
+        publish_snapshot()
+        return Response(
+            stream_with_context(broadcaster.stream(last_seen)),
+            mimetype="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
 
     @bp.get("/history")
     def history():
         city = request.args.get("city")
         limit = int(request.args.get("limit", 200))
+        resolution = request.args.get("resolution", "raw")
         if not city:
             return jsonify({"error": "city parameter is required"}), 400
-        return jsonify({"city": city, "readings": get_history(city, limit)})
+        if resolution != "raw" and resolution not in RESOLUTIONS:
+            return jsonify({"error": f"resolution must be raw or one of {', '.join(RESOLUTIONS)}"}), 400
+        try:
+            start = parse_time(request.args.get("start"))
+            end = parse_time(request.args.get("end"))
+        except ValueError:
+            return jsonify({"error": "start and end must be ISO 8601 timestamps"}), 400
+
+        if resolution != "raw":
+            # Long ranges come straight from the pre-aggregated buckets.
+            buckets = get_rollups(city, resolution, start, end)
+            return jsonify({"city": city, "resolution": resolution, "buckets": buckets})
+        max_points = request.args.get("max_points", type=int)
+        try:
+            readings = get_history(city, limit, start, end, max_points=max_points)
+        except ColdBlockError as exc:
+            return jsonify({"error": str(exc)}), 500
+        return jsonify({"city": city, "readings": readings})
+
+    @bp.get("/export")
+    def export():
+        fmt = request.args.get("format", "ndjson")
+        if fmt not in FORMATS:
+            return jsonify({"error": f"format must be one of {', '.join(FORMATS)}"}), 400
+        if fmt == "parquet" and not parquet_available():
+            return jsonify({"error": "Parquet export needs pyarrow installed"}), 501
+        try:
+            columns = parse_columns(request.args.get("columns"))
+            start = parse_time(request.args.get("start"))
+            end = parse_time(request.args.get("end"))
+        except ValueError as exc:
+            return jsonify({"error": str(exc)}), 400
+
+        stream = export_stream(fmt, city=request.args.get("city"), start=start, end=end, columns=columns)
+        return Response(
+            stream_with_context(stream),
+            mimetype=FORMATS[fmt],
+            headers={"Content-Disposition": f"attachment; filename=readings.{fmt}"},
+        )
+
+    @bp.get("/nearby")
+    def nearby():
+        latitude = request.args.get("lat", type=float)
+        longitude = request.args.get("lon", type=float)
+        if latitude is None or longitude is None:
+            return jsonify({"error": "lat and lon parameters are required"}), 400
+        k = min(max(request.args.get("k", 5, type=int), 1), settings.nearby_max_results)
+        radius_km = request.args.get("radius_km", type=float)
+        get_latest_cache()
+        results = [
+            {**reading, "distance_km": round(distance, 3)}
+            for reading, distance in station_index.nearest(latitude, longitude, k, radius_km)
+        ]
+        return jsonify({"lat": latitude, "lon": longitude, "readings": results})
 
     @bp.get("/mapdata")
     def mapdata():
-        return jsonify(get_map_overlay())
+        since = request.args.get("since", type=int)
+        get_latest_cache()
+        return _conditional(_snapshot_etag(since), ("mapdata", since), lambda: dumps(get_map_overlay(since)))
+
+    @bp.get("/districts")
+    def districts():
+        since = request.args.get("since", type=int)
+        get_latest_cache()
+        return _conditional(_snapshot_etag(since), ("districts", since), lambda: dumps(get_district_summaries(since)))
+
+    @bp.get("/heatmap")
+    def heatmap():
+        resolution = nearest_resolution(request.args.get("resolution", type=int))
+        fmt = request.args.get("format", "png")
+        if fmt not in ("png", "bin"):
+            return jsonify({"error": "format must be png or bin"}), 400
+        # Readings without coordinates cannot be placed on the grid.
+        if not located_readings():
+            return jsonify({"error": "No readings to interpolate"}), 404
+
+        def build() -> bytes:
+            grid = aqi_grid(resolution)
+            return render_png(grid) if fmt == "png" else encode_grid(grid)
+
+        # PNG data is already deflated; the raw grid compresses well.
+        response = _conditional(
+            _snapshot_etag(None),
+            ("heatmap", resolution, fmt),
+            build,
+            mimetype="image/png" if fmt == "png" else "application/octet-stream",
+            compress=fmt == "bin",
+        )
+        height, width = grid_shape(resolution)
+        response.headers["X-Grid-Size"] = f"{width}x{height}"
+        response.headers["X-Grid-Bounds"] = ",".join(str(value) for value in settings.heatmap_bounds)
+        return response
+
+    @bp.get("/geojson")
+    def geojson_manifest():
+        levels = [
+            {**level, "url": url_for("api.geojson_variant", digest=level["hash"])}
+            for level in _geojson_assets()
+        ]
+        response = jsonify({"levels": levels})
+        response.headers["Cache-Control"] = "public, max-age=300"
+        return response
+
+    @bp.get("/geojson/<digest>.json")
+    def geojson_variant(digest: str):
+        _geojson_assets()
+        body = _geojson_bodies.get(digest)
+        if body is None:
+            return jsonify({"error": "Unknown boundary version"}), 404
+        if request.if_none_match.contains(digest):
+            response = Response(status=304)
+        else:
+            response = encoded_response(body)
+        response.set_etag(digest)
+        # The URL changes whenever the content does, so caches may keep it forever.
+        response.headers["Cache-Control"] = "public, max-age=31536000, immutable"
+        return response
 
     @bp.get("/predict")
     def predict():
         city = request.args.get("city")
         use_all_models = request.args.get("all_models", "true").lower() == "true"
-        
-        if use_all_models:
-            result = predict_with_all_models(city=city)
-        else:
+        intervals = request.args.get("intervals", "false").lower() == "true"
+        try:
+            quantiles = parse_quantiles(request.args.get("quantiles"))
+        except ValueError as exc:
+            return jsonify({"error": str(exc)}), 400
+
+        def build() -> bytes:
+            if use_all_models:
+                return dumps(predict_with_all_models(city=city, intervals=intervals, quantiles=quantiles))
             # Backward compatibility
-            result = predict_next_24(city=city)
-        return jsonify(result)
+            return dumps(predict_next_24(city=city, intervals=intervals, quantiles=quantiles))
+
+        # Forecasts only change with new readings or retrained artifacts.
+        get_latest_cache()
+        key = ("predict", (city or "").lower(), use_all_models, intervals, quantiles)
+        version = (snapshot.current_version(), artifacts_version())
+        return encoded_response(response_cache.get(key, version, build))
 
     @bp.post("/ingest")
     def ingest():
         payload = request.get_json(force=True, silent=True)
-        if not payload:
+        # A JSON list ingests a batch with one bulk insert.
+        batch = payload if isinstance(payload, list) else [payload]
+        if not payload or not all(isinstance(reading, dict) and reading for reading in batch):
             return jsonify({"error": "Invalid payload"}), 400
-        doc_id = save_reading(payload)
-        return jsonify({"inserted_id": doc_id}), 201
+        for reading in batch:
+            if isinstance(reading.get("timestamp"), str):
+                # Stored as a datetime so it lands in the typed timestamp column.
+                try:
+                    reading["timestamp"] = parse_time(reading["timestamp"])
+                except ValueError:
+                    return jsonify({"error": "Invalid timestamp"}), 400
+        doc_ids, errors = save_readings(batch)
+        clean = [
+            reading for doc_id, reading in zip(doc_ids, batch) if doc_id is not None and not reading.get("flagged")
+        ]
+        if clean:
+            evaluate_readings(clean)
+            publish_snapshot()
+        if isinstance(payload, list):
+            inserted = [doc_id for doc_id in doc_ids if doc_id is not None]
+            flagged = [doc_id for doc_id, reading in zip(doc_ids, batch) if doc_id is not None and reading.get("flagged")]
+            body = {"inserted_ids": inserted, "flagged": flagged}
+            if errors:
+                body["errors"] = [{"index": index, "error": error} for index, error in sorted(errors.items())]
+            return jsonify(body), 201 if inserted else 409
+        if errors:
+            return jsonify({"error": errors[0]}), 409
+        if payload.get("anomalies"):
+            return jsonify({"inserted_id": doc_ids[0], "anomalies": payload["anomalies"]}), 201
+        return jsonify({"inserted_id": doc_ids[0]}), 201
 
     @bp.post("/train")
     def trigger_train():
         use_all_models = request.args.get("all_models", "true").lower() == "true"
         
-        if use_all_models:
+        if request.args.get("mode") == "cv":
+            budget = request.args.get("budget", type=float)
+            metrics = train_with_cross_validation(budget_seconds=budget)
+        elif request.args.get("mode") == "out_of_core":
+            metrics = train_out_of_core(history_days=request.args.get("days", type=int))
+        elif use_all_models:
             metrics = train_all_models(force=True)
         else:
             metrics = train_model_if_needed(force=True)
@@ -0,0 +1,95 @@
+from __future__ import annotations
+
+import gzip
+import json
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Hashable
+
+from flask import Response, request
+
+from ..config import get_settings
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+settings = get_settings()
+
+
+def dumps(payload: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(
+            payload, default=str, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+        )
+    return json.dumps(payload, default=str, separators=(",", ":")).encode("utf-8")
+
+
+_COMPRESSORS: dict[str, Callable[[bytes], bytes]] = {"gzip": lambda data: gzip.compress(data, 6)}
+if brotli is not None:
+    _COMPRESSORS["br"] = lambda data: brotli.compress(data, quality=5)
+# Preferred first: best_match breaks quality ties by offer order.
+_OFFERED = [name for name in ("br", "gzip") if name in _COMPRESSORS]
+
+
+class EncodedBody:
+    """One encoded body plus its compressed variants, each built at most once"""
+
+    def __init__(self, data: bytes, precompress: bool = False):
+        self.variants = {"identity": data}
+        if precompress:
+            for encoding in _OFFERED:
+                self.variant(encoding)
+
+    def variant(self, encoding: str) -> bytes:
+        body = self.variants.get(encoding)
+        if body is None:
+            body = _COMPRESSORS[encoding](self.variants["identity"])
+            self.variants[encoding] = body
+        return body
+
+
+class ResponseCache:
+    """Encoded bodies keyed by request shape, each valid for one data version"""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: OrderedDict[Hashable, tuple[Hashable, EncodedBody]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, version: Hashable, build: Callable[[], bytes]) -> EncodedBody:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == version:
+                self._entries.move_to_end(key)
+                return entry[1]
+        # Built outside the lock; concurrent misses just race to store the same bytes.
+        body = EncodedBody(build())
+        with self._lock:
+            self._entries[key] = (version, body)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return body
+
+
+response_cache = ResponseCache(settings.response_cache_entries)
+
+
+def encoded_response(
+    body: EncodedBody, status: int = 200, mimetype: str = "application/json", compress: bool = True
+) -> Response:
+    encoding = "identity"
+    if compress and len(body.variants["identity"]) >= settings.response_compress_min_bytes:
+        encoding = request.accept_encodings.best_match(_OFFERED) or "identity"
+    response = Response(body.variant(encoding), status=status, mimetype=mimetype)
+    if encoding != "identity":
+        response.headers["Content-Encoding"] = encoding
+    response.vary.add("Accept-Encoding")
+    return response
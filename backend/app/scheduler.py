@@ -7,24 +7,28 @@ from apscheduler.triggers.interval import IntervalTrigger
 from flask import Flask
 
 from .config import get_settings
-from .services.alerts import refresh_alerts
+from .services.alerts import refresh_alerts, sweep_alerts
+from .services.cold_storage import seal_cold_readings
+from .services.events import publish_snapshot, refresh_and_publish
 from .services.model import train_model_if_needed
-from .services.readings import refresh_latest_cache
+from .services.retention import enforce_retention
+from .services.rollups import backfill_rollups, flush_rollups
 
 
 def init_scheduler(app: Flask) -> BackgroundScheduler:
     settings = get_settings()
     scheduler = BackgroundScheduler()
 
-    def job_wrapper(func):
+    def job_wrapper(*funcs):
         def inner():
             with app.app_context():
-                func()
+                for func in funcs:
+                    func()
 
         return inner
 
     scheduler.add_job(
-        job_wrapper(refresh_latest_cache),
+        job_wrapper(refresh_and_publish),
         IntervalTrigger(seconds=settings.refresh_latest_interval_seconds),
         id="refresh_latest_cache",
         next_run_time=datetime.utcnow() + timedelta(seconds=5),
@@ -38,12 +42,48 @@ def init_scheduler(app: Flask) -> BackgroundScheduler:
     )
 
     scheduler.add_job(
-        job_wrapper(refresh_alerts),
+        job_wrapper(refresh_alerts, publish_snapshot),
         IntervalTrigger(minutes=5),
         id="refresh_alerts",
         next_run_time=datetime.utcnow() + timedelta(seconds=15),
     )
 
+    scheduler.add_job(
+        job_wrapper(sweep_alerts),
+        IntervalTrigger(minutes=settings.alert_sweep_minutes),
+        id="sweep_alerts",
+        next_run_time=datetime.utcnow() + timedelta(minutes=1),
+    )
+
+    scheduler.add_job(
+        job_wrapper(flush_rollups),
+        IntervalTrigger(seconds=settings.rollup_flush_seconds),
+        id="flush_rollups",
+        next_run_time=datetime.utcnow() + timedelta(seconds=settings.rollup_flush_seconds),
+    )
+
+    # Rolls up the history of cities seen for the first time, off the ingest path.
+    scheduler.add_job(
+        job_wrapper(backfill_rollups),
+        IntervalTrigger(seconds=settings.rollup_flush_seconds),
+        id="backfill_rollups",
+        next_run_time=datetime.utcnow() + timedelta(seconds=5),
+    )
+
+    scheduler.add_job(
+        job_wrapper(seal_cold_readings),
+        IntervalTrigger(minutes=settings.cold_seal_minutes),
+        id="seal_cold_readings",
+        next_run_time=datetime.utcnow() + timedelta(minutes=2),
+    )
+
+    scheduler.add_job(
+        job_wrapper(enforce_retention),
+        IntervalTrigger(minutes=settings.retention_interval_minutes),
+        id="enforce_retention",
+        next_run_time=datetime.utcnow() + timedelta(minutes=10),
+    )
+
     return scheduler
 
 
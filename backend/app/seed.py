@@ -88,7 +88,7 @@ def seed_database(days: int, interval: int, drop_existing: bool = False) -> dict
 
     documents = generate_readings(days=days, interval_minutes=interval)
     if documents:
-        readings.insert_many(documents)
+        readings.insert_many(documents, ordered=False)
     return {"inserted": len(documents)}
 
 
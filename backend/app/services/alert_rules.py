@@ -0,0 +1,279 @@
+from __future__ import annotations
+
+import json
+from datetime import datetime
+from string import Formatter
+from typing import Any, TypedDict
+
+import numpy as np
+
+from ..config import get_settings
+from .aqi import category_for, compute_aqi_array
+from .training_data import POLLUTANT_FIELDS, epoch_ns
+
+settings = get_settings()
+
+RULE_KINDS = ("threshold", "rate", "sustained", "forecast")
+RULE_FIELDS = ("aqi", *POLLUTANT_FIELDS)
+FORECAST_HOURS = 24
+
+_NS_PER_SECOND = 1_000_000_000
+_INITIAL_CITIES = 16
+_INITIAL_HISTORY = 8
+
+
+def _grown(array: np.ndarray, size: int, axis: int = 0) -> np.ndarray:
+    """`array` extended to `size` along `axis`, padded with False or NaN"""
+    shape = list(array.shape)
+    shape[axis] = size - shape[axis]
+    padding = np.zeros(shape, dtype=bool) if array.dtype == bool else np.full(shape, np.nan)
+    return np.concatenate([array, padding], axis=axis)
+
+
+class AlertRule(TypedDict, total=False):
+    id: str
+    kind: str
+    field: str
+    value: float
+    minutes: float
+    hours: int
+    cities: list[str]
+    states: list[str]
+    message: str
+
+
+DEFAULT_RULES: list[AlertRule] = [
+    {"id": "aqi", "kind": "threshold", "field": "aqi", "value": 150,
+     "message": "AQI reached {value:.0f} ({category}) in {city}."},
+    {"id": "pm25", "kind": "threshold", "field": "pm25", "value": 90,
+     "message": "High PM2.5 concentration ({value:.1f} µg/m³) detected."},
+    {"id": "pm10", "kind": "threshold", "field": "pm10", "value": 150,
+     "message": "Elevated PM10 levels ({value:.1f} µg/m³)."},
+]
+
+_DEFAULT_MESSAGES = {
+    "threshold": "{field} at {value:.1f} in {city} (limit {threshold:g}).",
+    "rate": "{field} rose by {value:.1f} within {minutes:g} minutes in {city}.",
+    "sustained": "{field} has stayed at or above {threshold:g} for {minutes:g} minutes in {city}.",
+    "forecast": "{field} is forecast to reach {value:.0f} within {hours} hours in {city}.",
+}
+
+
+# Placeholders a message template may use, with sample values to try it against.
+_MESSAGE_SAMPLE = {
+    "city": "City", "field": "AQI", "value": 0.0, "threshold": 0.0, "minutes": 0.0, "hours": 1, "category": "Good",
+}
+
+
+def _check_message(rule: dict[str, Any]) -> None:
+    try:
+        names = [name for _, name, _, _ in Formatter().parse(rule["message"]) if name is not None]
+        unknown = sorted(set(names) - set(_MESSAGE_SAMPLE))
+        if unknown:
+            raise ValueError(f"unknown placeholders {', '.join(repr(name) for name in unknown)}")
+        rule["message"].format(**_MESSAGE_SAMPLE)
+    except (TypeError, ValueError) as exc:
+        raise ValueError(f"Alert rule {rule['id']}: bad message template: {exc}") from None
+
+
+def _validate(rule: dict[str, Any], position: int) -> AlertRule:
+    rule = {"id": f"rule-{position}", "kind": "threshold", "field": "aqi", **rule}
+    if rule["kind"] not in RULE_KINDS:
+        raise ValueError(f"Alert rule {rule['id']}: unknown kind {rule['kind']!r}")
+    if rule["field"] not in RULE_FIELDS:
+        raise ValueError(f"Alert rule {rule['id']}: unknown field {rule['field']!r}")
+    if rule["kind"] == "forecast" and rule["field"] != "aqi":
+        raise ValueError(f"Alert rule {rule['id']}: forecast rules only apply to aqi")
+    if "value" not in rule:
+        raise ValueError(f"Alert rule {rule['id']}: missing value")
+    if rule["kind"] in ("rate", "sustained") and float(rule.get("minutes", 0)) <= 0:
+        raise ValueError(f"Alert rule {rule['id']}: {rule['kind']} rules need positive minutes")
+    rule["hours"] = min(max(int(rule.get("hours", FORECAST_HOURS)), 1), FORECAST_HOURS)
+    rule.setdefault("message", _DEFAULT_MESSAGES[rule["kind"]])
+    _check_message(rule)
+    return rule  # type: ignore[return-value]
+
+
+def load_rules() -> list[AlertRule]:
+    """Rules from `alert_rules_path` when the file exists, otherwise the built-in thresholds"""
+    path = settings.alert_rules_path
+    if path is None or not path.exists():
+        raw: list[dict[str, Any]] = [dict(rule) for rule in DEFAULT_RULES]
+    else:
+        raw = json.loads(path.read_text(encoding="utf-8"))
+    return [_validate(rule, position) for position, rule in enumerate(raw)]
+
+
+class RuleEngine:
+    """Alert rules compiled to per-rule arrays and evaluated for a batch of cities at once"""
+
+    def __init__(self, rules: list[AlertRule]) -> None:
+        self.rules = rules
+        kinds = np.array([RULE_KINDS.index(rule["kind"]) for rule in rules], dtype=np.int64)
+        self._threshold = np.array([float(rule["value"]) for rule in rules])
+        self._field = np.array([RULE_FIELDS.index(rule["field"]) for rule in rules], dtype=np.int64)
+        self._seconds = np.array([float(rule.get("minutes", 0)) * 60 for rule in rules])
+        self._horizon = np.array([rule["hours"] - 1 for rule in rules], dtype=np.int64)
+        self._is_rate = kinds == RULE_KINDS.index("rate")
+        self._is_sustained = kinds == RULE_KINDS.index("sustained")
+        self._is_forecast = kinds == RULE_KINDS.index("forecast")
+        # Rate rules share one baseline lookup per distinct window.
+        self._windows, self._window = np.unique(self._seconds * self._is_rate, return_inverse=True)
+        self._lookback = float(self._seconds[self._is_rate].max()) if self._is_rate.any() else 0.0
+
+        # Per-city state, one row per city in first-seen order, in arrays that
+        # double when full. Rate-rule history keeps each city's observation
+        # times and values in unordered slots; NaN marks a free slot.
+        self._columns: dict[str, int] = {}
+        self._scope = np.zeros((_INITIAL_CITIES, len(rules)), dtype=bool)
+        self._since = np.full((_INITIAL_CITIES, len(rules)), np.nan)
+        self._forecast = np.full((_INITIAL_CITIES, FORECAST_HOURS), np.nan)
+        self._seen = np.full((_INITIAL_CITIES, _INITIAL_HISTORY), np.nan)
+        self._seen_values = np.full((_INITIAL_CITIES, _INITIAL_HISTORY, len(RULE_FIELDS)), np.nan)
+
+    @property
+    def has_forecasts(self) -> bool:
+        return bool(self._is_forecast.any())
+
+    def _column(self, city: str, state: str | None) -> int:
+        column = self._columns.get(city)
+        if column is None:
+            column = self._columns[city] = len(self._columns)
+            if column == len(self._scope):
+                size = 2 * column
+                self._scope = _grown(self._scope, size)
+                self._since = _grown(self._since, size)
+                self._forecast = _grown(self._forecast, size)
+                self._seen = _grown(self._seen, size)
+                self._seen_values = _grown(self._seen_values, size)
+            self._scope[column] = [
+                (not rule.get("cities") or city in rule["cities"])
+                and (not rule.get("states") or state in rule["states"])
+                for rule in self.rules
+            ]
+        return column
+
+    def set_forecasts(self, forecasts: dict[str, np.ndarray], states: dict[str, str | None]) -> None:
+        """Store each city's hourly AQI forecast as a running maximum over the horizon"""
+        for city, points in forecasts.items():
+            column = self._column(city, states.get(city))
+            horizon = np.full(FORECAST_HOURS, np.nan)
+            points = np.asarray(points, dtype=np.float64)[:FORECAST_HOURS]
+            horizon[: len(points)] = np.fmax.accumulate(points)
+            if len(points) < FORECAST_HOURS:
+                horizon[len(points):] = horizon[len(points) - 1] if len(points) else np.nan
+            self._forecast[column] = horizon
+
+    def _baselines(self, columns: np.ndarray, seconds: np.ndarray) -> np.ndarray:
+        """Oldest value inside each rate window, shaped (windows, fields, batch)"""
+        seen = self._seen[columns][None]
+        # Entries past the lookback from a city's newest one count as expired, even if not yet replaced.
+        expired = np.nan_to_num(seen, nan=-np.inf).max(axis=2, keepdims=True) - self._lookback
+        with np.errstate(invalid="ignore"):
+            inside = (seen >= (seconds[None, :] - self._windows[:, None])[:, :, None]) & (seen >= expired)
+        oldest = np.where(inside, seen, np.inf).argmin(axis=2)
+        found = inside.any(axis=2) & (self._windows[:, None] > 0)
+        baselines = np.where(found[:, :, None], self._seen_values[columns[None, :], oldest], np.nan)
+        return baselines.transpose(0, 2, 1)
+
+    def _remember(self, columns: np.ndarray, seconds: np.ndarray, values: np.ndarray) -> None:
+        if self._lookback <= 0:
+            return
+        # One entry per city per batch, from its last reading, and only when it moves time forward.
+        _, last = np.unique(columns[::-1], return_index=True)
+        keep = len(columns) - 1 - last
+        columns, seconds, values = columns[keep], seconds[keep], values[:, keep]
+        seen = np.nan_to_num(self._seen[columns], nan=-np.inf)
+        fresh = seconds > seen.max(axis=1)
+        columns, seconds, values, seen = columns[fresh], seconds[fresh], values[:, fresh], seen[fresh]
+        if not len(columns):
+            return
+        # Each entry replaces its city's oldest or a free slot; expired entries are never baselines.
+        slots = seen.argmin(axis=1)
+        full = seen[np.arange(len(columns)), slots] >= seconds - self._lookback
+        if full.any():
+            size = self._seen.shape[1]
+            self._seen = _grown(self._seen, 2 * size, axis=1)
+            self._seen_values = _grown(self._seen_values, 2 * size, axis=1)
+            slots = np.where(full, size, slots)
+        self._seen[columns, slots] = seconds
+        self._seen_values[columns, slots] = values.T
+
+    def evaluate(
+        self, readings: list[dict[str, Any]], observed: list[datetime], clear_ratio: float
+    ) -> list[tuple[list[str], bool]]:
+        """Per reading, the firing rules' messages and whether any rule holds within the clear band"""
+        if not readings or not self.rules:
+            return [([], False) for _ in readings]
+        columns = np.array(
+            [self._column(reading.get("city", "Unknown"), reading.get("state")) for reading in readings],
+            dtype=np.int64,
+        )
+        seconds = np.array([epoch_ns(value) / _NS_PER_SECOND for value in observed])
+        pollutants = {
+            field: np.array([np.nan if reading.get(field) is None else reading[field] for reading in readings],
+                            dtype=np.float64)
+            for field in POLLUTANT_FIELDS
+        }
+        values = np.vstack([compute_aqi_array(pollutants), *(pollutants[field] for field in POLLUTANT_FIELDS)])
+
+        # Every rule's measured quantity for every reading, shaped (rules, batch).
+        measure = values[self._field]
+        if self._is_rate.any():
+            baseline = self._baselines(columns, seconds)[self._window, self._field]
+            measure = np.where(self._is_rate[:, None], measure - baseline, measure)
+        if self._is_forecast.any():
+            forecast = self._forecast[columns][:, self._horizon].T
+            measure = np.where(self._is_forecast[:, None], forecast, measure)
+
+        scope = self._scope[columns].T
+        threshold = self._threshold[:, None]
+        with np.errstate(invalid="ignore"):
+            breached = scope & (measure >= threshold)
+            held = scope & (measure >= threshold * clear_ratio)
+
+        # Sustained rules fire once the breach has lasted their full duration.
+        since = self._since[columns].T
+        since = np.where(breached, np.where(np.isnan(since), seconds[None, :], since), np.nan)
+        self._since[columns] = since.T
+        with np.errstate(invalid="ignore"):
+            lasted = seconds[None, :] - since >= self._seconds[:, None]
+        fired = breached & np.where(self._is_sustained[:, None], lasted, True)
+
+        self._remember(columns, seconds, values)
+
+        results: list[tuple[list[str], bool]] = [([], bool(held[:, position].any())) for position in range(len(readings))]
+        for rule_index, position in zip(*np.nonzero(fired)):
+            rule = self.rules[rule_index]
+            reading = readings[position]
+            results[position][0].append(
+                rule["message"].format(
+                    city=reading.get("city"),
+                    field=rule["field"].upper(),
+                    value=float(measure[rule_index, position]),
+                    threshold=float(rule["value"]),
+                    minutes=float(rule.get("minutes", 0)),
+                    hours=rule["hours"],
+                    category=category_for(values[0, position]).name,
+                )
+            )
+        return results
+
+
+_engine: RuleEngine | None = None
+
+
+def get_engine() -> RuleEngine:
+    global _engine
+    if _engine is None:
+        _engine = RuleEngine(load_rules())
+    return _engine
+
+
+def load_forecasts() -> dict[str, np.ndarray]:
+    """One batched 24-hour AQI prediction per city, when any forecast rule needs it"""
+    if not get_engine().has_forecasts:
+        return {}
+    from .model import forecast_all_cities
+
+    return forecast_all_cities(FORECAST_HOURS)
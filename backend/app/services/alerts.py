@@ -1,62 +1,171 @@
 from __future__ import annotations
 
-from datetime import datetime, timedelta
-
-from ..db import get_collection
+import threading
+from collections import deque
+from datetime import datetime, timedelta, timezone
+from itertools import islice
+from typing import Any
+
+from ..config import get_settings
+from ..db import alert_retention_seconds, get_collection
+from . import snapshot
+from .alert_rules import get_engine, load_forecasts
+from .aqi import compute_aqi
 from .readings import get_latest_cache
 
-
-ALERT_THRESHOLD = {
-    "pm25": 90,
-    "pm10": 150,
-    "aqi": 150,
-}
+settings = get_settings()
+
+
+# Open alerts by city, plus the newest reading time evaluated per city so
+# out-of-order readings cannot flap an alert.
+_lock = threading.Lock()
+_open_alerts: dict[str, dict[str, Any]] | None = None
+# Newest alert documents last, so reading the most recent ones never touches
+# the collection. Open entries are shared with `_open_alerts` and closed in place.
+_recent: deque[dict[str, Any]] | None = None
+_last_evaluated: dict[str, datetime] = {}
+
+
+def _timestamp(value: Any) -> datetime:
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    if isinstance(value, datetime):
+        return value.astimezone(timezone.utc).replace(tzinfo=None) if value.tzinfo else value
+    return datetime.utcnow()
+
+
+def _load_state() -> dict[str, dict[str, Any]]:
+    """Seed open alerts and the recent-alert buffer from the collection once"""
+    global _open_alerts, _recent
+    if _open_alerts is None:
+        _open_alerts = {}
+        _recent = deque(maxlen=settings.alert_buffer_size)
+        try:
+            collection = get_collection("alerts")
+            for doc in reversed(list(collection.find().sort("timestamp", -1).limit(settings.alert_buffer_size))):
+                _recent.append(doc)
+            buffered = {doc["_id"]: doc for doc in _recent}
+            for doc in collection.find({"status": "open"}):
+                doc = buffered.get(doc["_id"], doc)
+                _open_alerts[doc["city"]] = {"doc": doc, "peak_aqi": doc.get("peak_aqi", doc.get("aqi", 0))}
+        except Exception:
+            pass
+    return _open_alerts
+
+
+def evaluate_readings(readings: list[dict[str, Any]]) -> list[str]:
+    """Run the alert rules over a batch and open or close alerts with hysteresis"""
+    alerts_collection = get_collection("alerts")
+    changed: list[str] = []
+
+    with _lock:
+        open_alerts = _load_state()
+        newest: dict[str, tuple[dict[str, Any], datetime]] = {}
+        for reading in readings:
+            city = reading.get("city", "Unknown")
+            observed_at = _timestamp(reading.get("timestamp"))
+            last = _last_evaluated.get(city)
+            if (last is None or observed_at >= last) and (city not in newest or observed_at >= newest[city][1]):
+                newest[city] = (reading, observed_at)
+        if not newest:
+            return changed
+        batch = [reading for reading, _ in newest.values()]
+        observed = [observed_at for _, observed_at in newest.values()]
+        results = get_engine().evaluate(batch, observed, settings.alert_clear_ratio)
+
+        for reading, observed_at, (messages, held) in zip(batch, observed, results):
+            city = reading.get("city", "Unknown")
+            _last_evaluated[city] = observed_at
+            current = open_alerts.get(city)
+            if current is None and not messages:
+                continue
+            if current is not None and held:
+                current["peak_aqi"] = max(current["peak_aqi"], compute_aqi(reading)["aqi"])
+                continue
+            meta = compute_aqi(reading)
+            if current is None:
+                doc = {
+                    "city": city,
+                    "state": reading.get("state"),
+                    "messages": messages,
+                    "category": meta["category"],
+                    "aqi": meta["aqi"],
+                    "peak_aqi": meta["aqi"],
+                    "color": meta["color"],
+                    "status": "open",
+                    "timestamp": observed_at,
+                    "closed_at": None,
+                }
+                alerts_collection.insert_one(doc)
+                _recent.append(doc)
+                open_alerts[city] = {"doc": doc, "peak_aqi": meta["aqi"]}
+            else:
+                # Every rule has dropped clearly below its threshold.
+                closed = {
+                    "status": "closed",
+                    "closed_at": observed_at,
+                    "peak_aqi": max(current["peak_aqi"], meta["aqi"]),
+                }
+                alerts_collection.update_one({"_id": current["doc"]["_id"]}, {"$set": closed})
+                current["doc"].update(closed)
+                del open_alerts[city]
+            changed.append(city)
+
+    if changed:
+        snapshot.bump("alert", changed)
+    return changed
+
+
+def evaluate_reading(reading: dict[str, Any]) -> bool:
+    """Evaluate one ingested reading; True when its city's alert opened or closed"""
+    return bool(evaluate_readings([reading]))
 
 
 def refresh_alerts() -> None:
-    latest = get_latest_cache(force=True)
-    alerts_collection = get_collection("alerts")
-    now = datetime.utcnow()
-
-    active_alerts = []
-    for reading in latest:
-        messages = []
-        if reading["aqi"] >= ALERT_THRESHOLD["aqi"]:
-            messages.append(
-                f"AQI reached {reading['aqi']} ({reading['category']}) in {reading['city']}."
-            )
-        if reading["pm25"] >= ALERT_THRESHOLD["pm25"]:
-            messages.append(
-                f"High PM2.5 concentration ({reading['pm25']:.1f} µg/m³) detected."
-            )
-        if reading["pm10"] >= ALERT_THRESHOLD["pm10"]:
-            messages.append(
-                f"Elevated PM10 levels ({reading['pm10']:.1f} µg/m³)."
-            )
-
-        if not messages:
-            continue
-
-        active_alerts.append(
-            {
-                "city": reading["city"],
-                "state": reading["state"],
-                "messages": messages,
-                "category": reading["category"],
-                "aqi": reading["aqi"],
-                "color": reading["color"],
-                "timestamp": now,
-            }
-        )
-
-    if active_alerts:
-        alerts_collection.delete_many({"timestamp": {"$lt": now - timedelta(hours=2)}})
-        alerts_collection.insert_many(active_alerts)
+    """Refresh forecasts and reconcile every city's latest reading in one pass"""
+    latest = get_latest_cache()
+    forecasts = load_forecasts()
+    if forecasts:
+        with _lock:
+            get_engine().set_forecasts(forecasts, {row["city"]: row.get("state") for row in latest})
+    evaluate_readings(latest)
+
+
+def _expired(doc: dict[str, Any], cutoff: datetime) -> bool:
+    if doc.get("status") == "open":
+        return False
+    # Legacy alerts closed before closed_at existed age by when they opened.
+    aged_from = doc.get("closed_at") or doc.get("timestamp")
+    return aged_from is not None and _timestamp(aged_from) < cutoff
+
+
+def sweep_alerts() -> int:
+    """Delete alerts closed longer ago than the retention from the collection and the buffer"""
+    # Ages alerts by close time, the same field the MongoDB TTL index expires on.
+    cutoff = datetime.utcnow() - timedelta(seconds=alert_retention_seconds())
+    with _lock:
+        _load_state()
+        # Filtered rather than popped from the head, so an open alert cannot shield expired ones behind it.
+        removed = [doc for doc in _recent if _expired(doc, cutoff)]
+        if removed:
+            kept = [doc for doc in _recent if not _expired(doc, cutoff)]
+            _recent.clear()
+            _recent.extend(kept)
+    collection = get_collection("alerts")
+    deleted = collection.delete_many({"status": {"$ne": "open"}, "closed_at": {"$lt": cutoff}}).deleted_count
+    # The TTL index never sees these, since they have no closed_at.
+    deleted += collection.delete_many(
+        {"status": {"$ne": "open"}, "closed_at": None, "timestamp": {"$lt": cutoff}}
+    ).deleted_count
+    if removed:
+        snapshot.bump("alert", {doc.get("city", "Unknown") for doc in removed})
+    return deleted
 
 
 def get_recent_alerts(limit: int = 10) -> list[dict[str, str]]:
-    collection = get_collection("alerts")
-    cursor = collection.find().sort("timestamp", -1).limit(limit)
+    with _lock:
+        _load_state()
+        docs = list(islice(reversed(_recent), limit))
     return [
         {
             "city": doc.get("city"),
@@ -65,14 +174,8 @@ def get_recent_alerts(limit: int = 10) -> list[dict[str, str]]:
             "aqi": doc.get("aqi"),
             "color": doc.get("color"),
             "timestamp": doc.get("timestamp").isoformat() if doc.get("timestamp") else None,
+            "status": doc.get("status", "closed"),
+            "closed_at": doc.get("closed_at").isoformat() if doc.get("closed_at") else None,
         }
-        for doc in cursor
+        for doc in docs
     ]
-
-
-
-
-
-
-
-
@@ -0,0 +1,143 @@
+from __future__ import annotations
+
+import threading
+from typing import Any
+
+import numpy as np
+from pymongo import DESCENDING
+
+from ..config import get_settings
+from ..db import get_collection
+from .training_data import CLEAN_FILTER, POLLUTANT_FIELDS
+
+settings = get_settings()
+
+ANOMALY_FIELDS = POLLUTANT_FIELDS
+
+_SEED_PROJECTION = {"_id": 0, **{field: 1 for field in ANOMALY_FIELDS}}
+
+
+class _CityState:
+    __slots__ = ("mean", "var", "count", "last", "repeats")
+
+    def __init__(self) -> None:
+        size = len(ANOMALY_FIELDS)
+        self.mean = np.zeros(size)
+        self.var = np.zeros(size)
+        self.count = np.zeros(size, dtype=np.int64)
+        self.last = np.full(size, np.nan)
+        self.repeats = np.zeros(size, dtype=np.int64)
+
+    def copy(self) -> _CityState:
+        state = _CityState.__new__(_CityState)
+        for name in self.__slots__:
+            setattr(state, name, getattr(self, name).copy())
+        return state
+
+
+def _values(reading: dict[str, Any]) -> np.ndarray:
+    return np.array([np.nan if reading.get(field) is None else float(reading[field]) for field in ANOMALY_FIELDS])
+
+
+def _update(state: _CityState, values: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Fold one reading into the state; returns its (spike, stuck) masks"""
+    present = ~np.isnan(values)
+    alpha = settings.anomaly_alpha
+    limit = settings.anomaly_z_threshold
+    first = present & (state.count == 0)
+    # Relative floor so a near-constant series does not turn noise into spikes.
+    std = np.maximum(np.sqrt(state.var), np.maximum(np.abs(state.mean) * 0.05, 1e-3))
+    with np.errstate(invalid="ignore"):
+        z = (values - state.mean) / std
+        spike = present & (state.count >= settings.anomaly_warmup) & (np.abs(z) > limit)
+        state.repeats = np.where(present & (values == state.last), state.repeats + 1, 0)
+    stuck = state.repeats >= settings.anomaly_stuck_count
+
+    # Spikes are clamped to the band edge so one fault cannot drag the baseline,
+    # while a genuine level shift is still absorbed over a few readings.
+    update = np.where(spike, state.mean + np.sign(z) * limit * std, values)
+    diff = np.where(present, update - state.mean, 0.0)
+    increment = alpha * diff
+    state.mean = np.where(first, values, state.mean + increment)
+    state.var = np.where(first, 0.0, (1 - alpha) * (state.var + diff * increment))
+    state.count += present
+    state.last = np.where(present, values, state.last)
+    return spike, stuck
+
+
+def _seed(city: str) -> _CityState | None:
+    """Replay the city's recent clean readings so a restart keeps its baselines; None when the store fails"""
+    try:
+        cursor = (
+            get_collection("readings")
+            .find({"city": city, **CLEAN_FILTER}, _SEED_PROJECTION)
+            .sort("timestamp", DESCENDING)
+            .limit(settings.anomaly_seed_readings)
+        )
+        docs = list(cursor)
+    except Exception as exc:
+        print(f"WARNING: Could not seed anomaly baselines for {city}: {exc}")
+        return None
+    state = _CityState()
+    for doc in reversed(docs):
+        _update(state, _values(doc))
+    return state
+
+
+def _out_of_range(values: np.ndarray) -> np.ndarray:
+    low, high = np.array([settings.anomaly_valid_ranges.get(field, (-np.inf, np.inf)) for field in ANOMALY_FIELDS]).T
+    with np.errstate(invalid="ignore"):
+        return (values < low) | (values > high)
+
+
+class AnomalyDetector:
+    """EWMA z-scores, repeated-value counters and range checks per city and pollutant, O(1) per reading"""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._states: dict[str, _CityState] = {}
+
+    def _state(self, city: str) -> _CityState:
+        state = self._states.get(city)
+        if state is None:
+            state = _seed(city)
+            if state is None:
+                # Not cached, so the next reading retries the seed.
+                return _CityState()
+            self._states[city] = state
+        return state
+
+    def inspect(self, readings: list[dict[str, Any]]) -> list[list[str]]:
+        """Flags such as "spike:pm25", "stuck:pm10" or "range:co2" per reading, leaving state untouched"""
+        flags = []
+        with self._lock:
+            scratch: dict[str, _CityState] = {}
+            for reading in readings:
+                city = reading.get("city", "Unknown")
+                if city not in scratch:
+                    scratch[city] = self._state(city).copy()
+                values = _values(reading)
+                spike, stuck = _update(scratch[city], values)
+                fields = np.array(ANOMALY_FIELDS)
+                flags.append(
+                    [f"spike:{field}" for field in fields[spike]]
+                    + [f"stuck:{field}" for field in fields[stuck]]
+                    + [f"range:{field}" for field in fields[_out_of_range(values)]]
+                )
+        return flags
+
+    def commit(self, readings: list[dict[str, Any]]) -> None:
+        """Fold readings that were stored into their cities' state"""
+        with self._lock:
+            for reading in readings:
+                city = reading.get("city", "Unknown")
+                _update(self._state(city), _values(reading))
+
+
+def is_fault(flags: list[str]) -> bool:
+    """Whether flags quarantine a reading rather than only annotate it"""
+    # A spike may be a real pollution event, which alerting must still see.
+    return any(not flag.startswith("spike:") for flag in flags)
+
+
+detector = AnomalyDetector()
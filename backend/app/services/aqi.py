@@ -105,6 +105,13 @@ def _aqi_for_pollutant(pollutant: str, value: float | None) -> float | None:
     return None
 
 
+def category_for(aqi_value: float) -> AQICategory:
+    return next(
+        (cat for cat in AQI_SCALE if cat.range[0] <= aqi_value <= cat.range[1]),
+        AQI_SCALE[-1],
+    )
+
+
 def compute_aqi(payload: dict[str, float | None]) -> dict[str, float | str]:
     pollutant_aqis = {
         pollutant: _aqi_for_pollutant(pollutant, payload.get(pollutant))
@@ -123,10 +130,7 @@ def compute_aqi(payload: dict[str, float | None]) -> dict[str, float | str]:
     primary_pollutant = max(pollutant_aqis, key=pollutant_aqis.get)
     aqi_value = int(round(float(pollutant_aqis[primary_pollutant])))
 
-    category = next(
-        (cat for cat in AQI_SCALE if cat.range[0] <= aqi_value <= cat.range[1]),
-        AQI_SCALE[-1],
-    )
+    category = category_for(aqi_value)
 
     return {
         "aqi": aqi_value,
@@ -137,20 +141,25 @@ def compute_aqi(payload: dict[str, float | None]) -> dict[str, float | str]:
     }
 
 
-def get_category_palette() -> dict[str, str]:
-    return {cat.name: cat.color for cat in AQI_SCALE}
-
-
-def rolling_average(values: list[float], window: int = 6) -> float:
-    if not values:
-        return 0.0
-    arr = np.array(values[-window:])
-    return float(np.mean(arr))
-
-
-
-
-
-
+def compute_aqi_array(columns: dict[str, np.ndarray]) -> np.ndarray:
+    """Vectorized `compute_aqi` over pollutant columns; NaN marks a missing value"""
+    size = len(next(iter(columns.values()))) if columns else 0
+    best = np.full(size, -np.inf)
+    for pollutant, breakpoints in POLLUTANT_BREAKPOINTS.items():
+        values = columns.get(pollutant)
+        if values is None:
+            continue
+        values = np.asarray(values, dtype=np.float64)
+        sub_index = np.full(size, np.nan)
+        for bp_low, bp_high, aqi_low, aqi_high in breakpoints:
+            mask = (bp_low <= values) & (values <= bp_high) & np.isnan(sub_index)
+            sub_index[mask] = _linear_scale(values[mask], bp_low, bp_high, aqi_low, aqi_high)
+        bp_low, bp_high, aqi_low, aqi_high = breakpoints[-1]
+        above = values > bp_high
+        sub_index[above] = _linear_scale(values[above], bp_low, bp_high, aqi_low, aqi_high)
+        best = np.fmax(best, sub_index)
+    return np.where(np.isfinite(best), np.round(best), 0.0)
 
 
+def get_category_palette() -> dict[str, str]:
+    return {cat.name: cat.color for cat in AQI_SCALE}
@@ -0,0 +1,275 @@
+from __future__ import annotations
+
+import importlib.util
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Any, Callable
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import HistGradientBoostingRegressor, RandomForestRegressor
+from sklearn.linear_model import LinearRegression
+from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
+
+from ..config import get_settings
+from .incremental import (
+    ChunkFactory,
+    fit_histogram_cells,
+    fit_normal_equations,
+    reservoir_sample,
+)
+
+settings = get_settings()
+
+
+def regression_metrics(target: Any, predictions: Any) -> dict[str, float]:
+    return {
+        "r2": float(r2_score(target, predictions)),
+        "mae": float(mean_absolute_error(target, predictions)),
+        "rmse": float(np.sqrt(mean_squared_error(target, predictions))),
+    }
+
+
+class ModelBackend(ABC):
+    """A trainable ensemble member with its own estimator and artifact layout"""
+
+    name: str = ""
+    label: str = ""
+    # Tabular backends predict straight from the horizon feature frame.
+    tabular: bool = True
+    param_grid: list[dict[str, Any]] = [{}]
+
+    def available(self) -> bool:
+        return True
+
+    @abstractmethod
+    def build(self, **params: Any) -> Any:
+        """A fresh, unfitted estimator for these hyperparameters"""
+
+    def fit(self, features: pd.DataFrame, target: pd.Series, **params: Any) -> tuple[Any, dict[str, float]]:
+        model = self.build(**params)
+        model.fit(features, target)
+        return model, regression_metrics(target, model.predict(features))
+
+    def predict(self, model: Any, features: pd.DataFrame) -> np.ndarray:
+        return np.asarray(model.predict(features), dtype=np.float64)
+
+    def fit_chunks(self, chunks: ChunkFactory, **params: Any) -> Any:
+        """Train from a re-iterable stream of (features, target) chunks in bounded memory"""
+        # Backends without an exact streaming fit train on a fixed-size uniform sample of the stream.
+        model = self.build(**params)
+        features, target = reservoir_sample(chunks, settings.out_of_core_sample_rows)
+        model.fit(features, target)
+        return model
+
+    def artifact_paths(self, models_dir: Path) -> list[Path]:
+        return [models_dir / f"{self.name}_model.pkl"]
+
+    def save(self, model: Any, feature_columns: list[str], metrics: dict[str, Any], models_dir: Path) -> None:
+        joblib.dump(
+            {"model": model, "feature_columns": feature_columns, "metrics": metrics},
+            self.artifact_paths(models_dir)[0],
+        )
+
+    def load(self, models_dir: Path) -> tuple[Any, list[str], dict[str, Any]] | None:
+        path = self.artifact_paths(models_dir)[0]
+        if not path.exists():
+            return None
+        artifact = joblib.load(path)
+        return artifact["model"], artifact["feature_columns"], artifact.get("metrics", {})
+
+    def artifact_bytes(self, models_dir: Path) -> int:
+        return sum(path.stat().st_size for path in self.artifact_paths(models_dir) if path.exists())
+
+
+class SklearnBackend(ModelBackend):
+    def __init__(
+        self,
+        name: str,
+        label: str,
+        factory: Callable[..., Any],
+        param_grid: list[dict[str, Any]] | None = None,
+    ):
+        self.name = name
+        self.label = label
+        self._factory = factory
+        self.param_grid = param_grid or [{}]
+
+    def build(self, **params: Any) -> Any:
+        return self._factory(**params)
+
+
+class LinearBackend(SklearnBackend):
+    def fit_chunks(self, chunks: ChunkFactory, **params: Any) -> Any:
+        return fit_normal_equations(chunks)
+
+
+class HistGradientBoostingBackend(SklearnBackend):
+    def fit_chunks(self, chunks: ChunkFactory, **params: Any) -> Any:
+        return fit_histogram_cells(
+            self.build(**params),
+            chunks,
+            max_bins=settings.histogram_max_bins,
+            max_cells=settings.histogram_max_cells,
+            sample_rows=settings.out_of_core_sample_rows,
+        )
+
+
+def _random_forest(**params: Any) -> RandomForestRegressor:
+    options = {
+        "n_estimators": settings.rf_n_estimators,
+        "max_depth": settings.rf_max_depth,
+        "random_state": 42,
+        "n_jobs": -1,
+    }
+    options.update(params)
+    return RandomForestRegressor(**options)
+
+
+def _hist_gradient_boosting(**params: Any) -> HistGradientBoostingRegressor:
+    options = {
+        "max_iter": settings.hgb_max_iter,
+        "learning_rate": settings.hgb_learning_rate,
+        "max_leaf_nodes": settings.hgb_max_leaf_nodes,
+        "random_state": 42,
+    }
+    options.update(params)
+    return HistGradientBoostingRegressor(**options)
+
+
+class LSTMBackend(ModelBackend):
+    """Sequence model; TensorFlow is only imported when this backend is used"""
+
+    name = "lstm"
+    label = "lstm"
+    tabular = False
+
+    def available(self) -> bool:
+        return importlib.util.find_spec("tensorflow") is not None
+
+    def _prepare(self, features: pd.DataFrame, target: pd.Series) -> tuple[np.ndarray, np.ndarray, Any, list[str]]:
+        from sklearn.preprocessing import StandardScaler
+
+        sequence_length = settings.lstm_sequence_length
+        numeric_cols = features.select_dtypes(include=[np.number]).columns.tolist()
+        scaler = StandardScaler()
+        feature_data = scaler.fit_transform(features[numeric_cols].values)
+        target_data = np.asarray(target, dtype=np.float64)
+
+        count = len(feature_data) - sequence_length
+        if count <= 0:
+            return np.empty((0, sequence_length, len(numeric_cols))), np.empty(0), scaler, numeric_cols
+        windows = np.lib.stride_tricks.sliding_window_view(feature_data, sequence_length, axis=0)
+        X = np.ascontiguousarray(windows[:count].transpose(0, 2, 1))
+        y = target_data[sequence_length:]
+        return X, y, scaler, numeric_cols
+
+    def build(self, input_shape: tuple[int, int] | None = None) -> Any:
+        from tensorflow import keras
+        from tensorflow.keras import layers
+
+        if input_shape is None:
+            # Fallback to simple model if not enough data
+            model = keras.Sequential([
+                layers.Dense(32, activation='relu'),
+                layers.Dense(16, activation='relu'),
+                layers.Dense(1)
+            ])
+        else:
+            model = keras.Sequential([
+                layers.Input(shape=input_shape),
+                layers.LSTM(64, return_sequences=True),
+                layers.Dropout(0.2),
+                layers.LSTM(32, return_sequences=False),
+                layers.Dropout(0.2),
+                layers.Dense(16, activation='relu'),
+                layers.Dense(1)
+            ])
+        model.compile(optimizer='adam', loss='mse', metrics=['mae'])
+        return model
+
+    def fit_chunks(self, chunks: ChunkFactory, **params: Any) -> Any:
+        raise ValueError("LSTM sequences cannot be built from independent chunks")
+
+    def fit(self, features: pd.DataFrame, target: pd.Series, **params: Any) -> tuple[Any, dict[str, float]]:
+        X, y, scaler, numeric_cols = self._prepare(features, target)
+        if len(X) == 0:
+            raise ValueError("Not enough rows to build LSTM sequences")
+        model = self.build(input_shape=(X.shape[1], X.shape[2]) if len(X) >= 10 else None)
+        model.fit(X, y, epochs=settings.lstm_epochs, batch_size=32, validation_split=0.2, verbose=0)
+        predictions = model.predict(X, verbose=0).flatten()
+        bundle = {"model": model, "scaler": scaler, "numeric_cols": numeric_cols}
+        return bundle, regression_metrics(y, predictions)
+
+    def predict(self, model: Any, features: pd.DataFrame) -> np.ndarray:
+        bundle = model
+        sequence_length = settings.lstm_sequence_length
+        data = bundle["scaler"].transform(features.reindex(columns=bundle["numeric_cols"], fill_value=0).values)
+        if len(data) < sequence_length:
+            return np.empty(0)
+        windows = np.lib.stride_tricks.sliding_window_view(data, sequence_length, axis=0)
+        X = np.ascontiguousarray(windows.transpose(0, 2, 1))
+        return bundle["model"].predict(X, verbose=0).flatten()
+
+    def artifact_paths(self, models_dir: Path) -> list[Path]:
+        return [models_dir / "lstm_model.h5", models_dir / "lstm_scaler.pkl"]
+
+    def save(self, model: Any, feature_columns: list[str], metrics: dict[str, Any], models_dir: Path) -> None:
+        model_path, scaler_path = self.artifact_paths(models_dir)
+        model["model"].save(str(model_path))
+        joblib.dump(
+            {"scaler": model["scaler"], "numeric_cols": model["numeric_cols"], "metrics": metrics},
+            scaler_path,
+        )
+
+    def load(self, models_dir: Path) -> tuple[Any, list[str], dict[str, Any]] | None:
+        model_path, scaler_path = self.artifact_paths(models_dir)
+        if not model_path.exists() or not scaler_path.exists() or not self.available():
+            return None
+        from tensorflow import keras
+
+        model = keras.models.load_model(str(model_path), compile=False)
+        scaler_data = joblib.load(scaler_path)
+        bundle = {"model": model, "scaler": scaler_data["scaler"], "numeric_cols": scaler_data["numeric_cols"]}
+        return bundle, scaler_data["numeric_cols"], scaler_data.get("metrics", {})
+
+
+BACKENDS: dict[str, ModelBackend] = {
+    "rf": SklearnBackend(
+        "rf",
+        "random_forest",
+        _random_forest,
+        param_grid=[
+            {"n_estimators": 100, "max_depth": 8},
+            {},
+            {"n_estimators": 200, "max_depth": None, "min_samples_leaf": 3},
+        ],
+    ),
+    "lr": LinearBackend("lr", "linear_regression", LinearRegression),
+    "hgb": HistGradientBoostingBackend(
+        "hgb",
+        "hist_gradient_boosting",
+        _hist_gradient_boosting,
+        param_grid=[
+            {},
+            {"learning_rate": 0.05, "max_iter": 400},
+            {"max_leaf_nodes": 15, "l2_regularization": 1.0},
+        ],
+    ),
+    "lstm": LSTMBackend(),
+}
+
+
+def get_backend(name: str) -> ModelBackend | None:
+    return BACKENDS.get(name)
+
+
+def configured_backends() -> list[ModelBackend]:
+    """Ensemble members listed in settings that are known and installed"""
+    backends = []
+    for name in settings.ensemble_backends:
+        backend = BACKENDS.get(name)
+        if backend is not None and backend.available():
+            backends.append(backend)
+    return backends
@@ -0,0 +1,258 @@
+from __future__ import annotations
+
+import zlib
+from datetime import datetime, timedelta
+from heapq import merge
+from itertools import groupby
+from typing import Any, Iterable, Iterator
+
+import numpy as np
+from bson import ObjectId
+from pymongo import ASCENDING, DESCENDING
+
+from ..config import get_settings
+from ..db import get_collection
+from .training_data import CLEAN_FILTER, VALUE_FIELDS, chunked, epoch_ns
+
+settings = get_settings()
+
+COLD_COLLECTION = "readings_cold"
+TEXT_FIELDS = ("state", "district")
+# Coordinates need more than the measurement precision to place a station.
+COORDINATE_DECIMALS = 6
+# Derived fields such as aqi and category are recomputed on read, so they are not sealed.
+_SEAL_PROJECTION = {field: 1 for field in ("_id", "city", "timestamp", *TEXT_FIELDS, *VALUE_FIELDS)}
+# Below the SQLite store's limit for pushing an $in list down to SQL.
+_DELETE_BATCH = 500
+
+_EPOCH = datetime(1970, 1, 1)
+_US_PER_DAY = 86_400 * 1_000_000
+
+
+class ColdBlockError(ValueError):
+    """A sealed block that cannot be decoded"""
+
+
+def _zigzag(values: np.ndarray) -> np.ndarray:
+    return ((values << 1) ^ (values >> 63)).view(np.uint64)
+
+
+def _unzigzag(values: np.ndarray) -> np.ndarray:
+    return (values >> np.uint64(1)).view(np.int64) ^ -(values & np.uint64(1)).view(np.int64)
+
+
+def _pack(values: np.ndarray) -> bytes:
+    return zlib.compress(_zigzag(values.astype(np.int64)).tobytes(), settings.cold_compression_level)
+
+
+def _unpack(data: bytes) -> np.ndarray:
+    return _unzigzag(np.frombuffer(zlib.decompress(data), dtype=np.uint64))
+
+
+def _microseconds(value: Any) -> int:
+    return epoch_ns(value) // 1_000
+
+
+def _datetimes(microseconds: np.ndarray) -> list[datetime]:
+    return microseconds.astype("datetime64[us]").astype(object).tolist()
+
+
+def encode_block(docs: list[dict[str, Any]]) -> dict[str, Any]:
+    """One city-day of readings as delta-of-delta timestamps and delta-coded quantized values"""
+    docs = sorted(docs, key=lambda doc: _microseconds(doc.get("timestamp")))
+    stamps = np.array([_microseconds(doc.get("timestamp")) for doc in docs], dtype=np.int64)
+    deltas = np.diff(stamps, prepend=stamps[0])
+
+    fields: dict[str, bytes] = {}
+    scales: dict[str, int] = {}
+    missing: dict[str, bytes] = {}
+    for field in VALUE_FIELDS:
+        raw = np.array([np.nan if doc.get(field) is None else doc[field] for doc in docs], dtype=np.float64)
+        absent = np.isnan(raw)
+        if absent.all():
+            continue
+        decimals = COORDINATE_DECIMALS if field in ("latitude", "longitude") else settings.cold_decimals
+        scale = scales[field] = 10**decimals
+        quantized = np.round(np.where(absent, 0.0, raw) * scale).astype(np.int64)
+        fields[field] = _pack(np.diff(quantized, prepend=0))
+        if absent.any():
+            missing[field] = zlib.compress(np.packbits(absent).tobytes())
+
+    text: dict[str, Any] = {}
+    for field in TEXT_FIELDS:
+        values = [doc.get(field) for doc in docs]
+        distinct = list(dict.fromkeys(values))
+        text[field] = {"values": distinct}
+        if len(distinct) > 1:
+            index = {value: code for code, value in enumerate(distinct)}
+            text[field]["codes"] = _pack(np.array([index[value] for value in values]))
+
+    return {
+        "count": len(docs),
+        "start": _datetimes(stamps[:1])[0],
+        "end": _datetimes(stamps[-1:])[0],
+        "scales": scales,
+        "t0": int(stamps[0]),
+        "timestamps": _pack(np.diff(deltas, prepend=0)),
+        "fields": fields,
+        "missing": missing,
+        "text": text,
+        # Original ids keep /history row ids stable across sealing.
+        "ids": zlib.compress(b"".join(doc.get("_id", ObjectId()).binary for doc in docs)),
+    }
+
+
+def decode_block(block: dict[str, Any], start: datetime | None = None, end: datetime | None = None) -> list[dict[str, Any]]:
+    """Rows of a sealed block inside [start, end), oldest first"""
+    count = block["count"]
+    stamps = block["t0"] + np.cumsum(np.cumsum(_unpack(block["timestamps"])))
+    keep = np.ones(count, dtype=bool)
+    if start is not None:
+        keep &= stamps >= _microseconds(start)
+    if end is not None:
+        keep &= stamps < _microseconds(end)
+    rows = np.flatnonzero(keep)
+    if not len(rows):
+        return []
+
+    columns: dict[str, list[Any]] = {"timestamp": _datetimes(stamps[rows])}
+    # Blocks sealed before per-field scales share one "scale" across every field.
+    scales = block.get("scales") or dict.fromkeys(block["fields"], block.get("scale"))
+    for field, data in block["fields"].items():
+        values = np.cumsum(_unpack(data))[rows] / scales[field]
+        if field in block["missing"]:
+            absent = np.unpackbits(np.frombuffer(zlib.decompress(block["missing"][field]), dtype=np.uint8))[:count]
+            columns[field] = [None if gap else value for value, gap in zip(values.tolist(), absent[rows].tolist())]
+        else:
+            columns[field] = values.tolist()
+    for field, encoded in block["text"].items():
+        if "codes" in encoded:
+            columns[field] = [encoded["values"][code] for code in _unpack(encoded["codes"])[rows].tolist()]
+        else:
+            columns[field] = encoded["values"] * len(rows)
+
+    ids = np.frombuffer(zlib.decompress(block["ids"]), dtype="V12")[rows]
+    columns["_id"] = [ObjectId(value.tobytes()) for value in ids]
+
+    city = block["city"]
+    names = list(columns)
+    return [{"city": city, **dict(zip(names, row))} for row in zip(*columns.values())]
+
+
+def _day_start(value: datetime) -> datetime:
+    return _EPOCH + timedelta(microseconds=_microseconds(value) // _US_PER_DAY * _US_PER_DAY)
+
+
+def _seal_day(city: str, day: datetime, docs: list[dict[str, Any]]) -> None:
+    cold = get_collection(COLD_COLLECTION)
+    existing = cold.find_one({"city": city, "day": day})
+    if existing is not None:
+        # Late readings for a sealed day are merged into its block. Rows already sealed keep their
+        # block entry, so re-sealing after a failed delete does not duplicate them.
+        sealed = decode_block(existing)
+        ids = {doc["_id"] for doc in sealed}
+        docs = sealed + [doc for doc in docs if doc.get("_id") is None or doc["_id"] not in ids]
+    block = encode_block(docs)
+    cold.update_one(
+        {"city": city, "day": day},
+        {"$set": {**block, "sealed_at": datetime.utcnow()}},
+        upsert=True,
+    )
+    readings = get_collection("readings")
+    # A day holds thousands of readings; bounded $in lists stay index lookups on every store.
+    for batch in chunked([doc["_id"] for doc in docs if doc.get("_id") is not None], _DELETE_BATCH):
+        readings.delete_many({"_id": {"$in": batch}})
+
+
+def seal_cold_readings() -> dict[str, int]:
+    """Move clean readings from days older than `cold_after_days` into compressed blocks"""
+    cutoff = _day_start(datetime.utcnow() - timedelta(days=settings.cold_after_days))
+    readings = get_collection("readings")
+    query = {"timestamp": {"$lt": cutoff}, **CLEAN_FILTER}
+    sealed = blocks = 0
+    for city in readings.distinct("city", query):
+        day: datetime | None = None
+        pending: list[dict[str, Any]] = []
+        cursor = (
+            readings.find({**query, "city": city}, _SEAL_PROJECTION)
+            .sort("timestamp", ASCENDING)
+            .batch_size(settings.training_chunk_size)
+        )
+        for batch in chunked(cursor, settings.training_chunk_size):
+            for doc in batch:
+                doc_day = _day_start(doc["timestamp"])
+                if doc_day != day and pending:
+                    _seal_day(city, day, pending)
+                    sealed, blocks, pending = sealed + len(pending), blocks + 1, []
+                day = doc_day
+                pending.append(doc)
+        if pending:
+            _seal_day(city, day, pending)
+            sealed, blocks = sealed + len(pending), blocks + 1
+    return {"sealed": sealed, "blocks": blocks}
+
+
+def _block_query(filter: dict[str, Any] | None) -> tuple[dict[str, Any], datetime | None, datetime | None]:
+    """Query for the blocks overlapping a readings filter's city and timestamp range"""
+    filter = filter or {}
+    condition = filter.get("timestamp")
+    start = end = None
+    if isinstance(condition, dict):
+        start, end = condition.get("$gte"), condition.get("$lt")
+        if "$gt" in condition:
+            start = condition["$gt"] + timedelta(microseconds=1)
+        if "$lte" in condition:
+            end = condition["$lte"] + timedelta(microseconds=1)
+    query: dict[str, Any] = {}
+    if "city" in filter:
+        query["city"] = filter["city"]
+    if start is not None:
+        query["end"] = {"$gte": start}
+    if end is not None:
+        query["start"] = {"$lt": end}
+    return query, start, end
+
+
+def _decode_checked(block: dict[str, Any], start: datetime | None, end: datetime | None) -> list[dict[str, Any]]:
+    try:
+        return decode_block(block, start, end)
+    except Exception as exc:
+        message = f"Cannot decode cold block {block.get('city')} {block.get('day')}: {exc!r}"
+        print(f"WARNING: {message}")
+        raise ColdBlockError(message) from exc
+
+
+def iter_cold_readings(filter: dict[str, Any] | None = None, newest_first: bool = False) -> Iterator[dict[str, Any]]:
+    """Sealed readings matching a city/time filter, decoding only overlapping blocks"""
+    # Only clean readings are sealed, so filters on anything else match nothing cold.
+    extra = set(filter or {}) - {"city", "timestamp", "flagged"}
+    if extra or (filter or {}).get("flagged", CLEAN_FILTER["flagged"]) != CLEAN_FILTER["flagged"]:
+        return
+    query, start, end = _block_query(filter)
+    # A missing cold collection reads as empty on every store, so nothing here is swallowed.
+    cursor = get_collection(COLD_COLLECTION).find(query).sort("day", DESCENDING if newest_first else ASCENDING)
+    # Blocks of one day interleave across cities, so each day is merged before it is yielded.
+    for _, blocks in groupby(cursor, key=lambda block: block["day"]):
+        decoded = [_decode_checked(block, start, end) for block in blocks]
+        if newest_first:
+            decoded = [docs[::-1] for docs in decoded]
+        yield from merge(*decoded, key=lambda doc: doc["timestamp"], reverse=newest_first)
+
+
+def with_cold_readings(
+    hot: Iterable[dict[str, Any]], filter: dict[str, Any] | None = None, newest_first: bool = False
+) -> Iterator[dict[str, Any]]:
+    """Merge a timestamp-sorted hot cursor with the sealed readings matching the same filter"""
+    return merge(
+        hot,
+        iter_cold_readings(filter, newest_first),
+        key=lambda doc: epoch_ns(doc.get("timestamp")),
+        reverse=newest_first,
+    )
+
+
+def cold_cities(filter: dict[str, Any] | None = None) -> list[str]:
+    try:
+        return get_collection(COLD_COLLECTION).distinct("city", _block_query(filter)[0])
+    except Exception:
+        return []
@@ -0,0 +1,209 @@
+from __future__ import annotations
+
+import threading
+from typing import Any, Iterable, TypedDict
+
+import numpy as np
+
+from ..config import get_settings
+from . import snapshot
+from .aqi import category_for
+from .geojson import get_map_geojson
+
+settings = get_settings()
+
+
+class DistrictSummary(TypedDict):
+    district: str
+    state: str | None
+    aqi: int | None
+    max_aqi: int | None
+    stations: int
+    category: str | None
+    color: str | None
+    updated_at: str | None
+
+
+def _closed(ring: Any) -> np.ndarray:
+    points = np.asarray(ring, dtype=np.float64)[:, :2]
+    if len(points) and np.any(points[0] != points[-1]):
+        points = np.vstack([points, points[:1]])
+    return points
+
+
+def _polygons(geometry: dict[str, Any] | None) -> list[list[Any]]:
+    if not geometry:
+        return []
+    if geometry.get("type") == "Polygon":
+        return [geometry["coordinates"]]
+    if geometry.get("type") == "MultiPolygon":
+        return list(geometry["coordinates"])
+    return []
+
+
+def _contains(rings: list[np.ndarray], x: float, y: float) -> bool:
+    """Even-odd ray casting over every ring, so holes fall out naturally"""
+    inside = False
+    for ring in rings:
+        x0, y0 = ring[:-1, 0], ring[:-1, 1]
+        x1, y1 = ring[1:, 0], ring[1:, 1]
+        crosses = (y0 > y) != (y1 > y)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            edge_x = x0 + (y - y0) * (x1 - x0) / (y1 - y0)
+        if np.count_nonzero(crosses & (x < edge_x)) % 2:
+            inside = not inside
+    return inside
+
+
+class DistrictIndex:
+    """Bounding-box grid over district polygons, refined with point-in-polygon"""
+
+    def __init__(self, collection: dict[str, Any], grid_size: int):
+        self.names: list[str] = []
+        self.states: list[str | None] = []
+        self.parts: list[tuple[int, list[np.ndarray], np.ndarray]] = []
+        for feature in collection.get("features", []):
+            properties = feature.get("properties") or {}
+            polygons = _polygons(feature.get("geometry"))
+            if not polygons:
+                continue
+            owner = len(self.names)
+            self.names.append(properties.get("district") or properties.get("name") or f"district-{owner}")
+            self.states.append(properties.get("state"))
+            for polygon in polygons:
+                rings = [_closed(ring) for ring in polygon if len(ring)]
+                if rings:
+                    outer = rings[0]
+                    bbox = np.concatenate([outer.min(axis=0), outer.max(axis=0)])
+                    self.parts.append((owner, rings, bbox))
+
+        self.grid_size = max(1, grid_size)
+        self.cells: dict[tuple[int, int], list[int]] = {}
+        if not self.parts:
+            self.origin = np.zeros(2)
+            self.cell = np.ones(2)
+            return
+        boxes = np.array([bbox for _, _, bbox in self.parts])
+        self.origin = boxes[:, :2].min(axis=0)
+        extent = np.maximum(boxes[:, 2:].max(axis=0) - self.origin, 1e-9)
+        self.cell = extent / self.grid_size
+        for position, (_, _, bbox) in enumerate(self.parts):
+            low = self._cell_of(bbox[0], bbox[1])
+            high = self._cell_of(bbox[2], bbox[3])
+            for i in range(low[0], high[0] + 1):
+                for j in range(low[1], high[1] + 1):
+                    self.cells.setdefault((i, j), []).append(position)
+
+    def _cell_of(self, x: float, y: float) -> tuple[int, int]:
+        i, j = ((np.array([x, y]) - self.origin) // self.cell).astype(int)
+        last = self.grid_size - 1
+        return min(max(int(i), 0), last), min(max(int(j), 0), last)
+
+    def locate(self, longitude: float, latitude: float) -> int | None:
+        for position in self.cells.get(self._cell_of(longitude, latitude), []):
+            owner, rings, bbox = self.parts[position]
+            if bbox[0] <= longitude <= bbox[2] and bbox[1] <= latitude <= bbox[3]:
+                if _contains(rings, longitude, latitude):
+                    return owner
+        return None
+
+
+_lock = threading.Lock()
+_index: DistrictIndex | None = None
+# Station coordinates are fixed, so each one is located at most once.
+_station_districts: dict[tuple[float, float], int | None] = {}
+# district -> city -> (aqi, timestamp) of that station's latest reading
+_stations: dict[int, dict[str, tuple[int, str | None]]] = {}
+_city_districts: dict[str, int | None] = {}
+_summaries: dict[int, DistrictSummary] = {}
+
+
+def get_index() -> DistrictIndex:
+    global _index
+    if _index is None:
+        _index = DistrictIndex(get_map_geojson(), settings.district_grid_size)
+    return _index
+
+
+def _locate(latitude: Any, longitude: Any) -> int | None:
+    try:
+        key = (float(latitude), float(longitude))
+    except (TypeError, ValueError):
+        return None
+    if key not in _station_districts:
+        _station_districts[key] = get_index().locate(key[1], key[0])
+    return _station_districts[key]
+
+
+def district_for(latitude: Any, longitude: Any) -> str | None:
+    owner = _locate(latitude, longitude)
+    return None if owner is None else get_index().names[owner]
+
+
+def _summarize(owner: int) -> DistrictSummary:
+    index = get_index()
+    stations = _stations.get(owner, {})
+    values = [aqi for aqi, _ in stations.values()]
+    if not values:
+        return DistrictSummary(
+            district=index.names[owner],
+            state=index.states[owner],
+            aqi=None,
+            max_aqi=None,
+            stations=0,
+            category=None,
+            color=None,
+            updated_at=None,
+        )
+    mean = int(round(sum(values) / len(values)))
+    category = category_for(mean)
+    return DistrictSummary(
+        district=index.names[owner],
+        state=index.states[owner],
+        aqi=mean,
+        max_aqi=max(values),
+        stations=len(values),
+        category=category.name,
+        color=category.color,
+        updated_at=max((timestamp for _, timestamp in stations.values() if timestamp), default=None),
+    )
+
+
+def observe(readings: Iterable[dict[str, Any]]) -> None:
+    """Fold the latest reading of each station into its district's aggregate"""
+    changed: set[int] = set()
+    with _lock:
+        for reading in readings:
+            owner = _locate(reading.get("latitude"), reading.get("longitude"))
+            city = reading.get("city", "Unknown")
+            # A station that moved out of a district stops counting towards it.
+            previous = _city_districts.get(city)
+            if previous is not None and previous != owner:
+                _stations[previous].pop(city, None)
+                changed.add(previous)
+            _city_districts[city] = owner
+            if owner is None:
+                continue
+            _stations.setdefault(owner, {})[city] = (int(reading.get("aqi") or 0), reading.get("timestamp"))
+            changed.add(owner)
+        for owner in changed:
+            _summaries[owner] = _summarize(owner)
+    snapshot.bump("district", (get_index().names[owner] for owner in changed))
+
+
+def get_district_summaries(since: int | None = None) -> dict[str, Any]:
+    index = get_index()
+    version = snapshot.current_version()
+    names = None
+    if since is not None and since <= version:
+        names = set(snapshot.changed_since("district", since))
+    with _lock:
+        districts = [
+            _summaries.get(owner) or _summarize(owner)
+            for owner in range(len(index.names))
+            if names is None or index.names[owner] in names
+        ]
+    payload: dict[str, Any] = {"version": version, "districts": districts}
+    if names is not None:
+        payload["since"] = since
+    return payload
@@ -0,0 +1,37 @@
+from __future__ import annotations
+
+import numpy as np
+
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, threshold: int) -> np.ndarray:
+    """Largest-Triangle-Three-Buckets over ascending `x`; keeps both end points"""
+    count = len(x)
+    if threshold >= count or threshold < 3:
+        return np.arange(count)
+
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    # threshold - 2 buckets over the interior points, as [edges[i], edges[i + 1]).
+    edges = np.linspace(1, count - 1, threshold - 1).astype(np.int64)
+    sum_x = np.r_[0.0, np.cumsum(x)]
+    sum_y = np.r_[0.0, np.cumsum(y)]
+    # Mean of each bucket via prefix sums; the final point stands in after the last one.
+    sizes = np.maximum(edges[1:] - edges[:-1], 1)
+    mean_x = np.r_[(sum_x[edges[1:]] - sum_x[edges[:-1]]) / sizes, x[-1]]
+    mean_y = np.r_[(sum_y[edges[1:]] - sum_y[edges[:-1]]) / sizes, y[-1]]
+
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0], selected[-1] = 0, count - 1
+    previous = 0
+    for bucket in range(threshold - 2):
+        start, end = edges[bucket], edges[bucket + 1]
+        if end <= start:
+            end = start + 1
+        # Keep the point forming the largest triangle with the last kept point
+        # and the next bucket's mean.
+        ax, ay = x[previous], y[previous]
+        cx, cy = mean_x[bucket + 1], mean_y[bucket + 1]
+        areas = np.abs((ax - cx) * (y[start:end] - ay) - (ax - x[start:end]) * (cy - ay))
+        previous = start + int(np.argmax(areas))
+        selected[bucket + 1] = previous
+    return selected
@@ -0,0 +1,111 @@
+from __future__ import annotations
+
+import threading
+from collections import deque
+from typing import Any, Iterator
+
+from ..config import get_settings
+from . import snapshot
+from .alerts import get_recent_alerts
+from .aqi import get_category_palette
+from .readings import get_latest_cache, refresh_latest_cache
+
+settings = get_settings()
+
+
+def latest_payload(since: int | None = None) -> dict[str, Any]:
+    """Full snapshot, or only the cities and alerts that changed after `since`"""
+    latest = get_latest_cache()
+    version = snapshot.current_version()
+    payload: dict[str, Any] = {
+        "version": version,
+        "updated_at": latest[0]["timestamp"] if latest else None,
+    }
+    # Versions from before a restart can be ahead of us; answer with everything.
+    if since is None or since > version:
+        payload.update(readings=latest, alerts=get_recent_alerts(), palette=get_category_palette())
+        return payload
+
+    cities = set(snapshot.changed_since("city", since))
+    alert_cities = set(snapshot.changed_since("alert", since))
+    payload.update(
+        since=since,
+        readings=[row for row in latest if row["city"] in cities],
+        alerts=[alert for alert in get_recent_alerts() if alert["city"] in alert_cities] if alert_cities else [],
+    )
+    return payload
+
+
+def _event(version: int, event: str, payload: dict[str, Any]) -> bytes:
+    from ..routes.responses import dumps
+
+    return b"id: %d\nevent: %s\ndata: %s\n\n" % (version, event.encode("utf-8"), dumps(payload))
+
+
+class Broadcaster:
+    """Holds the newest encoded snapshot and a short log of deltas, and wakes every waiting subscriber on change"""
+
+    def __init__(self, log_size: int | None = None) -> None:
+        self._condition = threading.Condition()
+        self.version = -1
+        self.message = b""
+        # (previous version, version, encoded delta), always contiguous: a gap clears it.
+        self._deltas: deque[tuple[int, int, bytes]] = deque(maxlen=log_size or settings.sse_delta_log_size)
+
+    def publish(self, version: int, event: str, payload: dict[str, Any], delta: dict[str, Any] | None = None) -> None:
+        message = _event(version, event, payload)
+        encoded_delta = _event(version, "delta", delta) if delta is not None else None
+        with self._condition:
+            if version <= self.version:
+                return
+            if encoded_delta is not None and delta.get("since") == self.version and delta.get("version") == version:
+                self._deltas.append((self.version, version, encoded_delta))
+            else:
+                self._deltas.clear()
+            self.version = version
+            self.message = message
+            self._condition.notify_all()
+
+    def _catch_up(self, seen: int) -> list[bytes]:
+        """Logged deltas after `seen` when the log reaches back that far, else the full snapshot"""
+        deltas = [entry for entry in self._deltas if entry[1] > seen]
+        if seen >= 0 and deltas and deltas[0][0] == seen:
+            return [message for _, _, message in deltas]
+        return [self.message]
+
+    def wait_newer(self, seen: int, timeout: float) -> tuple[int, list[bytes]] | None:
+        with self._condition:
+            if not self._condition.wait_for(lambda: self.version > seen, timeout=timeout):
+                return None
+            return self.version, self._catch_up(seen)
+
+    def stream(self, last_event_id: int | None = None) -> Iterator[bytes]:
+        # Ids from before a restart can be ahead of us; treat them as a fresh connect.
+        seen = -1 if last_event_id is None or last_event_id > self.version else last_event_id
+        yield f"retry: {settings.sse_retry_ms}\n\n".encode("utf-8")
+        while True:
+            update = self.wait_newer(seen, settings.sse_heartbeat_seconds)
+            if update is None:
+                yield b": keep-alive\n\n"
+                continue
+            seen, messages = update
+            yield from messages
+
+
+broadcaster = Broadcaster()
+
+
+def publish_snapshot() -> None:
+    """Serialize the live snapshot once per version change and fan it out"""
+    version = snapshot.current_version()
+    if version == broadcaster.version:
+        return
+    payload = latest_payload()
+    # Only the cities changed since the last published version, for subscribers already holding it.
+    delta = latest_payload(broadcaster.version) if broadcaster.version >= 0 else None
+    broadcaster.publish(payload["version"], "snapshot", payload, delta)
+
+
+def refresh_and_publish() -> None:
+    refresh_latest_cache()
+    publish_snapshot()
@@ -0,0 +1,203 @@
+from __future__ import annotations
+
+import importlib.util
+import io
+import json
+from datetime import datetime
+from typing import Any, BinaryIO, Iterator
+
+import numpy as np
+import pandas as pd
+from pymongo import ASCENDING
+
+from ..config import get_settings
+from ..db import get_collection
+from .aqi import AQI_SCALE, compute_aqi_array
+from .cold_storage import with_cold_readings
+from .training_data import POLLUTANT_FIELDS, VALUE_FIELDS, chunked, epoch_ns
+
+settings = get_settings()
+
+TEXT_COLUMNS = ("city", "state", "district")
+STORED_COLUMNS = (*TEXT_COLUMNS, "timestamp", *VALUE_FIELDS)
+DERIVED_COLUMNS = ("aqi", "category")
+EXPORT_COLUMNS = (*STORED_COLUMNS, *DERIVED_COLUMNS)
+FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+_CATEGORY_UPPER = np.array([category.range[1] for category in AQI_SCALE])
+_CATEGORY_NAMES = np.array([category.name for category in AQI_SCALE], dtype=object)
+
+
+def parse_columns(raw: str | None) -> list[str]:
+    if not raw:
+        return list(EXPORT_COLUMNS)
+    columns = [column.strip() for column in raw.split(",") if column.strip()]
+    unknown = [column for column in columns if column not in EXPORT_COLUMNS]
+    if unknown:
+        raise ValueError(f"Unknown columns: {', '.join(unknown)}")
+    return columns
+
+
+def _filter(city: str | None, start: datetime | None, end: datetime | None) -> dict[str, Any]:
+    filter: dict[str, Any] = {}
+    if city:
+        filter["city"] = city
+    if start or end:
+        filter["timestamp"] = {
+            **({"$gte": start} if start else {}),
+            **({"$lt": end} if end else {}),
+        }
+    return filter
+
+
+def _numbers(docs: list[dict[str, Any]], field: str) -> np.ndarray:
+    return np.array([np.nan if doc.get(field) is None else doc[field] for doc in docs], dtype=np.float64)
+
+
+def _frame(docs: list[dict[str, Any]], columns: list[str]) -> pd.DataFrame:
+    """One chunk of documents as a frame with a fixed column layout and dtypes"""
+    data: dict[str, Any] = {}
+    aqi = None
+    if any(column in DERIVED_COLUMNS for column in columns):
+        aqi = compute_aqi_array({field: _numbers(docs, field) for field in POLLUTANT_FIELDS})
+    for column in columns:
+        if column == "timestamp":
+            ns = np.fromiter((epoch_ns(doc.get("timestamp")) for doc in docs), dtype=np.int64, count=len(docs))
+            data[column] = pd.to_datetime(ns, unit="ns")
+        elif column in TEXT_COLUMNS:
+            data[column] = pd.array([doc.get(column) for doc in docs], dtype="string")
+        elif column == "aqi":
+            data[column] = aqi
+        elif column == "category":
+            codes = np.minimum(np.searchsorted(_CATEGORY_UPPER, aqi), len(AQI_SCALE) - 1)
+            data[column] = pd.array(_CATEGORY_NAMES[codes], dtype="string")
+        else:
+            data[column] = _numbers(docs, column)
+    return pd.DataFrame(data, columns=columns)
+
+
+def iter_export_frames(
+    city: str | None = None,
+    start: datetime | None = None,
+    end: datetime | None = None,
+    columns: list[str] | None = None,
+    chunk_size: int | None = None,
+) -> Iterator[pd.DataFrame]:
+    """Oldest-first readings as bounded-size frames pulled from a lazy cursor"""
+    columns = columns or list(EXPORT_COLUMNS)
+    chunk_size = chunk_size or settings.export_chunk_size
+    stored = [column for column in columns if column in STORED_COLUMNS]
+    needed = set(stored) | (set(POLLUTANT_FIELDS) if set(columns) & set(DERIVED_COLUMNS) else set())
+    filter = _filter(city, start, end)
+    cursor = (
+        get_collection("readings")
+        .find(filter, {"_id": 0, **{field: 1 for field in needed}})
+        .sort("timestamp", ASCENDING)
+        .batch_size(chunk_size)
+    )
+    for batch in chunked(with_cold_readings(cursor, filter), chunk_size):
+        yield _frame(batch, columns)
+
+
+def ndjson_stream(frames: Iterator[pd.DataFrame]) -> Iterator[bytes]:
+    for frame in frames:
+        records = frame.astype(object).where(frame.notna(), None)
+        if "timestamp" in frame:
+            records["timestamp"] = frame["timestamp"].dt.strftime("%Y-%m-%dT%H:%M:%S.%f")
+        lines = (
+            json.dumps(dict(zip(frame.columns, row)), separators=(",", ":"))
+            for row in records.itertuples(index=False)
+        )
+        yield ("\n".join(lines) + "\n").encode("utf-8")
+
+
+def csv_stream(frames: Iterator[pd.DataFrame], columns: list[str]) -> Iterator[bytes]:
+    header = True
+    header_line = (",".join(columns) + "\n").encode("utf-8")
+    for frame in frames:
+        yield frame.to_csv(index=False, header=header, date_format="%Y-%m-%dT%H:%M:%S.%f").encode("utf-8")
+        header = False
+    if header:
+        yield header_line
+
+
+class _DrainableSink(io.RawIOBase):
+    """Write-only file object whose buffered bytes can be taken between row groups"""
+
+    def __init__(self) -> None:
+        self._parts: list[bytes] = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data: Any) -> int:
+        chunk = bytes(data)
+        self._parts.append(chunk)
+        self._position += len(chunk)
+        return len(chunk)
+
+    def tell(self) -> int:
+        return self._position
+
+    def drain(self) -> bytes:
+        data = b"".join(self._parts)
+        self._parts = []
+        return data
+
+
+def _parquet_schema(columns: list[str]) -> Any:
+    import pyarrow as pa
+
+    types = {column: pa.string() for column in (*TEXT_COLUMNS, "category")}
+    types["timestamp"] = pa.timestamp("ns")
+    return pa.schema([(column, types.get(column, pa.float64())) for column in columns])
+
+
+def parquet_stream(frames: Iterator[pd.DataFrame], columns: list[str]) -> Iterator[bytes]:
+    """One Parquet row group per chunk, emitted as soon as it is encoded"""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = _parquet_schema(columns)
+    sink = _DrainableSink()
+    writer = pq.ParquetWriter(sink, schema)
+    try:
+        for frame in frames:
+            writer.write_table(pa.Table.from_pandas(frame, schema=schema, preserve_index=False))
+            yield sink.drain()
+    finally:
+        writer.close()
+    yield sink.drain()
+
+
+def parquet_available() -> bool:
+    return importlib.util.find_spec("pyarrow") is not None
+
+
+def export_stream(
+    fmt: str,
+    city: str | None = None,
+    start: datetime | None = None,
+    end: datetime | None = None,
+    columns: list[str] | None = None,
+) -> Iterator[bytes]:
+    columns = columns or list(EXPORT_COLUMNS)
+    frames = iter_export_frames(city=city, start=start, end=end, columns=columns)
+    if fmt == "csv":
+        return csv_stream(frames, columns)
+    if fmt == "parquet":
+        return parquet_stream(frames, columns)
+    return ndjson_stream(frames)
+
+
+def write_export(output: BinaryIO, fmt: str, **options: Any) -> int:
+    written = 0
+    for chunk in export_stream(fmt, **options):
+        output.write(chunk)
+        written += len(chunk)
+    return written
@@ -0,0 +1,128 @@
+from __future__ import annotations
+
+import json
+import math
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+
+from ..config import get_settings
+
+settings = get_settings()
+
+_map_geojson_cache: dict[str, Any] | None = None
+
+
+def get_map_geojson() -> dict[str, Any]:
+    global _map_geojson_cache
+    if _map_geojson_cache is None:
+        geo_path = Path(settings.telangana_geojson_path)
+        if not geo_path.exists():
+            _map_geojson_cache = {"type": "FeatureCollection", "features": []}
+        else:
+            _map_geojson_cache = json.loads(geo_path.read_text(encoding="utf-8"))
+    return _map_geojson_cache
+
+
+def _decimals(tolerance: float) -> int:
+    # One digit finer than the tolerance keeps the snapping error well below it.
+    if tolerance <= 0:
+        return 6
+    return min(6, max(0, math.ceil(-math.log10(tolerance)) + 1))
+
+
+def douglas_peucker(points: np.ndarray, tolerance: float) -> np.ndarray:
+    """Mask of the vertices kept by Douglas–Peucker, using an explicit stack"""
+    count = len(points)
+    keep = np.zeros(count, dtype=bool)
+    if count < 3 or tolerance <= 0:
+        keep[:] = True
+        return keep
+    keep[0] = keep[-1] = True
+    stack = [(0, count - 1)]
+    while stack:
+        start, end = stack.pop()
+        if end - start < 2:
+            continue
+        segment = points[end] - points[start]
+        offsets = points[start + 1:end] - points[start]
+        length = math.hypot(segment[0], segment[1])
+        if length == 0:
+            # Closed rings start and end on the same vertex.
+            distances = np.hypot(offsets[:, 0], offsets[:, 1])
+        else:
+            distances = np.abs(segment[0] * offsets[:, 1] - segment[1] * offsets[:, 0]) / length
+        index = int(np.argmax(distances))
+        if distances[index] > tolerance:
+            split = start + 1 + index
+            keep[split] = True
+            stack.append((start, split))
+            stack.append((split, end))
+    return keep
+
+
+def _simplify_line(coordinates: list[Any], tolerance: float, decimals: int, closed: bool) -> list[Any] | None:
+    points = np.asarray(coordinates, dtype=np.float64)[:, :2]
+    points = np.round(points[douglas_peucker(points, tolerance)], decimals)
+    # Quantization can snap neighbouring vertices onto each other.
+    distinct = np.ones(len(points), dtype=bool)
+    distinct[1:] = np.any(points[1:] != points[:-1], axis=1)
+    points = points[distinct]
+    if len(points) < (4 if closed else 2):
+        return None
+    return points.tolist()
+
+
+def _simplify_polygon(rings: list[Any], tolerance: float, decimals: int) -> list[Any] | None:
+    if not rings:
+        return None
+    # Never let a whole district disappear: fall back to the quantized outline.
+    exterior = _simplify_line(rings[0], tolerance, decimals, closed=True) or _simplify_line(
+        rings[0], 0.0, decimals, closed=True
+    )
+    if exterior is None:
+        return None
+    holes = [_simplify_line(ring, tolerance, decimals, closed=True) for ring in rings[1:]]
+    return [exterior, *(hole for hole in holes if hole is not None)]
+
+
+def simplify_geometry(geometry: dict[str, Any] | None, tolerance: float) -> dict[str, Any] | None:
+    if not geometry:
+        return geometry
+    decimals = _decimals(tolerance)
+    kind = geometry.get("type")
+    coordinates = geometry.get("coordinates")
+    if kind == "Polygon":
+        simplified = _simplify_polygon(coordinates, tolerance, decimals)
+    elif kind == "MultiPolygon":
+        parts = [_simplify_polygon(polygon, tolerance, decimals) for polygon in coordinates]
+        simplified = [part for part in parts if part is not None] or None
+    elif kind == "LineString":
+        simplified = _simplify_line(coordinates, tolerance, decimals, closed=False)
+    elif kind == "MultiLineString":
+        lines = [_simplify_line(line, tolerance, decimals, closed=False) for line in coordinates]
+        simplified = [line for line in lines if line is not None] or None
+    elif kind == "GeometryCollection":
+        members = [simplify_geometry(member, tolerance) for member in geometry.get("geometries", [])]
+        return {"type": kind, "geometries": [member for member in members if member]}
+    else:
+        simplified = np.round(np.asarray(coordinates, dtype=np.float64), decimals).tolist()
+    if simplified is None:
+        return None
+    return {"type": kind, "coordinates": simplified}
+
+
+def simplified_variants(tolerances: list[float] | None = None) -> list[tuple[float, dict[str, Any]]]:
+    """The district boundaries at each tolerance (degrees), finest first"""
+    source = get_map_geojson()
+    variants = []
+    for tolerance in sorted(tolerances or settings.geojson_tolerances):
+        features = []
+        for feature in source.get("features", []):
+            geometry = simplify_geometry(feature.get("geometry"), tolerance)
+            if geometry is None:
+                continue
+            features.append({"type": "Feature", "properties": feature.get("properties", {}), "geometry": geometry})
+        variants.append((tolerance, {"type": "FeatureCollection", "features": features}))
+    return variants
@@ -0,0 +1,125 @@
+from __future__ import annotations
+
+import struct
+import threading
+import zlib
+from typing import Any
+
+import numpy as np
+from scipy.spatial import cKDTree
+
+from ..config import get_settings
+from .aqi import AQI_SCALE
+from .readings import get_latest_cache
+
+settings = get_settings()
+
+# Per-resolution neighbour indices and normalized IDW weights, keyed by the
+# station layout they were computed for. Values change far more often than
+# station positions, so a refresh is one gather and one weighted sum.
+_lock = threading.Lock()
+_weights: dict[int, tuple[tuple[Any, ...], np.ndarray, np.ndarray]] = {}
+
+
+def nearest_resolution(requested: int | None) -> int:
+    resolutions = sorted(settings.heatmap_resolutions)
+    if requested is None:
+        return resolutions[len(resolutions) // 2]
+    fitting = [resolution for resolution in resolutions if resolution <= requested]
+    return fitting[-1] if fitting else resolutions[0]
+
+
+def grid_shape(resolution: int) -> tuple[int, int]:
+    lon_min, lat_min, lon_max, lat_max = settings.heatmap_bounds
+    height = max(1, round(resolution * (lat_max - lat_min) / (lon_max - lon_min)))
+    return height, resolution
+
+
+def _project(longitude: np.ndarray, latitude: np.ndarray) -> np.ndarray:
+    # Equirectangular projection is plenty at state scale and keeps the tree 2-D.
+    lon_min, lat_min, lon_max, lat_max = settings.heatmap_bounds
+    scale = np.cos(np.radians((lat_min + lat_max) / 2))
+    return np.column_stack([longitude * scale, latitude])
+
+
+def _cell_centres(resolution: int) -> np.ndarray:
+    lon_min, lat_min, lon_max, lat_max = settings.heatmap_bounds
+    height, width = grid_shape(resolution)
+    longitude = lon_min + (np.arange(width) + 0.5) * (lon_max - lon_min) / width
+    # Row 0 is the northern edge so the grid reads like an image.
+    latitude = lat_max - (np.arange(height) + 0.5) * (lat_max - lat_min) / height
+    lon_grid, lat_grid = np.meshgrid(longitude, latitude)
+    return _project(lon_grid.ravel(), lat_grid.ravel())
+
+
+def _neighbour_weights(resolution: int, layout: tuple[Any, ...], stations: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    with _lock:
+        cached = _weights.get(resolution)
+        if cached is not None and cached[0] == layout:
+            return cached[1], cached[2]
+
+    neighbours = min(settings.heatmap_neighbors, len(stations))
+    distances, indices = cKDTree(stations).query(_cell_centres(resolution), k=neighbours)
+    if neighbours == 1:
+        distances, indices = distances[:, None], indices[:, None]
+    with np.errstate(divide="ignore"):
+        weights = 1.0 / np.power(distances, settings.heatmap_power)
+    # A cell centred exactly on a station takes that station's value.
+    exact = ~np.isfinite(weights)
+    weights[exact.any(axis=1)] = 0.0
+    weights[exact] = 1.0
+    weights /= weights.sum(axis=1, keepdims=True)
+
+    with _lock:
+        _weights[resolution] = (layout, indices, weights)
+    return indices, weights
+
+
+def located_readings() -> list[dict[str, Any]]:
+    """Latest readings with usable coordinates, the stations a grid is interpolated from"""
+    return [row for row in get_latest_cache() if row.get("latitude") or row.get("longitude")]
+
+
+def aqi_grid(resolution: int) -> np.ndarray | None:
+    """IDW-interpolated AQI over the configured bounding box, north row first"""
+    latest = located_readings()
+    if not latest:
+        return None
+    layout = tuple((row["city"], row["latitude"], row["longitude"]) for row in latest)
+    stations = _project(
+        np.array([row["longitude"] for row in latest], dtype=np.float64),
+        np.array([row["latitude"] for row in latest], dtype=np.float64),
+    )
+    values = np.array([row["aqi"] for row in latest], dtype=np.float64)
+    indices, weights = _neighbour_weights(resolution, layout, stations)
+    return (weights * values[indices]).sum(axis=1).reshape(grid_shape(resolution))
+
+
+def encode_grid(grid: np.ndarray) -> bytes:
+    """Row-major little-endian uint16 AQI values"""
+    return np.clip(np.round(grid), 0, np.iinfo(np.uint16).max).astype("<u2").tobytes()
+
+
+def _png_chunk(tag: bytes, data: bytes) -> bytes:
+    return struct.pack(">I", len(data)) + tag + data + struct.pack(">I", zlib.crc32(tag + data) & 0xFFFFFFFF)
+
+
+def render_png(grid: np.ndarray, alpha: int = 160) -> bytes:
+    """Colour each cell with its AQI category and encode an RGBA PNG"""
+    upper = np.array([category.range[1] for category in AQI_SCALE])
+    palette = np.array(
+        [[int(category.color[i:i + 2], 16) for i in (1, 3, 5)] + [alpha] for category in AQI_SCALE],
+        dtype=np.uint8,
+    )
+    codes = np.minimum(np.searchsorted(upper, np.round(grid)), len(AQI_SCALE) - 1)
+    rgba = palette[codes]
+    height, width = grid.shape
+    # Every scanline starts with filter type 0 (none).
+    scanlines = np.hstack([np.zeros((height, 1), dtype=np.uint8), rgba.reshape(height, width * 4)])
+    header = struct.pack(">IIBBBBB", width, height, 8, 6, 0, 0, 0)
+    return (
+        b"\x89PNG\r\n\x1a\n"
+        + _png_chunk(b"IHDR", header)
+        + _png_chunk(b"IDAT", zlib.compress(scanlines.tobytes(), 6))
+        + _png_chunk(b"IEND", b"")
+    )
@@ -0,0 +1,186 @@
+from __future__ import annotations
+
+from typing import Any, Callable, Iterable
+
+import numpy as np
+import pandas as pd
+from sklearn.linear_model import LinearRegression
+
+ChunkFactory = Callable[[], Iterable[tuple[pd.DataFrame, np.ndarray]]]
+
+
+class ReservoirSample:
+    """Fixed-capacity uniform sample over an unbounded stream of row chunks"""
+
+    def __init__(self, capacity: int, seed: int = 42):
+        self.capacity = capacity
+        self.seen = 0
+        self.columns: list[str] = []
+        self._features: np.ndarray | None = None
+        self._target = np.empty(capacity, dtype=np.float64)
+        self._rng = np.random.default_rng(seed)
+
+    def add(self, features: pd.DataFrame, target: np.ndarray) -> None:
+        values = features.to_numpy(dtype=np.float64)
+        if self._features is None:
+            self.columns = features.columns.tolist()
+            self._features = np.empty((self.capacity, values.shape[1]), dtype=np.float64)
+
+        filled = min(self.seen, self.capacity)
+        take = min(self.capacity - filled, len(values))
+        if take:
+            self._features[filled:filled + take] = values[:take]
+            self._target[filled:filled + take] = target[:take]
+
+        rest = len(values) - take
+        if rest > 0:
+            positions = self.seen + take + np.arange(rest)
+            slots = (self._rng.random(rest) * (positions + 1)).astype(np.int64)
+            keep = slots < self.capacity
+            self._features[slots[keep]] = values[take:][keep]
+            self._target[slots[keep]] = target[take:][keep]
+        self.seen += len(values)
+
+    def frame(self) -> tuple[pd.DataFrame, np.ndarray]:
+        size = min(self.seen, self.capacity)
+        if self._features is None:
+            return pd.DataFrame(), np.empty(0)
+        return pd.DataFrame(self._features[:size], columns=self.columns), self._target[:size].copy()
+
+
+def reservoir_sample(chunks: ChunkFactory, capacity: int) -> tuple[pd.DataFrame, np.ndarray]:
+    sample = ReservoirSample(capacity)
+    for features, target in chunks():
+        sample.add(features, target)
+    return sample.frame()
+
+
+def fit_normal_equations(chunks: ChunkFactory) -> LinearRegression:
+    """Exact least squares from streamed X'X / X'y sufficient statistics"""
+    gram: np.ndarray | None = None
+    moment: np.ndarray | None = None
+    columns: list[str] = []
+    for features, target in chunks():
+        design = np.hstack([features.to_numpy(dtype=np.float64), np.ones((len(features), 1))])
+        if gram is None:
+            columns = features.columns.tolist()
+            gram = np.zeros((design.shape[1], design.shape[1]))
+            moment = np.zeros(design.shape[1])
+        gram += design.T @ design
+        moment += design.T @ target
+    if gram is None:
+        raise ValueError("No rows to fit")
+
+    solution = np.linalg.lstsq(gram, moment, rcond=None)[0]
+    model = LinearRegression()
+    model.coef_ = solution[:-1]
+    model.intercept_ = float(solution[-1])
+    model.n_features_in_ = len(columns)
+    model.feature_names_in_ = np.asarray(columns, dtype=object)
+    return model
+
+
+class HistogramCells:
+    """Accumulates rows into quantile-binned cells holding target and feature sums"""
+
+    def __init__(self, edges: list[np.ndarray], max_cells: int):
+        self.edges = edges
+        self.max_cells = max_cells
+        self.shifts = np.zeros(len(edges), dtype=np.uint8)
+        self.codes = np.empty((0, len(edges)), dtype=np.uint8)
+        self.target_sum = np.empty(0)
+        self.feature_sum = np.empty((0, len(edges)))
+        self.count = np.empty(0)
+
+    @classmethod
+    def from_sample(cls, sample: pd.DataFrame, max_bins: int, max_cells: int) -> HistogramCells:
+        quantiles = np.linspace(0, 1, max_bins + 1)[1:-1]
+        edges = [
+            np.unique(np.quantile(sample[column].to_numpy(dtype=np.float64), quantiles))
+            for column in sample.columns
+        ]
+        return cls(edges, max_cells)
+
+    def _encode(self, values: np.ndarray) -> np.ndarray:
+        codes = np.empty(values.shape, dtype=np.uint8)
+        for i, edges in enumerate(self.edges):
+            codes[:, i] = np.searchsorted(edges, values[:, i], side="right") >> self.shifts[i]
+        return codes
+
+    def _reduce(self, codes: np.ndarray, target_sum: np.ndarray, feature_sum: np.ndarray, count: np.ndarray) -> None:
+        keys = np.ascontiguousarray(codes).view(np.dtype((np.void, codes.shape[1]))).ravel()
+        _, first, inverse = np.unique(keys, return_index=True, return_inverse=True)
+        cells = len(first)
+        self.codes = codes[first]
+        self.target_sum = np.bincount(inverse, weights=target_sum, minlength=cells)
+        self.count = np.bincount(inverse, weights=count, minlength=cells)
+        self.feature_sum = np.column_stack([
+            np.bincount(inverse, weights=feature_sum[:, i], minlength=cells)
+            for i in range(codes.shape[1])
+        ])
+
+    def _coarsen(self) -> bool:
+        # Merge neighbouring bins of every multi-bin feature until the cell budget fits.
+        coarsenable = np.array([len(edges) >> shift >= 3 for edges, shift in zip(self.edges, self.shifts)])
+        if not coarsenable.any():
+            return False
+        self.shifts[coarsenable] += 1
+        codes = self.codes.copy()
+        codes[:, coarsenable] >>= 1
+        self._reduce(codes, self.target_sum, self.feature_sum, self.count)
+        return True
+
+    def add(self, features: pd.DataFrame, target: np.ndarray) -> None:
+        values = features.to_numpy(dtype=np.float64)
+        self._reduce(
+            np.vstack([self.codes, self._encode(values)]),
+            np.concatenate([self.target_sum, target]),
+            np.vstack([self.feature_sum, values]),
+            np.concatenate([self.count, np.ones(len(values))]),
+        )
+        while len(self.count) > self.max_cells and self._coarsen():
+            pass
+
+    def training_set(self, columns: list[str]) -> tuple[pd.DataFrame, np.ndarray, np.ndarray]:
+        """Cell-mean features and targets, weighted by how many rows fell in each cell"""
+        count = self.count
+        features = pd.DataFrame(self.feature_sum / count[:, None], columns=columns)
+        return features, self.target_sum / count, count
+
+
+def fit_histogram_cells(
+    model: Any, chunks: ChunkFactory, max_bins: int, max_cells: int, sample_rows: int
+) -> Any:
+    sample, _ = reservoir_sample(chunks, sample_rows)
+    if sample.empty:
+        raise ValueError("No rows to fit")
+    columns = sample.columns.tolist()
+    cells = HistogramCells.from_sample(sample, max_bins, max_cells)
+    del sample
+    for features, target in chunks():
+        cells.add(features, target)
+    features, target, weight = cells.training_set(columns)
+    model.fit(features, target, sample_weight=weight)
+    return model
+
+
+def streaming_metrics(predict: Callable[[pd.DataFrame], np.ndarray], chunks: ChunkFactory) -> dict[str, float]:
+    """r2/MAE/RMSE accumulated chunk by chunk in constant memory"""
+    rows = 0
+    target_sum = target_sq_sum = abs_error = sq_error = 0.0
+    for features, target in chunks():
+        errors = target - predict(features)
+        rows += len(target)
+        target_sum += float(target.sum())
+        target_sq_sum += float(np.square(target).sum())
+        abs_error += float(np.abs(errors).sum())
+        sq_error += float(np.square(errors).sum())
+    if rows == 0:
+        return {"r2": 0.0, "mae": 0.0, "rmse": 0.0, "rows": 0}
+    total = target_sq_sum - target_sum ** 2 / rows
+    return {
+        "r2": float(1 - sq_error / total) if total > 0 else 0.0,
+        "mae": abs_error / rows,
+        "rmse": float(np.sqrt(sq_error / rows)),
+        "rows": rows,
+    }
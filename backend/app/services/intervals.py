@@ -0,0 +1,66 @@
+from __future__ import annotations
+
+import weakref
+from typing import Any, Sequence
+
+import numpy as np
+
+
+DEFAULT_QUANTILES: tuple[float, float] = (0.1, 0.9)
+
+# Flattened leaf-value tables, built once per fitted forest, with the estimators they were built from.
+_leaf_tables: weakref.WeakKeyDictionary[Any, tuple[list[Any], np.ndarray, np.ndarray]] = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def supports_intervals(model: Any) -> bool:
+    return hasattr(model, "estimators_") and hasattr(model, "apply")
+
+
+def _leaf_table(model: Any) -> tuple[np.ndarray, np.ndarray]:
+    """Concatenate every tree's node values so leaves can be gathered in one shot"""
+    cached = _leaf_tables.get(model)
+    # A refit replaces `estimators_`, which makes the old table stale.
+    if cached is not None and cached[0] is model.estimators_:
+        return cached[1], cached[2]
+
+    trees = [estimator.tree_ for estimator in model.estimators_]
+    offsets = np.zeros(len(trees), dtype=np.int64)
+    if len(trees) > 1:
+        offsets[1:] = np.cumsum([tree.node_count for tree in trees[:-1]])
+    values = np.concatenate([tree.value[:, 0, 0] for tree in trees]).astype(np.float64)
+
+    _leaf_tables[model] = (model.estimators_, offsets, values)
+    return offsets, values
+
+
+def per_tree_predictions(model: Any, features: Any) -> np.ndarray:
+    """Return an (n_samples, n_trees) matrix from a single batched `apply` call"""
+    leaves = model.apply(features)
+    offsets, values = _leaf_table(model)
+    return values[leaves + offsets]
+
+
+def parse_quantiles(raw: str | None) -> tuple[float, float]:
+    if not raw:
+        return DEFAULT_QUANTILES
+    try:
+        low, high = (float(part) for part in raw.split(","))
+    except ValueError:
+        raise ValueError("quantiles must be two comma-separated numbers, e.g. 0.1,0.9") from None
+    if not 0.0 <= low < high <= 1.0:
+        raise ValueError("quantiles must satisfy 0 <= low < high <= 1")
+    return low, high
+
+
+def predict_with_intervals(
+    model: Any,
+    features: Any,
+    quantiles: Sequence[float] = DEFAULT_QUANTILES,
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Point prediction plus lower/upper quantiles of the per-tree spread"""
+    per_tree = per_tree_predictions(model, features)
+    point = per_tree.mean(axis=1)
+    lower, upper = np.quantile(per_tree, quantiles, axis=1)
+    return point, lower, upper
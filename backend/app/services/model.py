@@ -12,7 +12,10 @@ from sklearn.metrics import mean_absolute_error, r2_score
 
 from ..config import get_settings
 from ..db import get_collection
-from .readings import get_latest_cache, get_recent_history
+from .backends import get_backend
+from .intervals import DEFAULT_QUANTILES, predict_with_intervals, supports_intervals
+from .readings import get_latest_cache
+from .training_data import load_training_frame
 
 settings = get_settings()
 
@@ -22,16 +25,8 @@ def _model_path() -> Path:
     return settings.models_dir / settings.model_filename
 
 
-def _load_dataframe(limit: int = 1000) -> pd.DataFrame | None:
-    history = get_recent_history(limit=limit)
-    if len(history) < 50:
-        return None
-    df = pd.DataFrame(history)
-    df["timestamp"] = pd.to_datetime(df["timestamp"])
-    df["hour"] = df["timestamp"].dt.hour
-    df["dayofweek"] = df["timestamp"].dt.dayofweek
-    df = pd.get_dummies(df, columns=["city"], drop_first=True)
-    return df
+def _load_dataframe(limit: int | None = None) -> pd.DataFrame | None:
+    return load_training_frame(limit=limit or settings.training_window)
 
 
 def train_model_if_needed(force: bool = False) -> dict[str, Any] | None:
@@ -59,12 +54,7 @@ def train_model_if_needed(force: bool = False) -> dict[str, Any] | None:
     )
     target = df["aqi"]
 
-    model = RandomForestRegressor(
-        n_estimators=300,
-        max_depth=14,
-        random_state=42,
-        n_jobs=-1,
-    )
+    model = get_backend("rf").build()
     model.fit(features, target)
 
     predictions = model.predict(features)
@@ -86,9 +76,11 @@ def train_model_if_needed(force: bool = False) -> dict[str, Any] | None:
     return metrics
 
 
-def _load_model() -> tuple[RandomForestRegressor, list[str], dict[str, Any]] | None:
+def _load_model(train: bool = True) -> tuple[RandomForestRegressor, list[str], dict[str, Any]] | None:
     path = _model_path()
     if not path.exists():
+        if not train:
+            return None
         train_model_if_needed(force=True)
         if not path.exists():
             return None
@@ -96,7 +88,28 @@ def _load_model() -> tuple[RandomForestRegressor, list[str], dict[str, Any]] | N
     return artifact["model"], artifact["feature_columns"], artifact.get("metrics", {})
 
 
-def predict_next_24(city: str | None = None) -> dict[str, Any]:
+def build_horizon_frame(
+    baseline: dict[str, Any], feature_columns: list[str], hours: int = 24
+) -> tuple[pd.DataFrame, pd.Series]:
+    """Build all forecast horizons as one feature matrix for a single predict call"""
+    base_df = pd.DataFrame([baseline])
+    base_df["timestamp"] = pd.to_datetime(base_df["timestamp"])
+
+    future = base_df.loc[base_df.index.repeat(hours)].reset_index(drop=True)
+    future["timestamp"] = future["timestamp"] + pd.to_timedelta(np.arange(1, hours + 1), unit="h")
+    future["hour"] = future["timestamp"].dt.hour
+    future["dayofweek"] = future["timestamp"].dt.dayofweek
+    target_times = future["timestamp"]
+    future = pd.get_dummies(future, columns=["city"], drop_first=True)
+    future = future.reindex(columns=feature_columns, fill_value=0)
+    return future, target_times
+
+
+def predict_next_24(
+    city: str | None = None,
+    intervals: bool = False,
+    quantiles: tuple[float, float] = DEFAULT_QUANTILES,
+) -> dict[str, Any]:
     artifact = _load_model()
     if artifact is None:
         return {"points": [], "metrics": None}
@@ -112,36 +125,43 @@ def predict_next_24(city: str | None = None) -> dict[str, Any]:
         if not latest:
             latest = get_latest_cache()
 
-    baseline = latest[0]
-    base_df = pd.DataFrame([baseline])
-    base_df["timestamp"] = pd.to_datetime(base_df["timestamp"])
+    future, target_times = build_horizon_frame(latest[0], feature_columns)
+    if intervals and supports_intervals(model):
+        predicted, lower, upper = predict_with_intervals(model, future, quantiles)
+    else:
+        predicted, lower, upper = model.predict(future), None, None
 
     projections = []
-    for hour in range(1, 25):
-        future = base_df.copy()
-        future["timestamp"] = future["timestamp"] + pd.Timedelta(hours=hour)
-        future["hour"] = future["timestamp"].dt.hour
-        future["dayofweek"] = future["timestamp"].dt.dayofweek
-        future = pd.get_dummies(future, columns=["city"], drop_first=True)
-        for col in feature_columns:
-            if col not in future.columns:
-                future[col] = 0
-        future = future[feature_columns]
-        predicted_aqi = float(model.predict(future)[0])
-        projections.append(
-            {
-                "target_time": future.index[0],
-                "predicted_aqi": round(predicted_aqi, 2),
-            }
-        )
-
-    for point in projections:
-        point["target_time"] = pd.Timestamp(point["target_time"]).isoformat()
-
-    return {
+    for i, target_time in enumerate(target_times):
+        point = {
+            "target_time": pd.Timestamp(target_time).isoformat(),
+            "predicted_aqi": round(float(predicted[i]), 2),
+        }
+        if lower is not None:
+            point["lower"] = round(float(lower[i]), 2)
+            point["upper"] = round(float(upper[i]), 2)
+        projections.append(point)
+
+    result = {
         "generated_at": datetime.utcnow().isoformat(),
         "points": projections,
         "metrics": metrics,
     }
+    if lower is not None:
+        result["quantiles"] = list(quantiles)
+    return result
 
 
+def forecast_all_cities(hours: int = 24) -> dict[str, np.ndarray]:
+    """Point forecasts for every city's latest reading from one batched predict call"""
+    # Runs inside the alert job, which must never train; forecast rules wait for the scheduled training.
+    artifact = _load_model(train=False)
+    if artifact is None:
+        return {}
+    latest = get_latest_cache()
+    if not latest:
+        return {}
+    model, feature_columns, _ = artifact
+    frames = [build_horizon_frame(row, feature_columns, hours)[0] for row in latest]
+    predicted = np.asarray(model.predict(pd.concat(frames, ignore_index=True)), dtype=np.float64)
+    return {row["city"]: predicted[i * hours:(i + 1) * hours] for i, row in enumerate(latest)}
@@ -0,0 +1,250 @@
+from __future__ import annotations
+
+import multiprocessing
+import os
+import queue
+import time
+from typing import Any
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from ..config import get_settings
+from ..db import get_collection
+from .backends import configured_backends, get_backend, regression_metrics
+from .ml_models import _load_dataframe, _models_dir, _prepare_features
+
+settings = get_settings()
+
+# Training matrix shared with pool workers through the initializer.
+_worker_data: tuple[np.ndarray, np.ndarray] | None = None
+
+
+def _candidates() -> dict[str, list[dict[str, Any]]]:
+    return {
+        backend.name: backend.param_grid
+        for backend in configured_backends()
+        if backend.tabular
+    }
+
+
+def _build_estimator(family: str, params: dict[str, Any], single_threaded: bool = False) -> Any:
+    model = get_backend(family).build(**params)
+    if single_threaded and "n_jobs" in model.get_params():
+        # Parallelism comes from the process pool, not from inside each fit.
+        model.set_params(n_jobs=1)
+    return model
+
+
+def rolling_origin_folds(n_samples: int, n_folds: int) -> list[tuple[int, int, int]]:
+    """Expanding-window splits as (train_end, test_start, test_end) over time-ordered rows"""
+    fold_size = n_samples // (n_folds + 1)
+    if fold_size < 1:
+        return []
+    return [
+        ((i + 1) * fold_size, (i + 1) * fold_size, min((i + 2) * fold_size, n_samples))
+        for i in range(n_folds)
+    ]
+
+
+def _init_worker(features: np.ndarray, target: np.ndarray) -> None:
+    global _worker_data
+    _worker_data = (features, target)
+
+
+def _evaluate_fold(
+    family: str, params: dict[str, Any], train_end: int, test_start: int, test_end: int
+) -> dict[str, Any]:
+    features, target = _worker_data
+    model = _build_estimator(family, params, single_threaded=True)
+    started = time.perf_counter()
+    model.fit(features[:train_end], target[:train_end])
+    fit_seconds = time.perf_counter() - started
+    predictions = model.predict(features[test_start:test_end])
+    return {
+        **regression_metrics(target[test_start:test_end], predictions),
+        "fit_seconds": fit_seconds,
+        "train_rows": train_end,
+    }
+
+
+def _summarize(folds: list[dict[str, Any]]) -> dict[str, Any]:
+    return {
+        "r2": float(np.mean([fold["r2"] for fold in folds])),
+        "mae": float(np.mean([fold["mae"] for fold in folds])),
+        "rmse": float(np.mean([fold["rmse"] for fold in folds])),
+        "folds_completed": len(folds),
+        "folds": folds,
+    }
+
+
+def _refit_seconds(folds: list[dict[str, Any]], n_samples: int) -> float:
+    """Expected time of a refit on all rows, scaled up from the slowest fold"""
+    return max(fold["fit_seconds"] * n_samples / max(fold["train_rows"], 1) for fold in folds)
+
+
+def _refit_reserve(results: dict[tuple[str, int], list[dict[str, Any]]], n_samples: int) -> float:
+    estimates: dict[str, float] = {}
+    for (family, _), folds in results.items():
+        estimates[family] = max(estimates.get(family, 0.0), _refit_seconds(folds, n_samples))
+    return sum(estimates.values())
+
+
+def _run_cv(
+    features: np.ndarray,
+    target: np.ndarray,
+    folds: list[tuple[int, int, int]],
+    candidates: dict[str, list[dict[str, Any]]],
+    deadline: float,
+) -> tuple[dict[tuple[str, int], list[dict[str, Any]]], int]:
+    workers = settings.model_selection_workers or os.cpu_count() or 1
+    results: dict[tuple[str, int], list[dict[str, Any]]] = {}
+    finished: queue.Queue[tuple[tuple[str, int], dict[str, Any] | None]] = queue.Queue()
+
+    # Spawned, not forked: forking a process that runs Flask and scheduler threads can deadlock.
+    pool = multiprocessing.get_context("spawn").Pool(
+        processes=workers, initializer=_init_worker, initargs=(features, target)
+    )
+    unfinished = 0
+    try:
+        # Schedule fold-major so every candidate gets early folds before the budget runs out.
+        for fold in folds:
+            for family, grid in candidates.items():
+                for index, params in enumerate(grid):
+                    pool.apply_async(
+                        _evaluate_fold,
+                        (family, params, *fold),
+                        callback=lambda result, key=(family, index): finished.put((key, result)),
+                        error_callback=lambda _, key=(family, index): finished.put((key, None)),
+                    )
+                    unfinished += 1
+        while unfinished:
+            # Stop early enough to leave the refits their expected time.
+            remaining = deadline - _refit_reserve(results, len(target)) - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                key, result = finished.get(timeout=remaining)
+            except queue.Empty:
+                break
+            unfinished -= 1
+            if result is not None:
+                results.setdefault(key, []).append(result)
+    finally:
+        # Fits still running at the deadline are killed rather than left on the CPUs.
+        pool.terminate()
+        pool.join()
+
+    return results, unfinished
+
+
+def _select_best(
+    results: dict[tuple[str, int], list[dict[str, Any]]],
+    family: str,
+    grid: list[dict[str, Any]],
+) -> tuple[dict[str, Any], dict[str, Any]] | None:
+    scored = [
+        (grid[index], _summarize(folds))
+        for (name, index), folds in results.items()
+        if name == family and folds
+    ]
+    if not scored:
+        return None
+    # Prefer candidates that finished more folds, then the lowest out-of-sample MAE.
+    return min(scored, key=lambda item: (-item[1]["folds_completed"], item[1]["mae"]))
+
+
+def _cv_weights(summaries: dict[str, dict[str, Any]]) -> dict[str, float]:
+    scores = {name: max(summary["r2"], 0.0) for name, summary in summaries.items()}
+    if sum(scores.values()) <= 0:
+        scores = {name: 1.0 / max(summary["mae"], 1e-6) for name, summary in summaries.items()}
+    total = sum(scores.values())
+    weights = {name: score / total for name, score in scores.items()}
+    # Members that were not cross-validated (e.g. LSTM) get no say in the ensemble.
+    for backend in configured_backends():
+        weights.setdefault(backend.name, 0.0)
+    return weights
+
+
+def train_with_cross_validation(budget_seconds: float | None = None) -> dict[str, Any] | None:
+    """Select backend hyperparameters with rolling-origin CV and refit the winners, both within the budget"""
+    budget = budget_seconds if budget_seconds is not None else settings.model_selection_budget_seconds
+    timings: dict[str, float] = {}
+    started = time.perf_counter()
+
+    df = _load_dataframe()
+    if df is None or df.empty:
+        return None
+    df = df.sort_values("timestamp", kind="stable").reset_index(drop=True)
+    timings["load_seconds"] = time.perf_counter() - started
+
+    stage = time.perf_counter()
+    features, target = _prepare_features(df)
+    feature_matrix = features.to_numpy(dtype=np.float64)
+    target_values = target.to_numpy(dtype=np.float64)
+    folds = rolling_origin_folds(len(df), settings.cv_folds)
+    if not folds:
+        return None
+    timings["prepare_seconds"] = time.perf_counter() - stage
+
+    stage = time.perf_counter()
+    deadline = time.monotonic() + budget
+    candidates = _candidates()
+    results, unfinished = _run_cv(feature_matrix, target_values, folds, candidates, deadline)
+    timings["cv_seconds"] = time.perf_counter() - stage
+
+    stage = time.perf_counter()
+    models_dir = _models_dir()
+    summaries: dict[str, dict[str, Any]] = {}
+    selected: dict[str, dict[str, Any]] = {}
+    skipped: list[str] = []
+    for family, grid in candidates.items():
+        best = _select_best(results, family, grid)
+        if best is None:
+            continue
+        params, summary = best
+        # A refit cannot be interrupted, so one expected to overrun the budget is skipped.
+        if time.monotonic() + _refit_seconds(summary["folds"], len(df)) > deadline:
+            skipped.append(family)
+            continue
+        backend = get_backend(family)
+        model = _build_estimator(family, params)
+        model.fit(features, target)
+        cv_metrics = {key: summary[key] for key in ("r2", "mae", "rmse", "folds_completed")}
+        backend.save(model, features.columns.tolist(), {**cv_metrics, "params": params}, models_dir)
+        summaries[family] = summary
+        selected[family] = params
+    timings["refit_seconds"] = time.perf_counter() - stage
+
+    if not summaries:
+        return {
+            "status": "budget-exhausted",
+            "timings": timings,
+            "tasks_unfinished": unfinished,
+            "refits_skipped": skipped,
+        }
+
+    weights = _cv_weights(summaries)
+    joblib.dump(weights, models_dir / "ensemble_weights.pkl")
+    timings["total_seconds"] = time.perf_counter() - started
+
+    all_metrics = {
+        **{get_backend(family).label: summary for family, summary in summaries.items()},
+        "selected_params": selected,
+        "ensemble_weights": weights,
+        "training_records": int(len(df)),
+        "cv_folds": len(folds),
+        "budget_seconds": budget,
+        "tasks_unfinished": unfinished,
+        "refits_skipped": skipped,
+        "timings": {key: round(value, 4) for key, value in timings.items()},
+    }
+
+    collection = get_collection("model_metrics")
+    collection.insert_one({
+        "metrics": all_metrics,
+        "mode": "cv",
+        "timestamp": pd.Timestamp.utcnow(),
+    })
+    return all_metrics
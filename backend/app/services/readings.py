@@ -1,15 +1,23 @@
 from __future__ import annotations
 
-from datetime import datetime, timedelta
-from pathlib import Path
+from datetime import datetime, timedelta, timezone
+from itertools import islice
 from typing import Any, TypedDict
 
+import numpy as np
 from bson import ObjectId
 from pymongo import ASCENDING, DESCENDING
+from pymongo.errors import BulkWriteError
 
 from ..config import get_settings
 from ..db import get_collection
-from .aqi import compute_aqi
+from . import districts, rolling, rollups, snapshot
+from .anomaly import detector, is_fault
+from .cold_storage import ColdBlockError, with_cold_readings
+from .stations import station_index
+from .training_data import CLEAN_FILTER, POLLUTANT_FIELDS, epoch_ns
+from .aqi import compute_aqi, compute_aqi_array
+from .downsample import lttb_indices
 
 
 settings = get_settings()
@@ -32,12 +40,33 @@ class Reading(TypedDict, total=False):
     color: str
     health: str
     primary_pollutant: str | None
+    district: str | None
+    anomalies: list[str]
+    rolling: dict[str, Any] | None
     timestamp: datetime
 
 
+# Stored fields `_serialize` reads, plus "aqi" for ordering the latest cache.
+SERIALIZE_PROJECTION = {
+    field: 1
+    for field in (
+        "_id", "city", "state", "latitude", "longitude", *POLLUTANT_FIELDS,
+        "temperature", "humidity", "district", "anomalies", "timestamp", "aqi",
+    )
+}
+
 _latest_cache: list[Reading] = []
 _latest_updated_at: datetime | None = None
-_map_geojson_cache: dict[str, Any] | None = None
+
+
+def parse_time(raw: str | None) -> datetime | None:
+    """ISO time as naive UTC, the form timestamps are stored in; shared by the API and the CLIs"""
+    if not raw:
+        return None
+    value = datetime.fromisoformat(raw.replace("Z", "+00:00"))
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
 
 
 def _serialize(doc: dict[str, Any]) -> Reading:
@@ -71,6 +100,8 @@ def _serialize(doc: dict[str, Any]) -> Reading:
         color=meta["color"],
         health=meta["health"],
         primary_pollutant=meta["primary_pollutant"],
+        district=doc.get("district"),
+        anomalies=doc.get("anomalies", []),
         timestamp=timestamp,
     )
 
@@ -80,7 +111,9 @@ def refresh_latest_cache() -> None:
     try:
         readings = get_collection("readings")
         pipeline = [
+            {"$match": CLEAN_FILTER},
             {"$sort": {"city": ASCENDING, "timestamp": DESCENDING}},
+            {"$project": SERIALIZE_PROJECTION},
             {
                 "$group": {
                     "_id": "$city",
@@ -93,13 +126,41 @@ def refresh_latest_cache() -> None:
         flattened = [doc.get("doc", {}) for doc in docs]
         if flattened:
             flattened.sort(key=lambda doc: doc.get("aqi", 0), reverse=True)
-        _latest_cache = [_serialize(doc) for doc in flattened if doc]
+        refreshed = [_serialize(doc) for doc in flattened if doc]
+        for row in refreshed:
+            row["rolling"] = rolling.rolling_stats(row["city"])
+        previous = {row["city"]: row for row in _latest_cache}
+        changed = [row for row in refreshed if previous.get(row["city"]) != row]
+        districts.observe(changed)
+        station_index.observe(changed)
+        snapshot.bump("city", [row["city"] for row in changed])
+        _latest_cache = refreshed
         _latest_updated_at = datetime.utcnow()
     except Exception:
         _latest_cache = []
         _latest_updated_at = datetime.utcnow()
 
 
+def _merge_latest(rows: list[Reading]) -> None:
+    """Fold freshly stored clean readings into the latest view without re-running the aggregate"""
+    global _latest_cache
+    if _latest_updated_at is None:
+        refresh_latest_cache()
+        return
+    latest = {row["city"]: row for row in _latest_cache}
+    changed: set[str] = set()
+    for row in rows:
+        current = latest.get(row["city"])
+        if current is None or epoch_ns(current["timestamp"]) <= epoch_ns(row["timestamp"]):
+            latest[row["city"]] = row
+            changed.add(row["city"])
+    if not changed:
+        return
+    districts.observe(latest[city] for city in changed)
+    snapshot.bump("city", changed)
+    _latest_cache = sorted(latest.values(), key=lambda row: row.get("aqi", 0), reverse=True)
+
+
 def get_latest_cache(force: bool = False) -> list[Reading]:
     if force or _latest_cache == [] or _is_cache_stale(_latest_updated_at, 10):
         refresh_latest_cache()
@@ -112,15 +173,45 @@ def _is_cache_stale(updated_at: datetime | None, seconds: int) -> bool:
     return datetime.utcnow() - updated_at > timedelta(seconds=seconds)
 
 
-def get_history(city: str, limit: int = 200) -> list[Reading]:
+def _downsample(docs: list[dict[str, Any]], max_points: int) -> list[Reading]:
+    """LTTB over AQI, scoring every row but serializing only the kept ones"""
+    ordered = docs[::-1]
+    timestamp = np.fromiter((epoch_ns(doc.get("timestamp")) for doc in ordered), dtype=np.int64, count=len(ordered))
+    aqi = compute_aqi_array({
+        field: np.array([np.nan if doc.get(field) is None else doc[field] for doc in ordered], dtype=np.float64)
+        for field in POLLUTANT_FIELDS
+    })
+    seconds = (timestamp - timestamp[0]) / 1e9 if len(timestamp) else timestamp.astype(np.float64)
+    keep = lttb_indices(seconds, aqi, max_points)
+    return [_serialize(ordered[index]) for index in keep[::-1]]
+
+
+def get_history(
+    city: str,
+    limit: int = 200,
+    start: datetime | None = None,
+    end: datetime | None = None,
+    max_points: int | None = None,
+) -> list[Reading]:
+    filter: dict[str, Any] = {"city": city}
+    if start or end:
+        filter["timestamp"] = {
+            **({"$gte": start} if start else {}),
+            **({"$lt": end} if end else {}),
+        }
     try:
         collection = get_collection("readings")
-        cursor = (
-            collection.find({"city": city})
-            .sort("timestamp", DESCENDING)
-            .limit(min(limit, settings.history_limit))
-        )
-        return [_serialize(doc) for doc in cursor]
+        # Downsampling covers the whole range rather than the newest `limit` rows.
+        limit = settings.downsample_source_limit if max_points else min(limit, settings.history_limit)
+        hot = collection.find(filter, SERIALIZE_PROJECTION).sort("timestamp", DESCENDING).limit(limit)
+        # Sealed blocks are decoded lazily, so a recent window never touches them.
+        docs = list(islice(with_cold_readings(hot, filter, newest_first=True), limit))
+        if max_points:
+            return _downsample(docs, max(max_points, 3))
+        return [_serialize(doc) for doc in docs]
+    except ColdBlockError:
+        # Unreadable sealed history is an error, not an empty range.
+        raise
     except Exception:
         return []
 
@@ -129,7 +220,7 @@ def get_recent_history(limit: int = 200) -> list[Reading]:
     try:
         collection = get_collection("readings")
         cursor = (
-            collection.find()
+            collection.find({}, SERIALIZE_PROJECTION)
             .sort("timestamp", DESCENDING)
             .limit(min(limit, settings.history_limit))
         )
@@ -138,24 +229,16 @@ def get_recent_history(limit: int = 200) -> list[Reading]:
         return []
 
 
-def get_map_geojson() -> dict[str, Any]:
-    global _map_geojson_cache
-    if _map_geojson_cache is None:
-        geo_path = Path(settings.telangana_geojson_path)
-        if not geo_path.exists():
-            _map_geojson_cache = {"type": "FeatureCollection", "features": []}
-        else:
-            _map_geojson_cache = geo_path.read_text(encoding="utf-8")
-    if isinstance(_map_geojson_cache, str):
-        import json
-
-        _map_geojson_cache = json.loads(_map_geojson_cache)
-    return _map_geojson_cache
-
-
-def get_map_overlay() -> dict[str, Any]:
+def get_map_overlay(since: int | None = None) -> dict[str, Any]:
+    """City markers; with `since`, only the cities that changed after it"""
     latest = get_latest_cache()
-    return {
+    version = snapshot.current_version()
+    full = since is None or since > version
+    if not full:
+        changed = set(snapshot.changed_since("city", since))
+        latest = [row for row in latest if row["city"] in changed]
+    overlay: dict[str, Any] = {
+        "version": version,
         "updated_at": datetime.utcnow().isoformat(),
         "cities": [
             {
@@ -169,15 +252,49 @@ def get_map_overlay() -> dict[str, Any]:
             }
             for row in latest
         ],
-        "geojson": get_map_geojson(),
     }
+    if not full:
+        overlay["since"] = since
+    return overlay
 
 
-def save_reading(payload: dict[str, Any]) -> str:
+def save_readings(payloads: list[dict[str, Any]]) -> tuple[list[str | None], dict[int, str]]:
+    """Store a batch in one unordered bulk insert; returns each payload's id (None when
+    rejected) and the rejected payloads' errors by index"""
     collection = get_collection("readings")
-    payload["timestamp"] = payload.get("timestamp", datetime.utcnow())
-    result = collection.insert_one(payload)
-    refresh_latest_cache()
-    return str(result.inserted_id)
+    for payload in payloads:
+        payload["timestamp"] = payload.get("timestamp", datetime.utcnow())
+        # Resolved once here so maps never do geometry work per request.
+        payload.setdefault("district", districts.district_for(payload.get("latitude"), payload.get("longitude")))
+    for payload, flags in zip(payloads, detector.inspect(payloads)):
+        if flags:
+            payload["anomalies"] = flags
+        if is_fault(flags):
+            payload["flagged"] = True
+    errors: dict[int, str] = {}
+    try:
+        collection.insert_many(payloads, ordered=False)
+    except BulkWriteError as exc:
+        # Unordered inserts keep going past a bad document, so the rest still landed.
+        errors = {error["index"]: error.get("errmsg", "write error") for error in exc.details.get("writeErrors", [])}
+    # Rejected readings never happened as far as the baselines are concerned.
+    detector.commit([payload for index, payload in enumerate(payloads) if index not in errors])
+    clean = [payload for index, payload in enumerate(payloads) if index not in errors and not payload.get("flagged")]
+    for payload in clean:
+        rollups.observe(payload)
+        rolling.observe(payload)
+    # Flagged readings may carry bad coordinates, so only clean ones place stations.
+    located = [_serialize(payload) for payload in clean]
+    for row in located:
+        row["rolling"] = rolling.rolling_stats(row["city"])
+    station_index.observe(located)
+    # The periodic refresh still reconciles with the store; an ingest only merges its own rows.
+    _merge_latest(located)
+    ids = [None if index in errors else str(payload["_id"]) for index, payload in enumerate(payloads)]
+    return ids, errors
+
+
+def save_reading(payload: dict[str, Any]) -> str | None:
+    return save_readings([payload])[0][0]
 
 
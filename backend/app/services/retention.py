@@ -0,0 +1,77 @@
+from __future__ import annotations
+
+import logging
+import time
+from datetime import datetime, timedelta
+from typing import Any, NamedTuple
+
+from pymongo import ASCENDING
+
+from ..config import get_settings
+from ..db import get_client, get_collection
+from .cold_storage import COLD_COLLECTION
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+# The field a collection's documents age by, when it is not "timestamp".
+TIME_FIELDS = {COLD_COLLECTION: "end", "rollups": "start"}
+
+
+class RetentionPolicy(NamedTuple):
+    name: str
+    collection: str
+    field: str
+    filter: dict[str, Any]
+    days: int
+
+
+def retention_policies() -> list[RetentionPolicy]:
+    policies = [
+        RetentionPolicy(collection, collection, TIME_FIELDS.get(collection, "timestamp"), {}, days)
+        for collection, days in settings.retention_days.items()
+    ]
+    policies += [
+        RetentionPolicy(f"rollups:{resolution}", "rollups", "start", {"resolution": resolution}, days)
+        for resolution, days in settings.rollup_retention_days.items()
+    ]
+    return [policy for policy in policies if policy.days > 0]
+
+
+def _expire(policy: RetentionPolicy) -> int:
+    """Delete a policy's expired documents oldest first, one bounded batch at a time"""
+    collection = get_collection(policy.collection)
+    cutoff = datetime.utcnow() - timedelta(days=policy.days)
+    query = {policy.field: {"$lt": cutoff}, **policy.filter}
+    removed = 0
+    for _ in range(settings.retention_max_batches):
+        ids = [
+            doc["_id"]
+            for doc in collection.find(query, {"_id": 1})
+            .sort(policy.field, ASCENDING)
+            .limit(settings.retention_batch_size)
+        ]
+        if not ids:
+            break
+        removed += collection.delete_many({"_id": {"$in": ids}}).deleted_count
+        if len(ids) < settings.retention_batch_size:
+            break
+        # Short pauses between batches leave the store to request traffic.
+        time.sleep(settings.retention_pause_seconds)
+    return removed
+
+
+def enforce_retention() -> dict[str, int]:
+    """Delete expired documents per policy, then compact the embedded stores"""
+    removed: dict[str, int] = {}
+    for policy in retention_policies():
+        try:
+            removed[policy.name] = _expire(policy)
+        except Exception:
+            # One failing policy must not hold back the others; the next run retries it.
+            logger.exception("Retention policy %s failed", policy.name)
+            continue
+    # MongoDB reuses freed space itself; the embedded stores need an explicit pass.
+    if settings.storage_backend != "mongo":
+        removed["compacted_bytes"] = get_client().compact()
+    return removed
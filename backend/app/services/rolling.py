@@ -0,0 +1,191 @@
+from __future__ import annotations
+
+import math
+import threading
+from collections import deque
+from datetime import datetime, timedelta
+from typing import Any
+
+from pymongo import ASCENDING
+
+from ..config import get_settings
+from ..db import get_collection
+from .aqi import compute_aqi
+from .training_data import CLEAN_FILTER, POLLUTANT_FIELDS, epoch_ns
+
+settings = get_settings()
+
+ROLLING_FIELDS = ("aqi", "pm25", "pm10")
+NOWCAST_FIELDS = ("pm25", "pm10")
+NOWCAST_HOURS = 12
+
+_NS_PER_HOUR = 3_600 * 1_000_000_000
+_SEED_PROJECTION = {"timestamp": 1, **{field: 1 for field in POLLUTANT_FIELDS}}
+
+
+class RollingWindow:
+    """Mean, min and max of the last `size` values in amortized O(1) per push"""
+
+    def __init__(self, size: int) -> None:
+        self.size = size
+        self._values = [0.0] * size
+        self._pushed = 0
+        self._total = 0.0
+        self._minimum: deque[tuple[int, float]] = deque()
+        self._maximum: deque[tuple[int, float]] = deque()
+
+    def push(self, value: float) -> None:
+        index = self._pushed
+        slot = index % self.size
+        if index >= self.size:
+            self._total -= self._values[slot]
+        self._values[slot] = value
+        self._total += value
+        self._pushed += 1
+
+        oldest = index - self.size + 1
+        while self._minimum and self._minimum[-1][1] >= value:
+            self._minimum.pop()
+        self._minimum.append((index, value))
+        if self._minimum[0][0] < oldest:
+            self._minimum.popleft()
+        while self._maximum and self._maximum[-1][1] <= value:
+            self._maximum.pop()
+        self._maximum.append((index, value))
+        if self._maximum[0][0] < oldest:
+            self._maximum.popleft()
+
+    def stats(self) -> dict[str, float] | None:
+        count = min(self._pushed, self.size)
+        if not count:
+            return None
+        return {
+            "mean": round(self._total / count, 2),
+            "min": round(self._minimum[0][1], 2),
+            "max": round(self._maximum[0][1], 2),
+            "count": count,
+        }
+
+
+class NowCast:
+    """EPA NowCast over the last 12 hourly averages, with the current hour as it fills"""
+
+    def __init__(self) -> None:
+        self._hour = -1
+        self._sum = 0.0
+        self._count = 0
+        self._hours: deque[float] = deque(maxlen=NOWCAST_HOURS - 1)
+
+    def push(self, hour: int, value: float) -> None:
+        if hour != self._hour:
+            if self._hour >= 0:
+                # Close the previous hour and mark any hours without readings as missing.
+                self._hours.appendleft(self._sum / self._count)
+                for _ in range(min(hour - self._hour - 1, NOWCAST_HOURS)):
+                    self._hours.appendleft(math.nan)
+            self._hour, self._sum, self._count = hour, 0.0, 0
+        self._sum += value
+        self._count += 1
+
+    def value(self) -> float | None:
+        if not self._count:
+            return None
+        hourly = [self._sum / self._count, *self._hours]
+        # NowCast needs two of the three most recent hours.
+        if sum(not math.isnan(c) for c in hourly[:3]) < 2:
+            return None
+        valid = [c for c in hourly if not math.isnan(c)]
+        low, high = min(valid), max(valid)
+        weight = max(low / high, 0.5) if high > 0 else 1.0
+        numerator = denominator = 0.0
+        for age, concentration in enumerate(hourly):
+            if not math.isnan(concentration):
+                numerator += weight**age * concentration
+                denominator += weight**age
+        return round(numerator / denominator, 2)
+
+
+class CityRolling:
+    __slots__ = ("last_ns", "last_ids", "windows", "nowcasts", "stats")
+
+    def __init__(self) -> None:
+        self.last_ns = -1
+        self.last_ids: set[Any] = set()
+        self.windows = {field: RollingWindow(settings.rolling_window) for field in ROLLING_FIELDS}
+        self.nowcasts = {field: NowCast() for field in NOWCAST_FIELDS}
+        self.stats: dict[str, Any] | None = None
+
+    def push(self, reading: dict[str, Any]) -> None:
+        timestamp = epoch_ns(reading.get("timestamp"))
+        if timestamp < self.last_ns:
+            return
+        # A seed that ran after the insert already holds the reading being observed.
+        identity = reading.get("_id")
+        if timestamp == self.last_ns and identity is not None and identity in self.last_ids:
+            return
+        if timestamp > self.last_ns:
+            self.last_ids = set()
+        self.last_ns = timestamp
+        if identity is not None:
+            self.last_ids.add(identity)
+        values = {field: reading.get(field) for field in ("pm25", "pm10", "co2", "no2")}
+        values["aqi"] = compute_aqi(values)["aqi"]
+        for field, window in self.windows.items():
+            if values.get(field) is not None:
+                window.push(float(values[field]))
+        for field, nowcast in self.nowcasts.items():
+            if values.get(field) is not None:
+                nowcast.push(timestamp // _NS_PER_HOUR, float(values[field]))
+
+        # Precomputed here so serving /latest only attaches this dict.
+        stats: dict[str, Any] = {"window": settings.rolling_window}
+        stats.update({field: window.stats() for field, window in self.windows.items()})
+        stats["nowcast"] = {field: nowcast.value() for field, nowcast in self.nowcasts.items()}
+        nowcast_aqi = compute_aqi(stats["nowcast"])["aqi"] if any(stats["nowcast"].values()) else None
+        stats["nowcast"]["aqi"] = nowcast_aqi
+        self.stats = stats
+
+
+_lock = threading.Lock()
+_cities: dict[str, CityRolling] = {}
+
+
+def _seed(city: str) -> CityRolling | None:
+    """Replay the readings a fresh aggregator needs; None when the store fails"""
+    since = datetime.utcnow() - timedelta(hours=NOWCAST_HOURS)
+    try:
+        cursor = (
+            get_collection("readings")
+            .find({"city": city, "timestamp": {"$gte": since}, **CLEAN_FILTER}, _SEED_PROJECTION)
+            .sort("timestamp", ASCENDING)
+        )
+        docs = list(cursor)
+    except Exception as exc:
+        print(f"WARNING: Could not seed rolling stats for {city}: {exc}")
+        return None
+    state = CityRolling()
+    for doc in docs:
+        state.push(doc)
+    return state
+
+
+def _state(city: str) -> CityRolling:
+    state = _cities.get(city)
+    if state is None:
+        state = _seed(city)
+        if state is None:
+            # Not cached, so the next reading retries the seed.
+            return CityRolling()
+        _cities[city] = state
+    return state
+
+
+def observe(reading: dict[str, Any]) -> None:
+    """Fold one clean reading into its city's windows"""
+    with _lock:
+        _state(reading.get("city", "Unknown")).push(reading)
+
+
+def rolling_stats(city: str) -> dict[str, Any] | None:
+    with _lock:
+        return _state(city).stats
@@ -0,0 +1,285 @@
+from __future__ import annotations
+
+import math
+import threading
+from datetime import datetime, timedelta
+from typing import Any
+
+import numpy as np
+from pymongo import DESCENDING
+
+from ..config import get_settings
+from ..db import get_collection
+from .aqi import compute_aqi
+from .training_data import CLEAN_FILTER, POLLUTANT_FIELDS, epoch_ns, iter_reading_chunks
+
+settings = get_settings()
+
+RESOLUTIONS: dict[str, int] = {"5m": 300, "1h": 3_600, "1d": 86_400}
+ROLLUP_FIELDS = (*POLLUTANT_FIELDS, "aqi")
+
+_EPOCH = datetime(1970, 1, 1)
+_NS_PER_SECOND = 1_000_000_000
+
+# Bucket deltas not yet written to the "rollups" collection. A delta is
+# {"count": n, field: [min, max, sum, count]}; flushing applies it with
+# $inc/$min/$max so concurrent writers merge instead of overwriting.
+_lock = threading.Lock()
+_pending: dict[tuple[str, str, int], dict[str, Any]] = {}
+_flushing: dict[tuple[str, str, int], dict[str, Any]] = {}
+# Held while one bucket is written and dropped from `_flushing`, and while a reader
+# pairs the stored buckets with the unflushed deltas, so no delta is counted twice.
+_flush_lock = threading.Lock()
+# Cities whose history is rolled up, loaded from "rollup_state" on the first
+# backfill run, and the cutoff of each backfill in progress.
+_backfill_lock = threading.Lock()
+_backfilled: set[str] | None = None
+_backfill_cutoffs: dict[str, datetime] = {}
+
+
+def _empty() -> dict[str, Any]:
+    return {"count": 0, **{field: [math.inf, -math.inf, 0.0, 0] for field in ROLLUP_FIELDS}}
+
+
+def _merge(target: dict[str, Any], delta: dict[str, Any]) -> None:
+    target["count"] += delta["count"]
+    for field in ROLLUP_FIELDS:
+        low, high, total, count = delta[field]
+        stats = target[field]
+        stats[0] = min(stats[0], low)
+        stats[1] = max(stats[1], high)
+        stats[2] += total
+        stats[3] += count
+
+
+def _bucket_start(seconds: int) -> datetime:
+    return _EPOCH + timedelta(seconds=seconds)
+
+
+def _update(delta: dict[str, Any]) -> dict[str, Any]:
+    increments: dict[str, Any] = {"count": delta["count"]}
+    minimums: dict[str, float] = {}
+    maximums: dict[str, float] = {}
+    for field in ROLLUP_FIELDS:
+        low, high, total, count = delta[field]
+        if not count:
+            continue
+        increments[f"{field}.sum"] = float(total)
+        increments[f"{field}.count"] = int(count)
+        minimums[f"{field}.min"] = float(low)
+        maximums[f"{field}.max"] = float(high)
+    update: dict[str, Any] = {"$inc": increments}
+    if minimums:
+        update["$min"] = minimums
+        update["$max"] = maximums
+    return update
+
+
+def _write(resolution: str, city: str, start: int, delta: dict[str, Any]) -> None:
+    get_collection("rollups").update_one(
+        {"city": city, "resolution": resolution, "start": _bucket_start(start)},
+        _update(delta),
+        upsert=True,
+    )
+
+
+def _document(resolution: str, city: str, start: int, delta: dict[str, Any]) -> dict[str, Any]:
+    """A whole bucket in the shape `_write`'s upserts build up"""
+    doc: dict[str, Any] = {"city": city, "resolution": resolution, "start": _bucket_start(start), "count": delta["count"]}
+    for field in ROLLUP_FIELDS:
+        low, high, total, count = delta[field]
+        if count:
+            doc[field] = {"min": float(low), "max": float(high), "sum": float(total), "count": int(count)}
+    return doc
+
+
+def _loaded_backfilled() -> set[str]:
+    global _backfilled
+    if _backfilled is None:
+        cities = set(get_collection("rollup_state").distinct("city"))
+        with _lock:
+            if _backfilled is None:
+                _backfilled = cities
+    return _backfilled
+
+
+def _backfill(city: str, cutoff: datetime) -> None:
+    """Build a city's buckets from its raw readings before `cutoff`, one bulk insert per chunk"""
+    limit = epoch_ns(cutoff) // _NS_PER_SECOND
+    collection = get_collection("rollups")
+    for resolution, width in RESOLUTIONS.items():
+        # Clears what an interrupted earlier attempt inserted; nothing else writes these buckets yet.
+        collection.delete_many({"city": city, "resolution": resolution, "start": {"$lt": _bucket_start(limit // width * width)}})
+    # The newest bucket per resolution may continue in the next chunk, so it is held back.
+    open_buckets: dict[str, tuple[int, dict[str, Any]]] = {}
+    filter = {"city": city, "timestamp": {"$lt": cutoff}, **CLEAN_FILTER}
+    for chunk in iter_reading_chunks(filter, cities=[city]):
+        seconds = chunk.timestamp // _NS_PER_SECOND
+        columns = {field: chunk.values[field].astype(np.float64) for field in POLLUTANT_FIELDS}
+        columns["aqi"] = chunk.aqi.astype(np.float64)
+        documents = []
+        for resolution, width in RESOLUTIONS.items():
+            starts = seconds // width * width
+            # Chunks are time-ordered, so every bucket is one contiguous run.
+            edges = np.flatnonzero(np.r_[True, starts[1:] != starts[:-1]])
+            counts = np.diff(np.r_[edges, len(starts)])
+            reduced = {}
+            for field, values in columns.items():
+                finite = np.isfinite(values)
+                reduced[field] = (
+                    np.fmin.reduceat(values, edges),
+                    np.fmax.reduceat(values, edges),
+                    np.add.reduceat(np.where(finite, values, 0.0), edges),
+                    np.add.reduceat(finite.astype(np.int64), edges),
+                )
+            for position, edge in enumerate(edges):
+                start = int(starts[edge])
+                delta = {"count": int(counts[position])}
+                for field, (low, high, total, count) in reduced.items():
+                    delta[field] = [low[position], high[position], total[position], count[position]]
+                held = open_buckets.get(resolution)
+                if held is not None and held[0] == start:
+                    _merge(held[1], delta)
+                    continue
+                if held is not None:
+                    documents.append(_document(resolution, city, *held))
+                open_buckets[resolution] = (start, delta)
+        if documents:
+            collection.insert_many(documents, ordered=False)
+    tail = []
+    for resolution, (start, delta) in open_buckets.items():
+        if start < limit // RESOLUTIONS[resolution] * RESOLUTIONS[resolution]:
+            tail.append(_document(resolution, city, start, delta))
+        else:
+            # The cutoff's own bucket also takes ingested readings, so it merges like one.
+            with _lock:
+                _merge(_pending.setdefault((resolution, city, start), _empty()), delta)
+    if tail:
+        collection.insert_many(tail, ordered=False)
+
+
+def backfill_rollups() -> int:
+    """Roll up the existing history of every city not yet backfilled; returns the cities done"""
+    from .cold_storage import cold_cities
+
+    done = 0
+    with _backfill_lock:
+        backfilled = _loaded_backfilled()
+        cities = set(get_collection("readings").distinct("city", CLEAN_FILTER)) | set(cold_cities())
+        for city in sorted(cities - backfilled):
+            # Readings from the cutoff on are folded in by `observe` while the history is scanned.
+            cutoff = _backfill_cutoffs.setdefault(city, datetime.utcnow())
+            _backfill(city, cutoff)
+            get_collection("rollup_state").update_one(
+                {"city": city}, {"$set": {"backfilled_at": cutoff}}, upsert=True
+            )
+            backfilled.add(city)
+            _backfill_cutoffs.pop(city, None)
+            done += 1
+    return done
+
+
+def observe(reading: dict[str, Any]) -> None:
+    """Fold one stored reading into the buckets of every resolution"""
+    city = reading.get("city", "Unknown")
+    timestamp = reading.get("timestamp")
+    if city not in _loaded_backfilled():
+        # Older readings of a city still waiting for `backfill_rollups` are counted from the store.
+        cutoff = _backfill_cutoffs.get(city)
+        if cutoff is None or epoch_ns(timestamp) < epoch_ns(cutoff):
+            return
+    values = {field: reading.get(field) for field in POLLUTANT_FIELDS}
+    values["aqi"] = compute_aqi(values)["aqi"]
+    seconds = epoch_ns(timestamp) // _NS_PER_SECOND
+    with _lock:
+        for resolution, width in RESOLUTIONS.items():
+            bucket = _pending.setdefault((resolution, city, seconds // width * width), _empty())
+            bucket["count"] += 1
+            for field, value in values.items():
+                if value is None:
+                    continue
+                stats = bucket[field]
+                stats[0] = min(stats[0], value)
+                stats[1] = max(stats[1], value)
+                stats[2] += value
+                stats[3] += 1
+
+
+def flush_rollups() -> None:
+    global _pending, _flushing
+    with _lock:
+        # A flush already under way owns `_flushing`; the next run picks these deltas up.
+        if not _pending or _flushing:
+            return
+        _flushing, _pending = _pending, {}
+    failed: dict[tuple[str, str, int], dict[str, Any]] = {}
+    for key, delta in list(_flushing.items()):
+        with _flush_lock:
+            try:
+                _write(*key, delta)
+            except Exception:
+                failed[key] = delta
+                continue
+            with _lock:
+                del _flushing[key]
+    with _lock:
+        for key, delta in failed.items():
+            _merge(_pending.setdefault(key, _empty()), delta)
+        _flushing = {}
+
+
+def _from_document(doc: dict[str, Any]) -> dict[str, Any]:
+    bucket = _empty()
+    bucket["count"] = doc.get("count", 0)
+    for field in ROLLUP_FIELDS:
+        stats = doc.get(field) or {}
+        if stats.get("count"):
+            bucket[field] = [stats["min"], stats["max"], stats["sum"], stats["count"]]
+    return bucket
+
+
+def get_rollups(
+    city: str, resolution: str, start: datetime | None = None, end: datetime | None = None
+) -> list[dict[str, Any]]:
+    """Buckets overlapping [start, end), oldest first, stored plus not-yet-flushed"""
+    width = RESOLUTIONS[resolution]
+    end = end or datetime.utcnow()
+    start = start or end - timedelta(seconds=width * settings.rollup_max_buckets)
+    first = epoch_ns(start) // _NS_PER_SECOND // width * width
+    last = epoch_ns(end) // _NS_PER_SECOND
+
+    buckets: dict[int, dict[str, Any]] = {}
+    with _flush_lock:
+        try:
+            cursor = (
+                get_collection("rollups")
+                .find(
+                    {"city": city, "resolution": resolution, "start": {"$gte": _bucket_start(first), "$lt": end}},
+                    {"_id": 0},
+                )
+                .sort("start", DESCENDING)
+                .limit(settings.rollup_max_buckets)
+            )
+            for doc in cursor:
+                buckets[epoch_ns(doc["start"]) // _NS_PER_SECOND] = _from_document(doc)
+        except Exception:
+            pass
+        with _lock:
+            unflushed = [*_flushing.items(), *_pending.items()]
+    for (pending_resolution, pending_city, bucket_start), delta in unflushed:
+        if pending_resolution == resolution and pending_city == city and first <= bucket_start < last:
+            _merge(buckets.setdefault(bucket_start, _empty()), delta)
+
+    rows = []
+    for bucket_start in sorted(buckets)[-settings.rollup_max_buckets:]:
+        bucket = buckets[bucket_start]
+        row: dict[str, Any] = {"start": _bucket_start(bucket_start).isoformat(), "count": bucket["count"]}
+        for field in ROLLUP_FIELDS:
+            low, high, total, count = bucket[field]
+            row[field] = (
+                {"min": round(low, 2), "max": round(high, 2), "mean": round(total / count, 2)}
+                if count
+                else None
+            )
+        rows.append(row)
+    return rows
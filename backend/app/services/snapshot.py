@@ -0,0 +1,33 @@
+from __future__ import annotations
+
+import threading
+from typing import Iterable
+
+# A single monotonic version covers every piece of live state (latest readings,
+# alerts, ...). Each changed key remembers the version at which it last changed,
+# so clients can ask for "everything newer than version N".
+_lock = threading.Lock()
+_version = 0
+_key_versions: dict[str, dict[str, int]] = {}
+
+
+def current_version() -> int:
+    return _version
+
+
+def bump(kind: str, keys: Iterable[str]) -> int:
+    global _version
+    keys = list(keys)
+    if not keys:
+        return _version
+    with _lock:
+        _version += 1
+        versions = _key_versions.setdefault(kind, {})
+        for key in keys:
+            versions[key] = _version
+        return _version
+
+
+def changed_since(kind: str, version: int) -> list[str]:
+    return [key for key, changed in _key_versions.get(kind, {}).items() if changed > version]
+
@@ -0,0 +1,99 @@
+from __future__ import annotations
+
+import math
+import threading
+from typing import Any, Iterable
+
+import numpy as np
+from scipy.spatial import cKDTree
+
+EARTH_RADIUS_KM = 6371.0088
+
+
+def _unit_vectors(latitude: np.ndarray, longitude: np.ndarray) -> np.ndarray:
+    lat, lon = np.radians(latitude), np.radians(longitude)
+    return np.column_stack([np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)])
+
+
+def haversine_km(lat1: float, lon1: float, lat2: np.ndarray, lon2: np.ndarray) -> np.ndarray:
+    phi1, phi2 = math.radians(lat1), np.radians(lat2)
+    d_phi = phi2 - phi1
+    d_lambda = np.radians(lon2) - math.radians(lon1)
+    a = np.sin(d_phi / 2) ** 2 + math.cos(phi1) * np.cos(phi2) * np.sin(d_lambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def station_key(reading: dict[str, Any]) -> tuple[str, float, float]:
+    """Readings carry no station id, so a station is a city and a position"""
+    return reading.get("city", "Unknown"), float(reading["latitude"]), float(reading["longitude"])
+
+
+class StationIndex:
+    """KD-tree over station positions on the unit sphere, rebuilt lazily when a station appears"""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._latest: dict[tuple[str, float, float], dict[str, Any]] = {}
+        self._tree: cKDTree | None = None
+        self._stations: list[tuple[str, float, float]] = []
+        self._coordinates = np.empty((0, 2))
+
+    def observe(self, readings: Iterable[dict[str, Any]]) -> None:
+        """Track each station's newest reading; callers pass clean readings only"""
+        with self._lock:
+            for reading in readings:
+                # Serialized readings default missing coordinates to 0.0, which places nothing.
+                if not (reading.get("latitude") or reading.get("longitude")):
+                    continue
+                try:
+                    key = station_key(reading)
+                except (KeyError, TypeError, ValueError):
+                    continue
+                previous = self._latest.get(key)
+                if previous is not None and str(previous.get("timestamp", "")) > str(reading.get("timestamp", "")):
+                    continue
+                if previous is None:
+                    self._tree = None
+                self._latest[key] = reading
+
+    def __len__(self) -> int:
+        return len(self._latest)
+
+    def _snapshot(self) -> tuple[cKDTree | None, list[tuple[str, float, float]], np.ndarray]:
+        with self._lock:
+            if self._tree is None and self._latest:
+                self._stations = list(self._latest)
+                self._coordinates = np.array([key[1:] for key in self._stations])
+                self._tree = cKDTree(_unit_vectors(self._coordinates[:, 0], self._coordinates[:, 1]))
+            return self._tree, self._stations, self._coordinates
+
+    def nearest(
+        self, latitude: float, longitude: float, k: int, radius_km: float | None = None
+    ) -> list[tuple[dict[str, Any], float]]:
+        """Up to k (latest reading, distance_km) pairs, one per station, closest first"""
+        tree, stations, coordinates = self._snapshot()
+        if tree is None or k <= 0:
+            return []
+        k = min(k, len(stations))
+        # Straight-line chord length between unit vectors grows with arc length,
+        # so a chord bound is an exact great-circle radius bound.
+        bound = np.inf
+        if radius_km is not None and radius_km < math.pi * EARTH_RADIUS_KM:
+            bound = 2 * math.sin(radius_km / (2 * EARTH_RADIUS_KM)) * (1 + 1e-9)
+        point = _unit_vectors(np.array([latitude]), np.array([longitude]))[0]
+        _, indices = tree.query(point, k=k, distance_upper_bound=bound)
+        indices = np.atleast_1d(indices)
+        indices = indices[indices < len(stations)]
+        if len(indices) == 0:
+            return []
+        distances = haversine_km(latitude, longitude, coordinates[indices, 0], coordinates[indices, 1])
+        with self._lock:
+            latest = [self._latest[stations[index]] for index in indices]
+        return [
+            (reading, float(distance))
+            for reading, distance in zip(latest, distances)
+            if radius_km is None or distance <= radius_km
+        ]
+
+
+station_index = StationIndex()
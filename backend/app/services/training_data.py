@@ -0,0 +1,194 @@
+from __future__ import annotations
+
+from datetime import datetime, timezone
+from itertools import islice
+from typing import Any, Iterable, Iterator, NamedTuple
+
+import numpy as np
+import pandas as pd
+from pymongo import ASCENDING, DESCENDING
+
+from ..config import get_settings
+from ..db import get_collection
+from .aqi import compute_aqi_array
+
+settings = get_settings()
+
+
+POLLUTANT_FIELDS = ("pm25", "pm10", "co2", "no2")
+# Readings flagged as sensor faults at ingest are stored for inspection but
+# kept out of the latest cache, rollups and model training.
+CLEAN_FILTER: dict[str, Any] = {"flagged": {"$ne": True}}
+VALUE_FIELDS = ("latitude", "longitude", *POLLUTANT_FIELDS, "temperature", "humidity")
+PROJECTION = {"_id": 0, "city": 1, "timestamp": 1, **{field: 1 for field in VALUE_FIELDS}}
+
+_EPOCH_NAIVE = datetime(1970, 1, 1)
+_EPOCH_AWARE = datetime(1970, 1, 1, tzinfo=timezone.utc)
+_NS_PER_MICROSECOND = 1000
+
+
+class ReadingColumns(NamedTuple):
+    timestamp: np.ndarray  # int64 nanoseconds since epoch (UTC)
+    city_codes: np.ndarray  # int32 codes into `cities`
+    cities: list[str]
+    values: dict[str, np.ndarray]  # float32 per field, NaN when missing
+    aqi: np.ndarray  # float32
+
+    def __len__(self) -> int:
+        return len(self.timestamp)
+
+
+def epoch_ns(value: Any) -> int:
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    if isinstance(value, datetime):
+        epoch = _EPOCH_NAIVE if value.tzinfo is None else _EPOCH_AWARE
+        delta = value - epoch
+        return (
+            (delta.days * 86_400 + delta.seconds) * 1_000_000 + delta.microseconds
+        ) * _NS_PER_MICROSECOND
+    if isinstance(value, (int, np.integer)):
+        return int(value)
+    return 0
+
+
+def _float(value: Any) -> float:
+    return np.nan if value is None else value
+
+
+def _columns_from_docs(docs: list[dict[str, Any]], city_index: dict[str, int]) -> ReadingColumns:
+    """Convert one chunk of raw documents straight into typed columns"""
+    size = len(docs)
+    timestamp = np.fromiter((epoch_ns(doc.get("timestamp")) for doc in docs), dtype=np.int64, count=size)
+    city_codes = np.fromiter(
+        (city_index.setdefault(doc.get("city", "Unknown"), len(city_index)) for doc in docs),
+        dtype=np.int32,
+        count=size,
+    )
+    raw = {
+        field: np.fromiter((_float(doc.get(field)) for doc in docs), dtype=np.float64, count=size)
+        for field in VALUE_FIELDS
+    }
+    aqi = compute_aqi_array({field: raw[field] for field in POLLUTANT_FIELDS})
+    return ReadingColumns(
+        timestamp=timestamp,
+        city_codes=city_codes,
+        cities=list(city_index),
+        values={field: column.astype(np.float32) for field, column in raw.items()},
+        aqi=aqi.astype(np.float32),
+    )
+
+
+def _concat(chunks: list[ReadingColumns], cities: list[str]) -> ReadingColumns:
+    return ReadingColumns(
+        timestamp=np.concatenate([chunk.timestamp for chunk in chunks]),
+        city_codes=np.concatenate([chunk.city_codes for chunk in chunks]),
+        cities=cities,
+        values={
+            field: np.concatenate([chunk.values[field] for chunk in chunks])
+            for field in VALUE_FIELDS
+        },
+        aqi=np.concatenate([chunk.aqi for chunk in chunks]),
+    )
+
+
+def chunked(cursor: Iterable[dict[str, Any]], chunk_size: int) -> Iterable[list[dict[str, Any]]]:
+    batch: list[dict[str, Any]] = []
+    for doc in cursor:
+        batch.append(doc)
+        if len(batch) >= chunk_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def load_reading_columns(
+    limit: int | None = None,
+    filter: dict[str, Any] | None = None,
+    chunk_size: int | None = None,
+) -> ReadingColumns | None:
+    """Newest-first readings as typed columns, converted chunk by chunk from a lazy cursor"""
+    limit = limit or settings.training_window
+    chunk_size = chunk_size or settings.training_chunk_size
+    from .cold_storage import with_cold_readings
+
+    # Store and sealed-block errors propagate: training on silently missing history is worse than failing.
+    collection = get_collection("readings")
+    cursor = (
+        collection.find(filter or {}, PROJECTION)
+        .sort("timestamp", DESCENDING)
+        .limit(limit)
+        .batch_size(chunk_size)
+    )
+    rows = islice(with_cold_readings(cursor, filter, newest_first=True), limit)
+    city_index: dict[str, int] = {}
+    chunks = [_columns_from_docs(batch, city_index) for batch in chunked(rows, chunk_size)]
+    if not chunks:
+        return None
+    return _concat(chunks, list(city_index))
+
+
+def columns_to_frame(columns: ReadingColumns) -> pd.DataFrame:
+    """Training frame in the layout the models expect, without per-row parsing"""
+    timestamp = pd.to_datetime(columns.timestamp, unit="ns", utc=True)
+    frame = pd.DataFrame(
+        {field: np.nan_to_num(columns.values[field], nan=0.0) for field in VALUE_FIELDS}
+    )
+    frame["aqi"] = columns.aqi
+    frame["timestamp"] = timestamp
+    frame["hour"] = timestamp.hour.astype(np.int32)
+    frame["dayofweek"] = timestamp.dayofweek.astype(np.int32)
+    frame["city"] = pd.Categorical.from_codes(
+        columns.city_codes, categories=columns.cities
+    ).reorder_categories(sorted(columns.cities))
+    return pd.get_dummies(frame, columns=["city"], drop_first=True)
+
+
+def load_training_frame(limit: int | None = None, min_rows: int = 50) -> pd.DataFrame | None:
+    columns = load_reading_columns(limit=limit, filter=CLEAN_FILTER)
+    if columns is None or len(columns) < min_rows:
+        return None
+    return columns_to_frame(columns)
+
+
+def training_cities(filter: dict[str, Any] | None = None) -> list[str]:
+    from .cold_storage import cold_cities
+
+    try:
+        return sorted(set(get_collection("readings").distinct("city", filter or {})) | set(cold_cities(filter)))
+    except Exception:
+        return []
+
+
+def iter_reading_chunks(
+    filter: dict[str, Any] | None = None,
+    chunk_size: int | None = None,
+    cities: list[str] | None = None,
+) -> Iterator[ReadingColumns]:
+    """Stream oldest-first readings as fixed-size column chunks with stable city codes"""
+    from .cold_storage import with_cold_readings
+
+    chunk_size = chunk_size or settings.training_chunk_size
+    city_index = {city: code for code, city in enumerate(cities or [])}
+    cursor = (
+        get_collection("readings")
+        .find(filter or {}, PROJECTION)
+        .sort("timestamp", ASCENDING)
+        .batch_size(chunk_size)
+    )
+    for batch in chunked(with_cold_readings(cursor, filter), chunk_size):
+        yield _columns_from_docs(batch, city_index)
+
+
+def columns_to_features(columns: ReadingColumns, cities: list[str]) -> tuple[pd.DataFrame, np.ndarray]:
+    """Feature matrix with a fixed city-dummy layout so every chunk lines up"""
+    timestamp = pd.to_datetime(columns.timestamp, unit="ns", utc=True)
+    features = pd.DataFrame(
+        {field: np.nan_to_num(columns.values[field], nan=0.0) for field in VALUE_FIELDS}
+    )
+    features["hour"] = timestamp.hour.astype(np.int32)
+    features["dayofweek"] = timestamp.dayofweek.astype(np.int32)
+    for code, city in enumerate(cities[1:], start=1):
+        features[f"city_{city}"] = columns.city_codes == code
+    return features, columns.aqi.astype(np.float64)
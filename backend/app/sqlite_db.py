@@ -0,0 +1,449 @@
+from __future__ import annotations
+
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from itertools import islice
+from pathlib import Path
+from typing import Any, Iterable, Iterator, Mapping
+
+import bson
+import numpy as np
+from bson import ObjectId
+from bson.codec_options import CodecOptions, TypeRegistry
+from pymongo.errors import BulkWriteError
+
+from .mock_db import (
+    _MISSING,
+    MockCursor,
+    _apply_projection,
+    _apply_update,
+    _matches,
+    _normalize,
+    _upsert_document,
+)
+
+DEFAULT_BATCH_SIZE = 5_000
+# SQLite's default limit on bound parameters is far higher, but long IN lists stop paying off.
+_MAX_IN_PARAMS = 900
+_EPOCH = datetime(1970, 1, 1)
+_EPOCH_AWARE = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+# The field promoted into the indexed time column, per collection.
+_TIME_FIELDS = {"rollups": "start", "readings_cold": "day"}
+
+
+def _fallback_encoder(value: Any) -> Any:
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    raise TypeError(f"Cannot store {type(value).__name__} values")
+
+
+_CODEC = CodecOptions(type_registry=TypeRegistry(fallback_encoder=_fallback_encoder))
+
+
+def _millis(value: datetime) -> int:
+    # BSON keeps millisecond precision, so the column and the document agree.
+    epoch = _EPOCH if value.tzinfo is None else _EPOCH_AWARE
+    delta = value - epoch
+    return (delta.days * 86_400 + delta.seconds) * 1_000 + delta.microseconds // 1_000
+
+
+def _column_value(column: str, value: Any) -> Any:
+    """The indexed column value for a document or query value, or None when it has no column form"""
+    if column == "city":
+        return value if isinstance(value, str) else None
+    if column == "ts":
+        return _millis(value) if isinstance(value, datetime) else None
+    return value.binary if isinstance(value, ObjectId) else None
+
+
+def _oid_key(value: Any) -> Any:
+    """The unique-index key for a stored _id: ObjectIds as bytes, strings as text"""
+    # Never used in queries: string _id filters stay in Python, so rows stored before strings had a key still match.
+    return value if isinstance(value, str) else _column_value("oid", value)
+
+
+def _condition_sql(column: str, condition: Any) -> tuple[str, list[Any]] | None:
+    """SQL for a condition on an indexed column, or None to evaluate it in Python"""
+    if not (isinstance(condition, dict) and condition and all(key.startswith("$") for key in condition)):
+        condition = {"$eq": condition}
+    clauses: list[str] = []
+    params: list[Any] = []
+    for op, operand in condition.items():
+        if op in ("$in", "$nin"):
+            values = [_column_value(column, _normalize(value)) for value in operand]
+            if None in values or len(values) > _MAX_IN_PARAMS:
+                return None
+            placeholders = ", ".join("?" * len(values))
+            if op == "$in":
+                clauses.append(f"{column} IN ({placeholders})" if values else "0")
+            else:
+                clauses.append(f"({column} IS NULL OR {column} NOT IN ({placeholders}))" if values else "1")
+            params.extend(values)
+            continue
+        value = _column_value(column, _normalize(operand))
+        sql = {"$eq": "=", "$ne": "IS NOT", "$gt": ">", "$gte": ">=", "$lt": "<", "$lte": "<="}.get(op)
+        if value is None or sql is None or (column == "oid" and op not in ("$eq", "$ne")):
+            return None
+        clauses.append(f"{column} {sql} ?")
+        params.append(value)
+    return " AND ".join(clauses), params
+
+
+class SqliteCursor:
+    def __init__(
+        self,
+        collection: SqliteCollection,
+        filter: Mapping[str, Any] | None = None,
+        projection: Mapping[str, Any] | None = None,
+    ):
+        self._collection = collection
+        self._filter = dict(filter or {})
+        self._projection = projection
+        self._sort: list[tuple[str, int]] = []
+        self._limit = 0
+        self._batch_size = 0
+
+    def sort(self, key_or_list: Any, direction: Any = None) -> SqliteCursor:
+        if isinstance(key_or_list, str):
+            self._sort = [(key_or_list, direction or 1)]
+        else:
+            self._sort = [(key, value) for key, value in key_or_list]
+        return self
+
+    def limit(self, limit: int) -> SqliteCursor:
+        self._limit = limit
+        return self
+
+    def batch_size(self, batch_size: int) -> SqliteCursor:
+        self._batch_size = batch_size
+        return self
+
+    def _sql(self) -> tuple[str, list[Any], dict[str, Any], bool]:
+        """The SELECT for this cursor, its parameters, the residual filter and whether SQL sorts"""
+        collection = self._collection
+        where, params, residual = collection._translate(self._filter)
+        columns = [collection._columns.get(key) for key, _ in self._sort]
+        in_sql = None not in columns
+        sql = f'SELECT doc FROM "{collection.name}"{where}'
+        if self._sort and in_sql:
+            order = [f"{column} {'DESC' if direction == -1 else 'ASC'}" for column, (_, direction) in zip(columns, self._sort)]
+            # Ties break on rowid in the last key's direction, which indexes already end with.
+            sql += " ORDER BY " + ", ".join(order) + f", rowid {'DESC' if self._sort[-1][1] == -1 else 'ASC'}"
+        if self._limit and not residual and in_sql:
+            sql += f" LIMIT {int(self._limit)}"
+        return sql, params, residual, in_sql
+
+    def __iter__(self) -> Iterator[dict[str, Any]]:
+        sql, params, residual, in_sql = self._sql()
+        rows = self._collection._connection().execute(sql, params)
+        docs: Iterable[dict[str, Any]] = (bson.decode(row[0]) for row in rows)
+        if residual:
+            docs = (doc for doc in docs if _matches(doc, residual))
+        if self._sort and not in_sql:
+            docs = list(docs)
+            for key, direction in reversed(self._sort):
+                docs.sort(key=lambda doc: doc.get(key, 0), reverse=direction == -1)
+        if self._limit:
+            docs = islice(docs, self._limit)
+        for doc in docs:
+            yield _apply_projection(doc, self._projection)
+
+    def to_list(self, length: int | None = None) -> list[dict[str, Any]]:
+        return list(islice(self, length) if length else self)
+
+
+class SqliteCollection:
+    """One table per collection: BSON documents plus indexed city, time and id columns"""
+
+    def __init__(self, client: SqliteClient, name: str):
+        self._client = client
+        self.name = name
+        self._time_field = _TIME_FIELDS.get(name, "timestamp")
+        self._columns = {"city": "city", self._time_field: "ts", "_id": "oid"}
+        self._create()
+
+    def _connection(self) -> sqlite3.Connection:
+        return self._client.connection()
+
+    def _create(self) -> None:
+        table = self.name
+        connection = self._connection()
+        connection.execute(
+            f'CREATE TABLE IF NOT EXISTS "{table}" '
+            "(rowid INTEGER PRIMARY KEY, oid BLOB, city TEXT, ts INTEGER, doc BLOB NOT NULL)"
+        )
+        # Latest-per-city, per-city counts and distinct cities are answered from this index alone.
+        connection.execute(f'CREATE INDEX IF NOT EXISTS "{table}_city_ts" ON "{table}" (city, ts)')
+        connection.execute(f'CREATE INDEX IF NOT EXISTS "{table}_ts" ON "{table}" (ts)')
+        connection.execute(f'CREATE UNIQUE INDEX IF NOT EXISTS "{table}_oid" ON "{table}" (oid)')
+
+    def _row(self, document: dict[str, Any]) -> tuple[Any, ...]:
+        return (
+            _oid_key(document.get("_id")),
+            _column_value("city", document.get("city")),
+            _column_value("ts", document.get(self._time_field)),
+            bson.encode(document, codec_options=_CODEC),
+        )
+
+    def _translate(self, filter: Mapping[str, Any] | None) -> tuple[str, list[Any], dict[str, Any]]:
+        """WHERE clause for the indexed parts of a filter, plus the rest to match in Python"""
+        clauses: list[str] = []
+        params: list[Any] = []
+        residual: dict[str, Any] = {}
+        for key, condition in (filter or {}).items():
+            column = self._columns.get(key)
+            sql = _condition_sql(column, _normalize(condition)) if column else None
+            if sql is None:
+                residual[key] = condition
+            else:
+                clauses.append(sql[0])
+                params.extend(sql[1])
+        return (" WHERE " + " AND ".join(clauses) if clauses else ""), params, residual
+
+    def _matching_rows(self, filter: Mapping[str, Any] | None, limit: int = 0) -> Iterator[tuple[int, dict[str, Any]]]:
+        where, params, residual = self._translate(filter)
+        sql = f'SELECT rowid, doc FROM "{self.name}"{where} ORDER BY rowid'
+        if limit and not residual:
+            sql += f" LIMIT {int(limit)}"
+        matched = 0
+        for rowid, data in self._connection().execute(sql, params):
+            doc = bson.decode(data)
+            if residual and not _matches(doc, residual):
+                continue
+            yield rowid, doc
+            matched += 1
+            if limit and matched >= limit:
+                return
+
+    def find(
+        self,
+        filter: dict[str, Any] | None = None,
+        projection: Mapping[str, Any] | None = None,
+    ) -> SqliteCursor:
+        return SqliteCursor(self, filter, projection)
+
+    def find_one(
+        self,
+        filter: dict[str, Any] | None = None,
+        projection: Mapping[str, Any] | None = None,
+    ) -> dict[str, Any] | None:
+        return next(iter(self.find(filter, projection).limit(1)), None)
+
+    def distinct(self, key: str, filter: dict[str, Any] | None = None) -> list[Any]:
+        where, params, residual = self._translate(filter)
+        if key == "city" and not residual:
+            connection = self._connection()
+            joiner = " AND" if where else " WHERE"
+            values = [
+                row[0]
+                for row in connection.execute(f'SELECT DISTINCT city FROM "{self.name}"{where}{joiner} city IS NOT NULL', params)
+            ]
+            # Cities stored as None or a non-string have no column value, so those rare rows are decoded.
+            for (data,) in connection.execute(f'SELECT doc FROM "{self.name}"{where}{joiner} city IS NULL', params):
+                value = bson.decode(data).get("city", _MISSING)
+                if value is not _MISSING and value not in values:
+                    values.append(value)
+            return values
+        values: list[Any] = []
+        for doc in self.find(filter):
+            value = doc.get(key, _MISSING)
+            if value is not _MISSING and value not in values:
+                values.append(value)
+        return values
+
+    def count_documents(self, filter: dict[str, Any]) -> int:
+        where, params, residual = self._translate(filter)
+        if not residual:
+            return self._connection().execute(f'SELECT COUNT(*) FROM "{self.name}"{where}', params).fetchone()[0]
+        return sum(1 for _ in self.find(filter))
+
+    def _prepare(self, document: dict[str, Any]) -> dict[str, Any]:
+        if "_id" not in document:
+            document["_id"] = ObjectId()
+        for key, value in document.items():
+            document[key] = _normalize(value)
+        return document
+
+    def insert_one(self, document: dict[str, Any]) -> Any:
+        row = self._row(self._prepare(document))
+        with self._client.transaction() as connection:
+            connection.execute(f'INSERT INTO "{self.name}" (oid, city, ts, doc) VALUES (?, ?, ?, ?)', row)
+
+        class InsertResult:
+            inserted_id = document["_id"]
+        return InsertResult()
+
+    def insert_many(self, documents: Iterable[dict[str, Any]], ordered: bool = True) -> Any:
+        ids: list[Any] = []
+        write_errors: list[dict[str, Any]] = []
+        documents = iter(documents)
+        offset = 0
+        # One prepared statement and one transaction per batch.
+        sql = f'INSERT INTO "{self.name}" (oid, city, ts, doc) VALUES (?, ?, ?, ?)'
+        while batch := [self._prepare(document) for document in islice(documents, self._client.batch_size)]:
+            rows = [self._row(document) for document in batch]
+            try:
+                with self._client.transaction() as connection:
+                    connection.executemany(sql, rows)
+                ids.extend(document["_id"] for document in batch)
+            except sqlite3.IntegrityError:
+                # The batch rolled back; row by row only the duplicates are rejected, as MongoDB does.
+                with self._client.transaction() as connection:
+                    for index, (document, row) in enumerate(zip(batch, rows)):
+                        if connection.execute(sql.replace("INSERT", "INSERT OR IGNORE", 1), row).rowcount:
+                            ids.append(document["_id"])
+                            continue
+                        write_errors.append({
+                            "index": offset + index,
+                            "code": 11000,
+                            "errmsg": f"E11000 duplicate key error collection: {self.name} _id: {document['_id']!r}",
+                            "op": document,
+                        })
+                        if ordered:
+                            break
+            if write_errors and ordered:
+                break
+            offset += len(batch)
+        if write_errors:
+            raise BulkWriteError({"writeErrors": write_errors, "nInserted": len(ids), "writeConcernErrors": []})
+
+        class InsertManyResult:
+            inserted_ids = ids
+        return InsertManyResult()
+
+    def update_one(self, filter: dict[str, Any], update: dict[str, Any], upsert: bool = False) -> Any:
+        with self._client.transaction() as connection:
+            rowid, doc = next(self._matching_rows(filter, limit=1), (None, None))
+            inserted = doc is None and upsert
+            if inserted:
+                doc = self._prepare(_upsert_document(filter))
+            if doc is not None:
+                _apply_update(doc, update, inserted)
+                row = self._row(doc)
+                if inserted:
+                    connection.execute(f'INSERT INTO "{self.name}" (oid, city, ts, doc) VALUES (?, ?, ?, ?)', row)
+                else:
+                    connection.execute(
+                        f'UPDATE "{self.name}" SET oid = ?, city = ?, ts = ?, doc = ? WHERE rowid = ?', (*row, rowid)
+                    )
+
+        matched = int(doc is not None and not inserted)
+        new_id = doc["_id"] if inserted else None
+
+        class UpdateResult:
+            matched_count = matched
+            modified_count = matched
+            upserted_id = new_id
+        return UpdateResult()
+
+    def delete_many(self, filter: dict[str, Any]) -> Any:
+        where, params, residual = self._translate(filter)
+        with self._client.transaction() as connection:
+            if not residual:
+                removed = connection.execute(f'DELETE FROM "{self.name}"{where}', params).rowcount
+            else:
+                rowids = [(rowid,) for rowid, _ in self._matching_rows(filter)]
+                connection.executemany(f'DELETE FROM "{self.name}" WHERE rowid = ?', rowids)
+                removed = len(rowids)
+
+        class DeleteResult:
+            deleted_count = removed
+        return DeleteResult()
+
+    def drop(self) -> None:
+        with self._client.transaction() as connection:
+            connection.execute(f'DROP TABLE IF EXISTS "{self.name}"')
+        self._create()
+
+    def aggregate(self, pipeline: list[dict[str, Any]]) -> MockCursor:
+        # Supports the latest-document-per-city pipeline used by readings.py, like the mock store.
+        match = next((stage["$match"] for stage in pipeline if "$match" in stage), None)
+        where, params, residual = self._translate(match)
+        connection = self._connection()
+        city_where = f"{where}{' AND' if where else ' WHERE'} city = ?"
+        result = []
+        for city in self.distinct("city", {key: value for key, value in (match or {}).items() if key not in residual}):
+            if not city:
+                continue
+            rows = connection.execute(
+                f'SELECT doc FROM "{self.name}"{city_where} ORDER BY ts DESC, rowid DESC', [*params, city]
+            )
+            for (data,) in rows:
+                doc = bson.decode(data)
+                if not residual or _matches(doc, residual):
+                    result.append({"_id": city, "doc": doc})
+                    break
+        return MockCursor(result)
+
+
+class SqliteDatabase:
+    def __init__(self, client: SqliteClient):
+        self._client = client
+        self._collections: dict[str, SqliteCollection] = {}
+        self._lock = threading.Lock()
+
+    def __getitem__(self, name: str) -> SqliteCollection:
+        with self._lock:
+            if name not in self._collections:
+                self._collections[name] = SqliteCollection(self._client, name)
+            return self._collections[name]
+
+
+class SqliteClient:
+    """Embedded store in one SQLite file in WAL mode, with one connection per thread"""
+
+    def __init__(self, path: str | Path, batch_size: int = DEFAULT_BATCH_SIZE, **kwargs: Any):
+        self.path = Path(path)
+        self.batch_size = batch_size
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+        self._db = SqliteDatabase(self)
+
+    def connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            # Autocommit mode: writes open their own transactions through `transaction()`.
+            connection = sqlite3.connect(self.path, timeout=30, isolation_level=None, cached_statements=256)
+            # Only takes effect before the first table exists; lets `compact()` shrink the file.
+            connection.execute("PRAGMA auto_vacuum=INCREMENTAL")
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
+
+    @contextmanager
+    def transaction(self) -> Iterator[sqlite3.Connection]:
+        connection = self.connection()
+        if connection.in_transaction:
+            yield connection
+            return
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            yield connection
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        connection.execute("COMMIT")
+
+    def _footprint(self) -> int:
+        files = (self.path, self.path.with_name(f"{self.path.name}-wal"))
+        return sum(path.stat().st_size for path in files if path.exists())
+
+    def compact(self) -> int:
+        """Return free pages to the file system and fold the WAL back in; returns the bytes freed"""
+        connection = self.connection()
+        before = self._footprint()
+        # Each step frees one page; executescript runs the pragma to completion.
+        connection.executescript("PRAGMA incremental_vacuum;")
+        connection.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchall()
+        connection.execute("PRAGMA optimize")
+        # Measured on disk: the vacuum itself can grow the freelist or the WAL.
+        return max(before - self._footprint(), 0)
+
+    def __getitem__(self, name: str) -> SqliteDatabase:
+        return self._db
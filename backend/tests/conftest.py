@@ -0,0 +1,46 @@
+from __future__ import annotations
+
+import os
+import tempfile
+
+# Settings are read once at import, so the test environment is fixed before the app loads.
+os.environ.setdefault("NO_SCHEDULER", "true")
+os.environ.setdefault("STORAGE_BACKEND", "memory")
+os.environ.setdefault("MODELS_DIR", tempfile.mkdtemp(prefix="aerosense-models-"))
+
+import pytest
+
+from app import create_app
+from app import db
+from app.config import get_settings
+
+
+@pytest.fixture(scope="session")
+def app():
+    return create_app()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def mongo(monkeypatch):
+    """A mongomock database standing in for MongoDB behind `get_collection`"""
+    mongomock = pytest.importorskip("mongomock")
+    mongo_client = mongomock.MongoClient()
+    monkeypatch.setattr(db, "get_client", lambda: mongo_client)
+    monkeypatch.setattr(get_settings(), "storage_backend", "mongo")
+    return mongo_client[get_settings().mongo_db]
+
+
+@pytest.fixture
+def sqlite(monkeypatch, tmp_path):
+    """A fresh SQLite store behind `get_collection`"""
+    from app.sqlite_db import SqliteClient
+
+    sqlite_client = SqliteClient(tmp_path / "aerosense.db", batch_size=get_settings().sqlite_batch_size)
+    monkeypatch.setattr(db, "get_client", lambda: sqlite_client)
+    monkeypatch.setattr(get_settings(), "storage_backend", "sqlite")
+    return sqlite_client
@@ -0,0 +1,77 @@
+"""Documents and filters shared by the store parity tests, with MockCollection as the reference"""
+from __future__ import annotations
+
+import random
+from datetime import datetime, timedelta, timezone
+from typing import Any
+
+from bson import ObjectId
+
+START = datetime(2024, 6, 1)
+
+
+def documents(count: int = 400, seed: int = 9) -> list[dict[str, Any]]:
+    """Readings with the irregularities real payloads have: gaps, None, mixed numeric types, odd cities"""
+    rng = random.Random(seed)
+    cities = ["Hyderabad", "Warangal", "Vijayawada", "Guntur", "", None, 5]
+    docs = []
+    for index in range(count):
+        doc: dict[str, Any] = {"_id": ObjectId(), "state": rng.choice(["Telangana", "Andhra Pradesh"])}
+        city = rng.choice(cities)
+        if index % 41:
+            doc["city"] = city
+        if index % 29 == 0:
+            doc["timestamp"] = None
+        elif index % 31 == 0:
+            doc["timestamp"] = (START + timedelta(minutes=index)).isoformat()
+        elif index % 37 == 0:
+            doc["timestamp"] = (START + timedelta(minutes=index)).replace(tzinfo=timezone.utc)
+        elif index % 43:
+            # Whole milliseconds, the precision BSON-backed stores keep.
+            doc["timestamp"] = START + timedelta(minutes=index, milliseconds=rng.randrange(60_000))
+        pm25 = rng.choice([None, "n/a", rng.randrange(0, 300), round(rng.uniform(0, 300), 2)])
+        if index % 13:
+            doc["pm25"] = pm25
+        if index % 5 == 0:
+            doc["flagged"] = rng.choice([True, False])
+            doc["anomalies"] = ["spike:pm25"]
+        docs.append(doc)
+    return docs
+
+
+def filters(docs: list[dict[str, Any]]) -> list[dict[str, Any]]:
+    some_ids = [doc["_id"] for doc in docs[::17]]
+    middle = START + timedelta(minutes=len(docs) // 2)
+    return [
+        {},
+        {"city": "Hyderabad"},
+        {"city": {"$ne": "Hyderabad"}},
+        {"city": {"$in": ["Warangal", "Guntur", 5]}},
+        {"city": {"$nin": ["Warangal", ""]}},
+        {"city": {"$gt": "H"}},
+        {"city": None},
+        {"city": {"$exists": False}},
+        {"timestamp": {"$gte": middle}},
+        {"timestamp": {"$gte": START + timedelta(minutes=50), "$lt": middle}},
+        {"timestamp": {"$lte": middle.replace(tzinfo=timezone.utc)}},
+        {"timestamp": None},
+        {"timestamp": {"$exists": True}},
+        {"_id": some_ids[3]},
+        {"_id": {"$in": some_ids}},
+        {"_id": {"$nin": some_ids}},
+        {"_id": {"$in": some_ids}, "city": "Vijayawada"},
+        {"pm25": {"$gt": 150}},
+        {"pm25": {"$gte": 0, "$lt": 100.5}},
+        {"pm25": None},
+        {"pm25": {"$ne": None}},
+        {"pm25": "n/a"},
+        {"pm25": {"$in": [0, 1, 2, 3, 4, 5]}},
+        {"flagged": {"$ne": True}},
+        {"flagged": True, "city": {"$in": ["Hyderabad", "Guntur"]}},
+        {"state": "Telangana", "timestamp": {"$lt": middle}, "pm25": {"$exists": True}},
+        {"city": "Warangal", "timestamp": {"$gte": START}, "flagged": {"$ne": True}},
+    ]
+
+
+def ids(docs: Any) -> list[ObjectId]:
+    return sorted(doc["_id"] for doc in docs)
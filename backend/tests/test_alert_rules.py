@@ -0,0 +1,69 @@
+from __future__ import annotations
+
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.services import alert_rules, model
+from app.services.alert_rules import RuleEngine, _validate
+
+START = datetime(2024, 2, 1, 8, 0)
+
+
+def _engine(*rules: dict) -> RuleEngine:
+    return RuleEngine([_validate(dict(rule), position) for position, rule in enumerate(rules)])
+
+
+def _reading(city: str, pm25: float) -> dict:
+    return {"city": city, "state": "Telangana", "pm25": pm25, "pm10": 40.0, "co2": 400.0, "no2": 10.0}
+
+
+@pytest.mark.parametrize("message", ["{cty} is high", "{} is high", "{value:.1q}", "{city"])
+def test_bad_message_templates_are_rejected_at_load(message):
+    with pytest.raises(ValueError, match="bad message template"):
+        _validate({"kind": "threshold", "field": "pm25", "value": 50, "message": message}, 0)
+
+
+def test_forecast_rules_never_train_a_model(monkeypatch):
+    monkeypatch.setattr(alert_rules, "_engine", _engine({"kind": "forecast", "value": 150}))
+
+    def refuse(*args, **kwargs):
+        raise AssertionError("the alert job must not train")
+
+    monkeypatch.setattr(model, "train_model_if_needed", refuse)
+    assert not model._model_path().exists()
+
+    assert alert_rules.load_forecasts() == {}
+    assert not model._model_path().exists()
+
+
+def test_rate_rule_compares_against_the_oldest_reading_in_its_window():
+    engine = _engine({"kind": "rate", "field": "pm25", "value": 20, "minutes": 30})
+    fired = [
+        bool(engine.evaluate([_reading("Rate-A", pm25)], [START + timedelta(minutes=minute)], 0.9)[0][0])
+        for minute, pm25 in ((0, 10.0), (10, 20.0), (20, 29.0), (30, 31.0), (45, 45.0), (80, 46.0))
+    ]
+    # At minute 45 the baseline is minute 20's 29.0; at 80 nothing older than 50 minutes is left.
+    assert fired == [False, False, False, True, False, False]
+
+
+def test_sustained_rule_fires_once_the_breach_lasts():
+    engine = _engine({"kind": "sustained", "field": "pm25", "value": 50, "minutes": 20})
+    fired = [
+        bool(engine.evaluate([_reading("Sustained-A", pm25)], [START + timedelta(minutes=minute)], 0.9)[0][0])
+        for minute, pm25 in ((0, 60.0), (10, 70.0), (20, 55.0), (25, 40.0), (30, 60.0), (50, 60.0))
+    ]
+    assert fired == [False, False, True, False, False, True]
+
+
+def test_state_grows_past_its_initial_capacity():
+    engine = _engine({"kind": "rate", "field": "pm25", "value": 5, "minutes": 600})
+    cities = [f"Grow-{index}" for index in range(3 * alert_rules._INITIAL_CITIES)]
+    steps = 3 * alert_rules._INITIAL_HISTORY
+    for step in range(steps):
+        observed = [START + timedelta(minutes=step)] * len(cities)
+        results = engine.evaluate([_reading(city, 10.0 + step) for city in cities], observed, 0.9)
+
+    # Every step of every city stayed in the 600-minute window, so the baseline is still step 0.
+    assert all(messages == [f"PM25 rose by {steps - 1:.1f} within 600 minutes in {city}."]
+               for (messages, _), city in zip(results, cities))
@@ -0,0 +1,79 @@
+from __future__ import annotations
+
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.db import get_collection
+from app.services import alert_rules, alerts, snapshot
+from app.services.alert_rules import RuleEngine, _validate
+
+START = datetime(2024, 5, 1, 9, 0)
+
+
+@pytest.fixture(autouse=True)
+def pm25_rule(monkeypatch):
+    """Only a PM2.5 threshold at 90, so the clear band is [81, 90) with the default ratio of 0.9"""
+    rule = _validate({"id": "pm25", "kind": "threshold", "field": "pm25", "value": 90}, 0)
+    monkeypatch.setattr(alert_rules, "_engine", RuleEngine([rule]))
+    assert alerts.settings.alert_clear_ratio == 0.9
+
+
+def _reading(city: str, minute: int, pm25: float) -> dict:
+    return {"city": city, "state": "Telangana", "pm25": pm25, "pm10": 20.0, "co2": 400.0, "no2": 5.0,
+            "timestamp": START + timedelta(minutes=minute)}
+
+
+def _status(city: str) -> list[tuple[str, datetime | None]]:
+    docs = get_collection("alerts").find({"city": city}).sort("timestamp", 1)
+    return [(doc["status"], doc["closed_at"]) for doc in docs]
+
+
+def test_alerts_open_on_breach_and_close_only_below_the_band():
+    city = "Hysteresis-A"
+    changes = [
+        bool(alerts.evaluate_readings([_reading(city, minute, pm25)]))
+        for minute, pm25 in ((0, 50.0), (1, 95.0), (2, 85.0), (3, 91.0), (4, 81.0), (5, 80.9), (6, 89.0))
+    ]
+
+    # Opens at 95, holds through 85, 91 and the band edge 81, closes at 80.9, and 89 does not reopen.
+    assert changes == [False, True, False, False, False, True, False]
+    assert _status(city) == [("closed", START + timedelta(minutes=5))]
+
+
+def test_readings_older_than_the_last_evaluated_one_are_ignored():
+    city = "Hysteresis-B"
+    alerts.evaluate_readings([_reading(city, 10, 95.0)])
+
+    assert alerts.evaluate_readings([_reading(city, 5, 10.0)]) == []
+    assert _status(city) == [("open", None)]
+    assert alerts.evaluate_readings([_reading(city, 11, 10.0)]) == [city]
+
+
+def test_a_batch_is_judged_by_each_citys_newest_reading():
+    batch = [_reading("Hysteresis-C", 2, 10.0), _reading("Hysteresis-C", 1, 99.0), _reading("Hysteresis-D", 1, 99.0)]
+
+    assert alerts.evaluate_readings(batch) == ["Hysteresis-D"]
+    assert _status("Hysteresis-C") == []
+
+
+def test_sweep_filters_the_buffer_behind_open_alerts_and_ages_legacy_alerts(mongo, monkeypatch):
+    monkeypatch.setattr(alerts, "_open_alerts", None)
+    monkeypatch.setattr(alerts, "_recent", None)
+    now = datetime.utcnow()
+    retention = timedelta(seconds=alerts.alert_retention_seconds())
+    mongo["alerts"].insert_many([
+        {"city": "Sweep-D", "status": "open", "timestamp": now - 4 * retention, "closed_at": None},
+        {"city": "Sweep-E", "status": "closed", "timestamp": now - 3 * retention, "closed_at": now - 2 * retention},
+        # Written before alerts recorded when they closed.
+        {"city": "Sweep-F", "status": "closed", "timestamp": now - 2 * retention},
+        {"city": "Sweep-G", "status": "closed", "timestamp": now - retention, "closed_at": now - retention / 2},
+    ])
+    assert [alert["city"] for alert in alerts.get_recent_alerts()] == ["Sweep-G", "Sweep-F", "Sweep-E", "Sweep-D"]
+    version = snapshot.current_version()
+
+    assert alerts.sweep_alerts() == 2
+
+    assert [alert["city"] for alert in alerts.get_recent_alerts()] == ["Sweep-G", "Sweep-D"]
+    assert sorted(doc["city"] for doc in mongo["alerts"].find()) == ["Sweep-D", "Sweep-G"]
+    assert sorted(snapshot.changed_since("alert", version)) == ["Sweep-E", "Sweep-F"]
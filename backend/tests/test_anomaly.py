@@ -0,0 +1,81 @@
+from __future__ import annotations
+
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+from bson import ObjectId
+
+from app.db import get_collection
+from app.services import alert_rules, anomaly
+from app.services.alert_rules import RuleEngine, _validate
+
+
+def _readings(city: str, pm25: list[float]) -> list[dict]:
+    start = datetime.utcnow().replace(microsecond=0) - timedelta(hours=2)
+    return [
+        {
+            "city": city,
+            "state": "Telangana",
+            "pm25": value,
+            "pm10": 40.0 + minute % 5,
+            "co2": 400.0 + minute % 7,
+            "no2": 10.0 + minute % 3,
+            "timestamp": (start + timedelta(minutes=minute)).isoformat(),
+        }
+        for minute, value in enumerate(pm25)
+    ]
+
+
+@pytest.fixture
+def restart(monkeypatch):
+    """Drop every city's in-memory state, as a process restart would"""
+    return lambda: monkeypatch.setattr(anomaly.detector, "_states", {})
+
+
+def test_spikes_are_flagged_straight_after_a_restart(client, restart):
+    history = _readings("Anomaly-A", [20.0 + minute % 4 for minute in range(40)])
+    assert client.post("/api/ingest", json=history).status_code == 201
+    restart()
+
+    spike = _readings("Anomaly-A", [20.0] * 41)[-1]
+    spike["pm25"] = 400.0
+
+    assert client.post("/api/ingest", json=spike).get_json()["anomalies"] == ["spike:pm25"]
+
+
+def test_flagged_readings_are_not_replayed_into_the_baseline(client, restart):
+    history = _readings("Anomaly-B", [20.0 + minute % 4 for minute in range(40)] + [5000.0])
+    assert client.post("/api/ingest", json=history).get_json()["flagged"]
+    restart()
+
+    state = anomaly._seed("Anomaly-B")
+
+    assert state.count[0] == 40
+    assert 19.0 < state.mean[0] < 24.0
+
+
+def test_a_real_spike_is_annotated_but_still_alerts(client, monkeypatch):
+    rule = _validate({"id": "pm25", "kind": "threshold", "field": "pm25", "value": 90}, 0)
+    monkeypatch.setattr(alert_rules, "_engine", RuleEngine([rule]))
+    history = _readings("Anomaly-D", [20.0 + minute % 4 for minute in range(40)] + [300.0])
+
+    body = client.post("/api/ingest", json=history).get_json()
+
+    assert body["flagged"] == []
+    assert get_collection("readings").find_one({"_id": ObjectId(body["inserted_ids"][-1])})["anomalies"] == ["spike:pm25"]
+    assert [alert["status"] for alert in get_collection("alerts").find({"city": "Anomaly-D"})] == ["open"]
+
+
+def test_rejected_readings_leave_the_baseline_alone(mongo, client):
+    history = _readings("Anomaly-E", [20.0 + minute % 4 for minute in range(40)])
+    assert client.post("/api/ingest", json=history).status_code == 201
+    before = anomaly.detector._states["Anomaly-E"].copy()
+    mongo["readings"].insert_one({"_id": "anomaly-e-1", "city": "Anomaly-E"})
+
+    duplicate = _readings("Anomaly-E", [20.0] * 41)[-1]
+    duplicate.update(_id="anomaly-e-1", pm25=600.0)
+    assert client.post("/api/ingest", json=duplicate).status_code == 409
+
+    after = anomaly.detector._states["Anomaly-E"]
+    assert np.array_equal(after.mean, before.mean) and np.array_equal(after.count, before.count)
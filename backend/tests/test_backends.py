@@ -0,0 +1,93 @@
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.linear_model import LinearRegression
+
+from app.services import backends
+from app.services.backends import BACKENDS, ModelBackend
+
+
+def _chunks(rows: int = 900, size: int = 128):
+    rng = np.random.default_rng(3)
+    features = pd.DataFrame(rng.normal(size=(rows, 4)), columns=["a", "b", "c", "d"])
+    target = features.to_numpy() @ np.array([2.0, -1.0, 0.5, 0.0]) + 7.0 + rng.normal(scale=0.1, size=rows)
+
+    def factory():
+        for start in range(0, rows, size):
+            yield features.iloc[start:start + size].reset_index(drop=True), target[start:start + size]
+
+    return factory, features, target
+
+
+def test_streamed_linear_fit_matches_in_memory_fit():
+    chunks, features, target = _chunks()
+
+    streamed = BACKENDS["lr"].fit_chunks(chunks)
+    exact = LinearRegression().fit(features, target)
+
+    assert streamed.coef_ == pytest.approx(exact.coef_)
+    assert streamed.intercept_ == pytest.approx(exact.intercept_)
+
+
+@pytest.mark.parametrize("name", ["rf", "hgb"])
+def test_tree_backends_train_from_chunks(name):
+    chunks, features, target = _chunks()
+
+    model = BACKENDS[name].fit_chunks(chunks, **({"n_estimators": 20} if name == "rf" else {}))
+
+    assert BACKENDS[name].predict(model, features).shape == target.shape
+
+
+def test_lstm_refuses_chunked_training_with_a_value_error():
+    chunks, _, _ = _chunks()
+
+    with pytest.raises(ValueError):
+        BACKENDS["lstm"].fit_chunks(chunks)
+
+
+def test_a_backend_must_define_build():
+    class Incomplete(ModelBackend):
+        name = label = "incomplete"
+
+    with pytest.raises(TypeError):
+        ModelBackend()
+    with pytest.raises(TypeError):
+        Incomplete()
+
+
+@pytest.mark.parametrize(
+    "name, params",
+    [("rf", {"n_estimators": 15, "max_depth": 4}), ("lr", {"copy_X": False}), ("hgb", {"max_iter": 30})],
+)
+def test_tabular_backends_build_fit_predict_and_reload(name, params, tmp_path):
+    backend = BACKENDS[name]
+    _, features, target = _chunks(rows=400)
+
+    built = backend.build(**params)
+    assert not hasattr(built, "n_features_in_")
+    assert {key: built.get_params()[key] for key in params} == params
+
+    model, metrics = backend.fit(features, target, **params)
+    predictions = backend.predict(model, features)
+    assert predictions.shape == target.shape and predictions.dtype == np.float64
+    assert set(metrics) == {"r2", "mae", "rmse"} and metrics["r2"] > 0.5
+
+    backend.save(model, list(features.columns), metrics, tmp_path)
+    loaded, columns, saved_metrics = backend.load(tmp_path)
+    assert columns == list(features.columns) and saved_metrics == metrics
+    np.testing.assert_array_equal(backend.predict(loaded, features), predictions)
+
+
+def test_lstm_builds_fits_and_predicts_one_value_per_full_window(monkeypatch):
+    pytest.importorskip("tensorflow")
+    monkeypatch.setattr(backends.settings, "lstm_epochs", 1)
+    backend = BACKENDS["lstm"]
+    _, features, target = _chunks(rows=120)
+    window = backends.settings.lstm_sequence_length
+
+    model, metrics = backend.fit(features, pd.Series(target))
+
+    assert backend.predict(model, features).shape == (len(features) - window + 1,)
+    assert set(metrics) == {"r2", "mae", "rmse"}
@@ -0,0 +1,151 @@
+from __future__ import annotations
+
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+from bson import ObjectId
+
+from app.db import get_collection
+from app.services import cold_storage
+from app.services.training_data import load_reading_columns
+from app.sqlite_db import _MAX_IN_PARAMS, SqliteCollection
+
+
+def _day_of_readings(city: str, day: datetime, minutes: int = 1440) -> list[dict]:
+    return [
+        {
+            "city": city,
+            "state": "Telangana",
+            "district": "Hyderabad",
+            "latitude": 17.385044,
+            "longitude": 78.486671,
+            "pm25": 30.0 + minute % 7,
+            "pm10": 60.0,
+            "co2": 410.0,
+            "no2": 18.5,
+            "temperature": 27.25,
+            "humidity": 61.0,
+            "timestamp": day + timedelta(minutes=minute),
+        }
+        for minute in range(minutes)
+    ]
+
+
+def test_sealing_a_day_deletes_hot_rows_in_bounded_batches(sqlite, monkeypatch):
+    day = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0) - timedelta(days=10)
+    get_collection("readings").insert_many(_day_of_readings("Cold-A", day))
+    batches = []
+    delete_many = SqliteCollection.delete_many
+
+    def recording(self, filter):
+        if "_id" in filter:
+            batches.append(len(filter["_id"]["$in"]))
+        return delete_many(self, filter)
+
+    monkeypatch.setattr(SqliteCollection, "delete_many", recording)
+
+    assert cold_storage.seal_cold_readings() == {"sealed": 1440, "blocks": 1}
+
+    assert sum(batches) == 1440 and max(batches) <= _MAX_IN_PARAMS
+    assert get_collection("readings").count_documents({"city": "Cold-A"}) == 0
+    assert len(list(cold_storage.iter_cold_readings({"city": "Cold-A"}))) == 1440
+
+
+def _sealed_block(city: str, day: datetime) -> dict:
+    block = cold_storage.encode_block(_day_of_readings(city, day, minutes=90))
+    return {**block, "city": city, "day": day}
+
+
+def test_blocks_sealed_with_a_single_scale_still_decode(monkeypatch):
+    # Before per-field scales every field, coordinates included, shared `10**cold_decimals`.
+    monkeypatch.setattr(cold_storage, "COORDINATE_DECIMALS", cold_storage.settings.cold_decimals)
+    block = _sealed_block("Cold-B", datetime(2024, 1, 10))
+    legacy = {key: value for key, value in block.items() if key != "scales"}
+    legacy["scale"] = 10**cold_storage.settings.cold_decimals
+
+    assert cold_storage.decode_block(legacy) == cold_storage.decode_block(block)
+
+
+def test_corrupt_block_fails_history_loudly(sqlite, client):
+    day = datetime(2024, 1, 11)
+    block = _sealed_block("Cold-C", day)
+    block["fields"]["pm25"] = b"not zlib"
+    get_collection(cold_storage.COLD_COLLECTION).insert_one(block)
+
+    with pytest.raises(cold_storage.ColdBlockError):
+        list(cold_storage.iter_cold_readings({"city": "Cold-C"}))
+    response = client.get("/api/history", query_string={"city": "Cold-C"})
+    assert response.status_code == 500
+    assert "Cold-C" in response.get_json()["error"]
+
+
+def test_corrupt_block_fails_training_loudly(sqlite):
+    block = _sealed_block("Cold-F", datetime(2024, 1, 13))
+    block["fields"]["pm25"] = b"not zlib"
+    get_collection(cold_storage.COLD_COLLECTION).insert_one(block)
+
+    with pytest.raises(cold_storage.ColdBlockError):
+        load_reading_columns(filter={"city": "Cold-F"})
+    # No history at all is still an empty result, not an error.
+    assert load_reading_columns(filter={"city": "Cold-G"}) is None
+
+
+def test_blocks_round_trip_values_coordinates_gaps_and_ids():
+    rng = np.random.default_rng(11)
+    day = datetime(2024, 1, 12)
+    offsets = np.sort(rng.choice(86_400_000_000, size=300, replace=False))
+    docs = [
+        {
+            "_id": ObjectId(),
+            "city": "Cold-D",
+            "state": "Telangana",
+            "district": "Hyderabad" if index < 150 else "Rangareddy",
+            # Station positions differ in the 5th and 6th decimal.
+            "latitude": round(17.385044 + rng.integers(0, 50) * 1e-6, 6),
+            "longitude": round(78.486671 - rng.integers(0, 50) * 1e-6, 6),
+            "pm25": round(float(rng.uniform(0, 400)), 2),
+            "pm10": None if index % 7 == 0 else round(float(rng.uniform(0, 600)), 2),
+            "co2": round(float(rng.uniform(380, 900)), 2),
+            "no2": round(float(rng.uniform(-1, 80)), 2),
+            "temperature": round(float(rng.normal(27, 4)), 2),
+            "humidity": round(float(rng.uniform(10, 95)), 2),
+            "timestamp": day + timedelta(microseconds=int(offset)),
+        }
+        for index, offset in enumerate(offsets)
+    ]
+    block = {**cold_storage.encode_block(list(reversed(docs))), "city": "Cold-D", "day": day}
+
+    decoded = cold_storage.decode_block(block)
+
+    assert [row["_id"] for row in decoded] == [doc["_id"] for doc in docs]
+    assert [row["timestamp"] for row in decoded] == [doc["timestamp"] for doc in docs]
+    for field in ("state", "district", "pm10"):
+        assert [row[field] for row in decoded] == [doc[field] for doc in docs]
+    for field in ("latitude", "longitude", "pm25", "co2", "no2", "temperature", "humidity"):
+        assert [row[field] for row in decoded] == pytest.approx([doc[field] for doc in docs], abs=1e-9)
+
+    window = cold_storage.decode_block(block, docs[100]["timestamp"], docs[200]["timestamp"])
+    assert [row["_id"] for row in window] == [doc["_id"] for doc in docs[100:200]]
+
+
+def test_resealing_after_a_failed_delete_does_not_duplicate_rows(sqlite, monkeypatch):
+    day = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0) - timedelta(days=10)
+    get_collection("readings").insert_many(_day_of_readings("Cold-E", day, minutes=120))
+
+    def crash(self, filter):
+        raise ConnectionError("store went away")
+
+    with monkeypatch.context() as patched:
+        patched.setattr(SqliteCollection, "delete_many", crash)
+        with pytest.raises(ConnectionError):
+            cold_storage.seal_cold_readings()
+    assert get_collection("readings").count_documents({"city": "Cold-E"}) == 120
+
+    cold_storage.seal_cold_readings()
+
+    block = get_collection(cold_storage.COLD_COLLECTION).find_one({"city": "Cold-E"})
+    assert block["count"] == 120
+    assert get_collection("readings").count_documents({"city": "Cold-E"}) == 0
+    rows = list(cold_storage.iter_cold_readings({"city": "Cold-E"}))
+    assert len({row["_id"] for row in rows}) == len(rows) == 120
@@ -0,0 +1,60 @@
+from __future__ import annotations
+
+import copy
+
+import pytest
+
+from app.columnar import ColumnarCollection
+from app.mock_db import MockCollection
+from tests.query_cases import START, documents, filters, ids
+
+DOCS = documents()
+
+
+def _stores() -> tuple[MockCollection, ColumnarCollection]:
+    reference = MockCollection("readings", [])
+    reference.insert_many(copy.deepcopy(DOCS))
+    # Tiny blocks so every column spans several of them; two batches so columns change kind midway.
+    columnar = ColumnarCollection("readings", block_size=7)
+    columnar.insert_many(copy.deepcopy(DOCS[:150]))
+    columnar.insert_many(copy.deepcopy(DOCS[150:]))
+    return reference, columnar
+
+
+@pytest.fixture(scope="module")
+def stores():
+    return _stores()
+
+
+@pytest.mark.parametrize("filter", filters(DOCS), ids=repr)
+def test_filters_match_the_reference_store(stores, filter):
+    reference, columnar = stores
+
+    assert ids(columnar.find(filter)) == ids(reference.find(filter))
+    assert columnar.count_documents(filter) == reference.count_documents(filter)
+    assert sorted(map(repr, columnar.distinct("city", filter))) == sorted(map(repr, reference.distinct("city", filter)))
+
+
+def test_documents_come_back_unchanged(stores):
+    reference, columnar = stores
+
+    assert sorted(columnar.find({}), key=lambda doc: doc["_id"]) == sorted(reference.find({}), key=lambda doc: doc["_id"])
+
+
+def test_newest_first_with_a_limit_matches_the_reference(stores):
+    reference, columnar = stores
+    filter = {"city": "Hyderabad", "timestamp": {"$gte": START}, "flagged": {"$ne": True}}
+
+    expected = [doc["_id"] for doc in reference.find(filter).sort("timestamp", -1).limit(10)]
+
+    assert [doc["_id"] for doc in columnar.find(filter).sort("timestamp", -1).limit(10)] == expected
+
+
+def test_deletes_and_updates_keep_filters_in_step():
+    reference, columnar = _stores()
+    for store in (reference, columnar):
+        store.delete_many({"pm25": {"$gt": 200}})
+        store.update_one({"city": "Guntur"}, {"$set": {"city": "Warangal", "pm25": 1}})
+
+    for filter in filters(DOCS):
+        assert ids(columnar.find(filter)) == ids(reference.find(filter)), filter
@@ -0,0 +1,95 @@
+from __future__ import annotations
+
+import numpy as np
+import pytest
+
+from app.services.districts import DistrictIndex
+
+SIDE = 0.1
+ORIGIN = (78.0, 17.0)
+
+
+def _square(x: float, y: float, side: float) -> list[list[float]]:
+    return [[x, y], [x + side, y], [x + side, y + side], [x, y + side], [x, y]]
+
+
+def _feature(name: str, geometry_type: str, coordinates: list) -> dict:
+    return {"type": "Feature", "properties": {"district": name}, "geometry": {"type": geometry_type, "coordinates": coordinates}}
+
+
+def _districts() -> dict:
+    """A 4x4 grid of squares sharing edges, a district with a hole and an island in it,
+    a two-part MultiPolygon and a concave outline"""
+    x0, y0 = ORIGIN
+    features = [
+        _feature(f"Grid-{i}-{j}", "Polygon", [_square(x0 + i * SIDE, y0 + j * SIDE, SIDE)])
+        for i in range(4)
+        for j in range(4)
+    ]
+    ring_x = x0 + 5 * SIDE
+    features.append(_feature("Ring", "Polygon", [_square(ring_x, y0, 3 * SIDE), _square(ring_x + SIDE, y0 + SIDE, SIDE)]))
+    features.append(_feature("Island", "Polygon", [_square(ring_x + SIDE, y0 + SIDE, SIDE)]))
+    features.append(_feature("Pair", "MultiPolygon", [
+        [[[x0, y0 + 5 * SIDE], [x0 + SIDE, y0 + 5 * SIDE], [x0, y0 + 6 * SIDE], [x0, y0 + 5 * SIDE]]],
+        [[[x0 + 3 * SIDE, y0 + 5 * SIDE], [x0 + 4 * SIDE, y0 + 6 * SIDE], [x0 + 3 * SIDE, y0 + 6 * SIDE]]],
+    ]))
+    # An open ring (no repeated first point), shaped like a U.
+    features.append(_feature("Concave", "Polygon", [[
+        [ring_x, y0 + 4 * SIDE], [ring_x + 3 * SIDE, y0 + 4 * SIDE], [ring_x + 3 * SIDE, y0 + 7 * SIDE],
+        [ring_x + 2 * SIDE, y0 + 7 * SIDE], [ring_x + 2 * SIDE, y0 + 5 * SIDE], [ring_x + SIDE, y0 + 5 * SIDE],
+        [ring_x + SIDE, y0 + 7 * SIDE], [ring_x, y0 + 7 * SIDE],
+    ]]))
+    return {"type": "FeatureCollection", "features": features}
+
+
+def _brute_force(index: DistrictIndex, x: float, y: float) -> int | None:
+    """Every part in order, with a plain even-odd ray cast and no bounding boxes"""
+    for owner, rings, _ in index.parts:
+        inside = False
+        for ring in rings:
+            for (ax, ay), (bx, by) in zip(ring[:-1].tolist(), ring[1:].tolist()):
+                if (ay > y) != (by > y) and x < ax + (y - ay) * (bx - ax) / (by - ay):
+                    inside = not inside
+        if inside:
+            return owner
+    return None
+
+
+def _points(index: DistrictIndex) -> list[tuple[float, float]]:
+    """Random points over and around the districts, plus every vertex, edge midpoint and grid line crossing"""
+    rng = np.random.default_rng(3)
+    low, high = np.array(ORIGIN) - SIDE, np.array(ORIGIN) + 9 * SIDE
+    points = [tuple(point) for point in rng.uniform(low, high, size=(3000, 2)).tolist()]
+    for _, rings, _ in index.parts:
+        for ring in rings:
+            points.extend(tuple(point) for point in ring.tolist())
+            points.extend(tuple(point) for point in ((ring[:-1] + ring[1:]) / 2).tolist())
+    lines = index.origin + np.outer(np.arange(index.grid_size + 1), index.cell)
+    points.extend((x, y) for x in lines[:, 0].tolist() for y in lines[:, 1].tolist())
+    return points
+
+
+@pytest.mark.parametrize("grid_size", [1, 4, 7, 32])
+def test_grid_lookup_matches_brute_force(grid_size):
+    index = DistrictIndex(_districts(), grid_size)
+
+    mismatches = [point for point in _points(index) if index.locate(*point) != _brute_force(index, *point)]
+
+    assert mismatches == []
+
+
+def test_holes_islands_and_multipolygons_resolve_to_the_right_district():
+    index = DistrictIndex(_districts(), 8)
+    x0, y0 = ORIGIN
+
+    def name(x: float, y: float) -> str | None:
+        owner = index.locate(x, y)
+        return None if owner is None else index.names[owner]
+
+    assert name(x0 + 1.5 * SIDE, y0 + 2.5 * SIDE) == "Grid-1-2"
+    assert name(x0 + 5.5 * SIDE, y0 + 0.5 * SIDE) == "Ring"
+    assert name(x0 + 6.5 * SIDE, y0 + 1.5 * SIDE) == "Island"
+    assert name(x0 + 3.2 * SIDE, y0 + 5.5 * SIDE) == "Pair"
+    assert name(x0 + 6.5 * SIDE, y0 + 6 * SIDE) is None
+    assert name(x0 + 5.5 * SIDE, y0 + 6 * SIDE) == "Concave"
+    assert name(x0 - SIDE, y0) is None
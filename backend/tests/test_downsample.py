@@ -0,0 +1,55 @@
+from __future__ import annotations
+
+import math
+
+import numpy as np
+import pytest
+
+from app.services.downsample import lttb_indices
+
+
+def _reference_lttb(x: list[float], y: list[float], threshold: int) -> list[int]:
+    """Steinarsson's original loop, bucket for bucket"""
+    every = (len(x) - 2) / (threshold - 2)
+    selected, previous = [0], 0
+    for bucket in range(threshold - 2):
+        next_start = math.floor((bucket + 1) * every) + 1
+        next_end = min(math.floor((bucket + 2) * every) + 1, len(x))
+        if next_start >= len(x) - 1 or bucket == threshold - 3:
+            cx, cy = x[-1], y[-1]
+        else:
+            cx = sum(x[next_start:next_end]) / (next_end - next_start)
+            cy = sum(y[next_start:next_end]) / (next_end - next_start)
+        start, end = math.floor(bucket * every) + 1, math.floor((bucket + 1) * every) + 1
+        areas = [
+            abs((x[previous] - cx) * (y[index] - y[previous]) - (x[previous] - x[index]) * (cy - y[previous]))
+            for index in range(start, end)
+        ]
+        previous = start + areas.index(max(areas))
+        selected.append(previous)
+    return selected + [len(x) - 1]
+
+
+@pytest.mark.parametrize("count, threshold", [(1000, 100), (1000, 3), (997, 250), (50, 49), (10_000, 1_000)])
+def test_matches_the_reference_algorithm(count, threshold):
+    rng = np.random.default_rng(count + threshold)
+    x = np.cumsum(rng.uniform(0.5, 90.0, count))
+    y = np.cumsum(rng.normal(size=count)) + 5 * np.sin(np.arange(count) / 40)
+
+    selected = lttb_indices(x, y, threshold)
+
+    assert selected.tolist() == _reference_lttb(x.tolist(), y.tolist(), threshold)
+    assert len(selected) == threshold and np.all(np.diff(selected) > 0)
+
+
+def test_short_series_and_tiny_thresholds_are_returned_whole():
+    x = np.arange(10.0)
+    assert lttb_indices(x, x, 10).tolist() == list(range(10))
+    assert lttb_indices(x, x, 2).tolist() == list(range(10))
+
+
+def test_an_isolated_spike_survives():
+    y = np.zeros(5000)
+    y[3217] = 500.0
+
+    assert 3217 in lttb_indices(np.arange(5000.0), y, 50)
@@ -0,0 +1,94 @@
+from __future__ import annotations
+
+import json
+import threading
+
+import pytest
+
+from app.services import events, snapshot
+from app.services.events import Broadcaster
+
+
+def _message(chunk: bytes) -> tuple[int, str, dict]:
+    lines = dict(line.split(": ", 1) for line in chunk.decode("utf-8").strip().split("\n"))
+    return int(lines["id"]), lines["event"], json.loads(lines["data"])
+
+
+def _published(log_size: int = 8, versions: int = 4) -> Broadcaster:
+    """Versions 1..n, each after the first with a delta naming its own city"""
+    broadcaster = Broadcaster(log_size)
+    for version in range(1, versions + 1):
+        delta = {"version": version, "since": version - 1, "readings": [{"city": f"City-{version}"}]}
+        broadcaster.publish(version, "snapshot", {"version": version, "readings": []}, delta if version > 1 else None)
+    return broadcaster
+
+
+@pytest.fixture
+def no_wait(monkeypatch):
+    """Heartbeats without waiting, so a caught-up stream yields a keep-alive instead of blocking"""
+    monkeypatch.setattr(events.settings, "sse_heartbeat_seconds", 0)
+
+
+def _resume(broadcaster: Broadcaster, last_event_id: int | None) -> list[tuple[int, str, dict]]:
+    """Every message a subscriber reconnecting with `last_event_id` gets before it is caught up"""
+    stream = broadcaster.stream(last_event_id)
+    assert next(stream).startswith(b"retry: ")
+    return [_message(chunk) for chunk in iter(lambda: next(stream), b": keep-alive\n\n")]
+
+
+def test_every_waiting_subscriber_gets_the_same_encoded_message():
+    broadcaster = Broadcaster()
+    streams = [broadcaster.stream() for _ in range(3)]
+    for stream in streams:
+        next(stream)
+    received: list[bytes] = []
+    threads = [threading.Thread(target=lambda stream=stream: received.append(next(stream))) for stream in streams]
+    for thread in threads:
+        thread.start()
+
+    broadcaster.publish(1, "snapshot", {"version": 1, "readings": [{"city": "Fan-A"}]})
+    for thread in threads:
+        thread.join(timeout=5)
+
+    assert len(received) == 3 and all(message is received[0] for message in received)
+    assert _message(received[0]) == (1, "snapshot", {"version": 1, "readings": [{"city": "Fan-A"}]})
+
+
+def test_resume_replays_only_the_missed_deltas(no_wait):
+    broadcaster = _published()
+
+    replayed = _resume(broadcaster, 2)
+
+    assert [(version, event) for version, event, _ in replayed] == [(3, "delta"), (4, "delta")]
+    assert [payload["readings"] for _, _, payload in replayed] == [[{"city": "City-3"}], [{"city": "City-4"}]]
+
+
+@pytest.mark.parametrize("last_event_id", [None, 1, 99])
+def test_ids_outside_the_log_get_the_full_snapshot(no_wait, last_event_id):
+    # A log of two deltas reaches back to version 2; 99 is from before a restart.
+    broadcaster = _published(log_size=2)
+
+    assert _resume(broadcaster, last_event_id) == [(4, "snapshot", {"version": 4, "readings": []})]
+    assert [version for version, _, _ in _resume(broadcaster, 2)] == [3, 4]
+
+
+def test_a_version_published_without_a_delta_breaks_the_log(no_wait):
+    broadcaster = _published()
+    broadcaster.publish(5, "snapshot", {"version": 5, "readings": []})
+    broadcaster.publish(6, "snapshot", {"version": 6, "readings": []}, {"version": 6, "since": 5, "readings": []})
+
+    assert [event for _, event, _ in _resume(broadcaster, 3)] == ["snapshot"]
+    assert [event for _, event, _ in _resume(broadcaster, 5)] == ["delta"]
+
+
+def test_published_deltas_carry_only_the_cities_that_changed(client, monkeypatch, no_wait):
+    monkeypatch.setattr(events, "broadcaster", Broadcaster())
+    reading = {"state": "Telangana", "pm25": 20.0, "pm10": 30.0, "co2": 400.0, "no2": 5.0}
+    assert client.post("/api/ingest", json={**reading, "city": "Events-A"}).status_code == 201
+    seen = events.broadcaster.version
+    assert client.post("/api/ingest", json={**reading, "city": "Events-B"}).status_code == 201
+
+    (version, event, payload), = _resume(events.broadcaster, seen)
+
+    assert (version, event) == (snapshot.current_version(), "delta")
+    assert [row["city"] for row in payload["readings"]] == ["Events-B"]
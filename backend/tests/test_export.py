@@ -0,0 +1,102 @@
+from __future__ import annotations
+
+import io
+import json
+import sys
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from app import export
+from app.db import get_collection
+from app.services import export as export_service
+from app.services.export import EXPORT_COLUMNS, export_stream, parquet_available
+
+START = datetime(2024, 3, 1)
+FORMATS = ["ndjson", "csv", pytest.param("parquet", marks=pytest.mark.skipif(not parquet_available(), reason="needs pyarrow"))]
+
+
+def _reading(city: str, minute: int, pm25: float | None) -> dict:
+    return {
+        "city": city,
+        "state": "Telangana",
+        "district": "Hyderabad",
+        "timestamp": START + timedelta(minutes=minute, microseconds=250_000),
+        "pm25": pm25,
+        "pm10": 40.0 + minute,
+        "co2": 410.0,
+        "no2": 7.5,
+    }
+
+
+@pytest.fixture(scope="module")
+def stored():
+    # Out of order, with a gap in pm25, and another city that must not leak in.
+    rows = [_reading("Export-A", minute, None if minute == 30 else 10.0 + minute) for minute in (50, 0, 30, 10, 40, 20, 60)]
+    get_collection("readings").insert_many([*rows, _reading("Export-B", 5, 99.0)])
+    return sorted(rows, key=lambda row: row["timestamp"])
+
+
+def _read(fmt: str, data: bytes) -> pd.DataFrame:
+    if fmt == "ndjson":
+        frame = pd.DataFrame([json.loads(line) for line in data.decode("utf-8").splitlines()])
+    elif fmt == "csv":
+        frame = pd.read_csv(io.BytesIO(data), keep_default_na=False, na_values=[""])
+    else:
+        frame = pd.read_parquet(io.BytesIO(data))
+    frame["timestamp"] = pd.to_datetime(frame["timestamp"])
+    return frame
+
+
+@pytest.fixture(autouse=True)
+def small_chunks(monkeypatch):
+    """Several chunks per export, so headers and row groups are exercised across chunk boundaries"""
+    monkeypatch.setattr(export_service.settings, "export_chunk_size", 3)
+
+
+@pytest.mark.parametrize("fmt", FORMATS)
+def test_exports_round_trip_every_column(stored, fmt):
+    frame = _read(fmt, b"".join(export_stream(fmt, city="Export-A")))
+
+    assert list(frame.columns) == list(EXPORT_COLUMNS)
+    assert frame["timestamp"].tolist() == [pd.Timestamp(row["timestamp"]) for row in stored]
+    assert frame["city"].tolist() == ["Export-A"] * len(stored)
+    assert frame["district"].tolist() == ["Hyderabad"] * len(stored)
+    for field in ("pm25", "pm10", "co2", "no2"):
+        expected = np.array([np.nan if row[field] is None else row[field] for row in stored], dtype=np.float64)
+        np.testing.assert_array_equal(frame[field].to_numpy(dtype=np.float64), expected)
+    assert frame["aqi"].notna().all() and frame["category"].notna().all()
+
+
+@pytest.mark.parametrize("fmt", FORMATS)
+def test_exports_keep_only_the_requested_columns_and_range(stored, fmt):
+    data = b"".join(
+        export_stream(fmt, city="Export-A", start=START + timedelta(minutes=10), end=START + timedelta(minutes=40),
+                      columns=["timestamp", "pm25"])
+    )
+
+    frame = _read(fmt, data)
+
+    assert list(frame.columns) == ["timestamp", "pm25"]
+    assert frame["timestamp"].dt.minute.tolist() == [10, 20, 30]
+    assert frame["pm25"].isna().tolist() == [False, False, True]
+
+
+def test_an_empty_csv_export_still_has_a_header():
+    assert b"".join(export_stream("csv", city="Export-None", columns=["city", "pm25"])) == b"city,pm25\n"
+
+
+def test_cli_reads_start_and_end_like_the_api(stored, tmp_path, monkeypatch):
+    output = tmp_path / "readings.ndjson"
+    # 05:40 in India is 00:10 UTC; the stored timestamps are naive UTC.
+    monkeypatch.setattr(sys, "argv", [
+        "export", "--city", "Export-A", "--columns", "timestamp,pm25",
+        "--start", "2024-03-01T05:40:00+05:30", "--end", "2024-03-01T00:40:00Z", "--output", str(output),
+    ])
+
+    export.main()
+
+    frame = _read("ndjson", output.read_bytes())
+    assert frame["timestamp"].dt.minute.tolist() == [10, 20, 30]
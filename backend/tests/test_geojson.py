@@ -0,0 +1,71 @@
+from __future__ import annotations
+
+import math
+
+import numpy as np
+import pytest
+
+from app.services.geojson import douglas_peucker, simplify_geometry
+
+
+def _reference(points: list[tuple[float, float]], tolerance: float) -> list[int]:
+    """Textbook recursive Douglas–Peucker, returning kept indices"""
+    def distance(point, start, end):
+        dx, dy = end[0] - start[0], end[1] - start[1]
+        length = math.hypot(dx, dy)
+        if length == 0:
+            return math.hypot(point[0] - start[0], point[1] - start[1])
+        return abs(dx * (point[1] - start[1]) - dy * (point[0] - start[0])) / length
+
+    def recurse(start: int, end: int) -> list[int]:
+        if end - start < 2:
+            return [start]
+        distances = [distance(points[index], points[start], points[end]) for index in range(start + 1, end)]
+        farthest = max(range(len(distances)), key=distances.__getitem__)
+        if distances[farthest] <= tolerance:
+            return [start]
+        split = start + 1 + farthest
+        return recurse(start, split) + recurse(split, end)
+
+    return recurse(0, len(points) - 1) + [len(points) - 1]
+
+
+@pytest.mark.parametrize("tolerance", [0.001, 0.01, 0.05])
+def test_matches_the_recursive_algorithm(tolerance):
+    rng = np.random.default_rng(5)
+    points = np.cumsum(rng.normal(scale=0.01, size=(2000, 2)), axis=0)
+
+    kept = np.flatnonzero(douglas_peucker(points, tolerance))
+
+    assert kept.tolist() == _reference([tuple(point) for point in points.tolist()], tolerance)
+
+
+def test_dropped_vertices_stay_within_tolerance_of_the_simplified_line():
+    angle = np.linspace(0, 6 * np.pi, 800)
+    points = np.column_stack([angle, np.sin(angle) * 0.3])
+    tolerance = 0.01
+
+    kept = np.flatnonzero(douglas_peucker(points, tolerance))
+
+    for start, end in zip(kept[:-1], kept[1:]):
+        segment = points[end] - points[start]
+        offsets = points[start + 1:end] - points[start]
+        distances = np.abs(segment[0] * offsets[:, 1] - segment[1] * offsets[:, 0]) / np.hypot(*segment)
+        assert np.all(distances <= tolerance)
+    assert len(kept) < len(points) / 5
+
+
+def test_straight_lines_collapse_and_closed_rings_keep_their_far_side():
+    line = np.column_stack([np.linspace(0, 1, 50), np.linspace(0, 2, 50)])
+    assert np.flatnonzero(douglas_peucker(line, 1e-9)).tolist() == [0, 49]
+
+    square = np.array([[0, 0], [1, 0], [1, 1], [0, 1], [0, 0]], dtype=float)
+    assert douglas_peucker(square, 0.1).all()
+
+
+def test_a_polygon_smaller_than_the_tolerance_does_not_disappear():
+    tiny = {"type": "Polygon", "coordinates": [[[78.0, 17.0], [78.001, 17.0], [78.001, 17.001], [78.0, 17.001], [78.0, 17.0]]]}
+
+    simplified = simplify_geometry(tiny, 0.05)
+
+    assert simplified is not None and len(simplified["coordinates"][0]) >= 4
@@ -0,0 +1,32 @@
+from __future__ import annotations
+
+import numpy as np
+
+from app.services import heatmap
+
+
+def _row(city: str, latitude: float, longitude: float, aqi: int) -> dict:
+    return {"city": city, "latitude": latitude, "longitude": longitude, "aqi": aqi}
+
+
+def test_heatmap_without_located_readings_is_not_found(client, monkeypatch):
+    monkeypatch.setattr(heatmap, "get_latest_cache", lambda: [_row("Nowhere", 0.0, 0.0, 80)])
+
+    for fmt in ("png", "bin"):
+        response = client.get("/api/heatmap", query_string={"format": fmt})
+        assert response.status_code == 404
+        assert response.get_json() == {"error": "No readings to interpolate"}
+
+
+def test_grid_interpolates_between_stations(monkeypatch):
+    monkeypatch.setattr(
+        heatmap, "get_latest_cache", lambda: [_row("West", 16.0, 78.0, 50), _row("East", 16.0, 83.0, 250)]
+    )
+
+    grid = heatmap.aqi_grid(64)
+
+    assert grid.shape == heatmap.grid_shape(64)
+    assert grid.min() >= 50 and grid.max() <= 250
+    middle = grid[grid.shape[0] // 2]
+    # Cells get closer to the eastern station's value moving east.
+    assert np.all(np.diff(middle[10:50]) >= 0)
@@ -0,0 +1,57 @@
+from __future__ import annotations
+
+import numpy as np
+import pytest
+from sklearn.ensemble import ExtraTreesRegressor, RandomForestRegressor
+
+from app.services.intervals import DEFAULT_QUANTILES, parse_quantiles, per_tree_predictions, predict_with_intervals
+
+
+def test_quantiles_parse_or_default():
+    assert parse_quantiles(None) == DEFAULT_QUANTILES
+    assert parse_quantiles("0.05,0.95") == (0.05, 0.95)
+    assert parse_quantiles("0,1") == (0.0, 1.0)
+
+
+@pytest.mark.parametrize("raw", ["0.9,0.1", "0.5,0.5", "-0.1,0.9", "0.1,1.5", "0.1", "0.1,0.5,0.9", "low,high", "nan,0.9"])
+def test_malformed_quantiles_are_rejected(raw, client):
+    with pytest.raises(ValueError):
+        parse_quantiles(raw)
+
+    response = client.get("/api/predict", query_string={"intervals": "true", "quantiles": raw})
+    assert response.status_code == 400
+    assert "quantiles" in response.get_json()["error"]
+
+
+def _loop(model, features) -> np.ndarray:
+    """One `predict` per tree, the straightforward way to get the per-tree spread"""
+    return np.column_stack([tree.predict(features) for tree in model.estimators_])
+
+
+@pytest.mark.parametrize("forest", [RandomForestRegressor, ExtraTreesRegressor])
+@pytest.mark.parametrize("options", [{}, {"max_depth": 3}, {"min_samples_leaf": 5, "bootstrap": True}])
+def test_leaf_table_matches_predicting_tree_by_tree(forest, options):
+    rng = np.random.default_rng(11)
+    features = rng.normal(size=(300, 6))
+    target = features[:, 0] * 3 + np.sin(features[:, 1]) + rng.normal(scale=0.3, size=300)
+    model = forest(n_estimators=25, random_state=0, **options).fit(features, target)
+    unseen = rng.normal(size=(80, 6))
+
+    expected = _loop(model, unseen)
+    point, lower, upper = predict_with_intervals(model, unseen, (0.1, 0.9))
+
+    np.testing.assert_array_equal(per_tree_predictions(model, unseen), expected)
+    np.testing.assert_allclose(point, model.predict(unseen))
+    np.testing.assert_array_equal(lower, np.quantile(expected, 0.1, axis=1))
+    np.testing.assert_array_equal(upper, np.quantile(expected, 0.9, axis=1))
+
+
+def test_a_refit_forest_does_not_reuse_its_old_leaf_table():
+    rng = np.random.default_rng(12)
+    features = rng.normal(size=(200, 3))
+    model = RandomForestRegressor(n_estimators=10, random_state=0).fit(features, features[:, 0])
+    per_tree_predictions(model, features)
+
+    model.fit(features, features[:, 1] * 10)
+
+    np.testing.assert_array_equal(per_tree_predictions(model, features), _loop(model, features))
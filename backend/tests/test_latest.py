@@ -0,0 +1,85 @@
+from __future__ import annotations
+
+import pytest
+
+from app.mock_db import MockCollection
+from app.services import readings
+from app.services.stations import station_index
+
+
+def _ingest(client, city: str, pm25: float = 20.0) -> None:
+    reading = {"city": city, "state": "Telangana", "pm25": pm25, "pm10": 30.0, "co2": 400.0, "no2": 5.0}
+    assert client.post("/api/ingest", json=reading).status_code == 201
+
+
+@pytest.fixture
+def seeded(client):
+    _ingest(client, "Latest-A")
+    _ingest(client, "Latest-B")
+
+
+def test_matching_etag_gets_a_304_without_a_body(client, seeded):
+    first = client.get("/api/latest")
+    etag = first.headers["ETag"]
+
+    again = client.get("/api/latest", headers={"If-None-Match": etag})
+
+    assert first.status_code == 200
+    assert again.status_code == 304 and again.data == b""
+    assert again.headers["ETag"] == etag
+
+
+def test_an_ingest_changes_the_etag(client, seeded):
+    etag = client.get("/api/latest").headers["ETag"]
+    _ingest(client, "Latest-A", 25.0)
+
+    response = client.get("/api/latest", headers={"If-None-Match": etag})
+
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+    assert {row["city"]: row["pm25"] for row in response.get_json()["readings"]}["Latest-A"] == 25.0
+
+
+def test_since_returns_only_the_cities_that_changed(client, seeded):
+    version = client.get("/api/latest").get_json()["version"]
+    _ingest(client, "Latest-B", 31.0)
+
+    body = client.get("/api/latest", query_string={"since": version}).get_json()
+
+    assert body["since"] == version and body["version"] > version
+    assert [(row["city"], row["pm25"]) for row in body["readings"]] == [("Latest-B", 31.0)]
+    assert client.get("/api/latest", query_string={"since": body["version"]}).get_json()["readings"] == []
+
+
+def test_a_since_from_before_a_restart_gets_everything(client, seeded):
+    body = client.get("/api/latest", query_string={"since": 10**9}).get_json()
+
+    assert "since" not in body
+    assert {"Latest-A", "Latest-B"} <= {row["city"] for row in body["readings"]}
+
+
+def test_an_ingest_merges_into_latest_without_the_aggregate_or_a_second_station_pass(client, seeded, monkeypatch):
+    readings.get_latest_cache(force=True)
+    aggregates, observed = [], []
+    monkeypatch.setattr(MockCollection, "aggregate", lambda self, pipeline: aggregates.append(pipeline) or [])
+    observe = station_index.observe
+    monkeypatch.setattr(station_index, "observe", lambda rows: observed.append(list(rows)) or observe(rows))
+
+    reading = {"city": "Latest-C", "state": "Telangana", "pm25": 48.0, "latitude": 17.4, "longitude": 78.5}
+    assert client.post("/api/ingest", json=reading).status_code == 201
+
+    assert aggregates == []
+    assert [[row["city"] for row in rows] for rows in observed] == [["Latest-C"]]
+    latest = {row["city"]: row for row in client.get("/api/latest").get_json()["readings"]}
+    assert latest["Latest-C"]["pm25"] == 48.0 and "Latest-A" in latest
+
+
+def test_a_late_reading_does_not_replace_a_newer_one_in_latest(client, seeded):
+    readings.get_latest_cache(force=True)
+    reading = {"city": "Latest-D", "state": "Telangana", "pm25": 30.0, "timestamp": "2030-01-01T00:10:00"}
+    client.post("/api/ingest", json=reading)
+    client.post("/api/ingest", json={**reading, "pm25": 99.0, "timestamp": "2030-01-01T00:05:00"})
+
+    latest = {row["city"]: row for row in readings.get_latest_cache()}
+
+    assert latest["Latest-D"]["pm25"] == 30.0
@@ -0,0 +1,38 @@
+from __future__ import annotations
+
+import multiprocessing
+import time
+
+import numpy as np
+
+from app.services import model_selection
+
+
+def test_rolling_origin_folds_expand_over_time_ordered_rows():
+    folds = model_selection.rolling_origin_folds(100, 4)
+
+    assert folds == [(20, 20, 40), (40, 40, 60), (60, 60, 80), (80, 80, 100)]
+    assert model_selection.rolling_origin_folds(3, 4) == []
+
+
+def test_run_cv_stops_running_fits_at_the_deadline(monkeypatch):
+    monkeypatch.setattr(model_selection.settings, "model_selection_workers", 2)
+    rng = np.random.default_rng(0)
+    features = rng.normal(size=(40_000, 12))
+    target = features @ rng.normal(size=12) + rng.normal(size=40_000)
+    folds = model_selection.rolling_origin_folds(len(target), 4)
+    # Far more work than the budget allows.
+    candidates = {"rf": [{"n_estimators": 400, "max_depth": None}] * 4}
+
+    started = time.monotonic()
+    results, unfinished = model_selection._run_cv(features, target, folds, candidates, started + 1.0)
+
+    assert unfinished > 0
+    assert time.monotonic() - started < 6.0
+    assert multiprocessing.active_children() == []
+
+
+def test_refit_estimate_scales_the_slowest_fold():
+    folds = [{"fit_seconds": 1.0, "train_rows": 100}, {"fit_seconds": 3.0, "train_rows": 200}]
+
+    assert model_selection._refit_seconds(folds, 400) == 6.0
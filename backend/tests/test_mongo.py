@@ -0,0 +1,145 @@
+from __future__ import annotations
+
+import os
+from datetime import datetime, timedelta
+
+import pytest
+
+from app import db
+from app.config import get_settings
+from app.services import alerts, readings
+
+
+def _reading(city: str, minutes_ago: int, **fields):
+    return {
+        "city": city,
+        "state": "Telangana",
+        "latitude": 17.385,
+        "longitude": 78.4867,
+        "pm25": 40.0,
+        "pm10": 70.0,
+        "co2": 400.0,
+        "no2": 20.0,
+        "temperature": 28.0,
+        "humidity": 60.0,
+        "timestamp": datetime.utcnow() - timedelta(minutes=minutes_ago),
+        **fields,
+    }
+
+
+def _ttl(database) -> int:
+    info = database["alerts"].index_information()
+    return next(index["expireAfterSeconds"] for index in info.values() if index["key"] == [("closed_at", 1)])
+
+
+def test_ensure_indexes_creates_read_path_indexes(mongo):
+    db.ensure_indexes()
+
+    keys = [index["key"] for index in mongo["readings"].index_information().values()]
+    assert [("city", 1), ("timestamp", -1)] in keys
+    assert [("timestamp", -1)] in keys
+    unique = [index for index in mongo["rollups"].index_information().values() if index.get("unique")]
+    assert unique[0]["key"] == [("city", 1), ("resolution", 1), ("start", 1)]
+    assert _ttl(mongo) == db.alert_retention_seconds()
+
+
+def test_ensure_indexes_updates_a_changed_ttl_in_place(mongo, monkeypatch):
+    db.ensure_indexes()
+    monkeypatch.setattr(get_settings(), "alert_retention_hours", 48)
+    commands = []
+    # mongomock has no collMod, so the command is recorded rather than run.
+    monkeypatch.setattr(type(mongo), "command", lambda self, *args, **kwargs: commands.append((args, kwargs)))
+
+    db.ensure_indexes()
+
+    assert commands == [
+        (("collMod", "alerts"), {"index": {"keyPattern": {"closed_at": 1}, "expireAfterSeconds": 48 * 3600}})
+    ]
+
+
+@pytest.mark.skipif(not os.environ.get("MONGO_TEST_URI"), reason="set MONGO_TEST_URI to run against a local mongod")
+def test_ensure_indexes_collmod_against_mongod(monkeypatch):
+    from pymongo import MongoClient
+
+    mongo_client = MongoClient(os.environ["MONGO_TEST_URI"], serverSelectionTimeoutMS=2000)
+    database = mongo_client[get_settings().mongo_db]
+    monkeypatch.setattr(db, "get_client", lambda: mongo_client)
+    monkeypatch.setattr(get_settings(), "storage_backend", "mongo")
+    database["alerts"].drop()
+    try:
+        db.ensure_indexes()
+        monkeypatch.setattr(get_settings(), "alert_retention_hours", get_settings().alert_retention_hours + 1)
+        db.ensure_indexes()
+        assert _ttl(database) == db.alert_retention_seconds()
+    finally:
+        database["alerts"].drop()
+
+
+def test_latest_aggregate_returns_projected_newest_per_city(mongo, client, monkeypatch):
+    mongo["readings"].insert_many([
+        _reading("Mongo-A", 30, pm25=10.0, raw_payload="x" * 1000),
+        _reading("Mongo-A", 5, pm25=55.0, raw_payload="x" * 1000),
+        _reading("Mongo-B", 10, pm25=20.0, raw_payload="x" * 1000),
+        _reading("Mongo-B", 1, pm25=99.0, flagged=True, anomalies=["spike"]),
+    ])
+    stages = []
+    aggregate = type(mongo["readings"]).aggregate
+
+    def recording(self, pipeline, *args, **kwargs):
+        rows = list(aggregate(self, pipeline, *args, **kwargs))
+        stages.append(rows)
+        return iter(rows)
+
+    monkeypatch.setattr(type(mongo["readings"]), "aggregate", recording)
+
+    readings.get_latest_cache(force=True)
+    response = client.get("/api/latest")
+
+    assert response.status_code == 200
+    latest = {row["city"]: row for row in readings.get_latest_cache()}
+    assert latest["Mongo-A"]["pm25"] == 55.0
+    # The flagged reading is newer but stays out of the latest view.
+    assert latest["Mongo-B"]["pm25"] == 20.0
+    docs = [row["doc"] for row in stages[-1]]
+    assert docs and all(set(doc) <= set(readings.SERIALIZE_PROJECTION) for doc in docs)
+
+
+def test_ingest_bulk_reports_partial_failure(mongo, client):
+    mongo["readings"].insert_one(_reading("Mongo-C", 60, _id="station-c-1"))
+    batch = [_reading("Mongo-C", 3), _reading("Mongo-C", 2, _id="station-c-1"), _reading("Mongo-C", 1)]
+    for row in batch:
+        row["timestamp"] = row["timestamp"].isoformat()
+
+    response = client.post("/api/ingest", json=batch)
+
+    body = response.get_json()
+    assert response.status_code == 201
+    assert len(body["inserted_ids"]) == 2
+    assert [error["index"] for error in body["errors"]] == [1]
+    # Unordered: the reading after the duplicate still landed.
+    assert mongo["readings"].count_documents({"city": "Mongo-C"}) == 3
+
+
+def test_single_ingest_rejected_as_conflict(mongo, client):
+    mongo["readings"].insert_one(_reading("Mongo-D", 60, _id="station-d-1"))
+    reading = _reading("Mongo-D", 1, _id="station-d-1")
+    reading["timestamp"] = reading["timestamp"].isoformat()
+
+    response = client.post("/api/ingest", json=reading)
+
+    assert response.status_code == 409
+    assert "error" in response.get_json()
+
+
+def test_sweep_ages_alerts_by_close_time(mongo):
+    now = datetime.utcnow()
+    retention = timedelta(seconds=db.alert_retention_seconds())
+    mongo["alerts"].insert_many([
+        # Open for a long time but closed recently: kept until its close time ages out.
+        {"city": "Sweep-A", "status": "closed", "timestamp": now - 3 * retention, "closed_at": now - retention / 2},
+        {"city": "Sweep-B", "status": "closed", "timestamp": now - 3 * retention, "closed_at": now - 2 * retention},
+        {"city": "Sweep-C", "status": "open", "timestamp": now - 3 * retention, "closed_at": None},
+    ])
+
+    assert alerts.sweep_alerts() == 1
+    assert sorted(doc["city"] for doc in mongo["alerts"].find()) == ["Sweep-A", "Sweep-C"]
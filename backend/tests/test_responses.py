@@ -0,0 +1,102 @@
+from __future__ import annotations
+
+import gzip
+
+import pytest
+
+from app.routes import api, responses
+from app.routes.responses import EncodedBody, ResponseCache, encoded_response
+from app.services import snapshot
+
+BODY = b'{"readings":[' + b",".join(b'{"city":"Cache-%d","pm25":%d}' % (index, index) for index in range(200)) + b"]}"
+
+
+def _decode(response) -> bytes:
+    encoding = response.headers.get("Content-Encoding")
+    if encoding == "gzip":
+        return gzip.decompress(response.get_data())
+    if encoding == "br":
+        return responses.brotli.decompress(response.get_data())
+    return response.get_data()
+
+
+@pytest.mark.parametrize(
+    "accept, expected",
+    [
+        (None, None),
+        ("identity", None),
+        ("gzip", "gzip"),
+        ("gzip;q=0.5, br", "br"),
+        ("br;q=0.5, gzip", "gzip"),
+        ("br, gzip", "br"),
+        ("*", "br"),
+        ("gzip;q=0", None),
+    ],
+)
+def test_encoding_follows_accept_encoding(app, accept, expected):
+    if expected == "br" and responses.brotli is None:
+        # Without brotli the best remaining offer is gzip.
+        expected = "gzip"
+    headers = {"Accept-Encoding": accept} if accept else {}
+    with app.test_request_context(headers=headers):
+        response = encoded_response(EncodedBody(BODY))
+
+    assert response.headers.get("Content-Encoding") == expected
+    assert _decode(response) == BODY
+    assert "Accept-Encoding" in response.headers["Vary"]
+
+
+def test_small_bodies_are_never_compressed(app):
+    with app.test_request_context(headers={"Accept-Encoding": "gzip"}):
+        response = encoded_response(EncodedBody(b"{}"))
+
+    assert "Content-Encoding" not in response.headers and response.get_data() == b"{}"
+
+
+def test_each_variant_is_compressed_once():
+    body = EncodedBody(BODY)
+
+    assert body.variant("gzip") is body.variant("gzip")
+    assert set(body.variants) == {"identity", "gzip"}
+
+
+def test_entries_are_reused_for_a_version_and_rebuilt_after_it_changes():
+    cache = ResponseCache(max_entries=2)
+    builds: list[str] = []
+
+    def build(label: str):
+        return lambda: builds.append(label) or label.encode("utf-8")
+
+    first = cache.get("latest", 1, build("v1"))
+    assert cache.get("latest", 1, build("again")) is first
+    assert cache.get("latest", 2, build("v2")).variants["identity"] == b"v2"
+    assert builds == ["v1", "v2"]
+
+
+def test_least_recently_used_entries_are_evicted():
+    cache = ResponseCache(max_entries=2)
+    for key in ("a", "b", "a", "c"):
+        cache.get(key, 1, lambda key=key: key.encode("utf-8"))
+    builds: list[str] = []
+
+    cache.get("a", 1, lambda: builds.append("a") or b"a")
+    cache.get("b", 1, lambda: builds.append("b") or b"b")
+
+    assert builds == ["b"]
+
+
+def test_latest_is_built_once_per_snapshot_version(client, monkeypatch):
+    calls: list[int | None] = []
+    build = api.latest_payload
+    monkeypatch.setattr(api, "latest_payload", lambda since=None: calls.append(since) or build(since))
+    # Cached entries from other tests must not hide the first build.
+    snapshot.bump("city", ["Cache-A"])
+
+    first = client.get("/api/latest", headers={"Accept-Encoding": "gzip"})
+    second = client.get("/api/latest")
+    assert len(calls) == 1
+    assert _decode(first) == second.get_data()
+
+    snapshot.bump("city", ["Cache-A"])
+    client.get("/api/latest")
+    assert len(calls) == 2
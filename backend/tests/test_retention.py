@@ -0,0 +1,82 @@
+from __future__ import annotations
+
+import logging
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.db import get_collection
+from app.services import retention
+from app.sqlite_db import SqliteCollection
+
+EXPIRED_PER_POLICY = 7
+
+
+@pytest.fixture
+def seeded(sqlite, monkeypatch):
+    """Expired and live documents for every policy, aged by that policy's own field"""
+    # Imported by name, so the fixture's patch of `db.get_client` does not reach compaction.
+    monkeypatch.setattr(retention, "get_client", lambda: sqlite)
+    monkeypatch.setattr(retention.settings, "retention_batch_size", 3)
+    monkeypatch.setattr(retention.settings, "retention_pause_seconds", 0)
+    now = datetime.utcnow()
+    for policy in retention.retention_policies():
+        cutoff = now - timedelta(days=policy.days)
+        ages = [cutoff - timedelta(days=1, minutes=minute) for minute in range(EXPIRED_PER_POLICY)]
+        ages += [cutoff + timedelta(days=1), now]
+        get_collection(policy.collection).insert_many([
+            {**policy.filter, policy.field: at, "expired": index < EXPIRED_PER_POLICY, "policy": policy.name}
+            for index, at in enumerate(ages)
+        ])
+    return retention.retention_policies()
+
+
+def _left(policy: retention.RetentionPolicy) -> list[bool]:
+    return [doc["expired"] for doc in get_collection(policy.collection).find({"policy": policy.name})]
+
+
+def test_only_expired_documents_are_removed_in_bounded_batches(seeded, monkeypatch):
+    batches: list[int] = []
+    delete_many = SqliteCollection.delete_many
+
+    def recorded(self, filter):
+        batches.append(len(filter["_id"]["$in"]))
+        return delete_many(self, filter)
+
+    monkeypatch.setattr(SqliteCollection, "delete_many", recorded)
+
+    removed = retention.enforce_retention()
+
+    assert {policy.name: removed[policy.name] for policy in seeded} == {policy.name: EXPIRED_PER_POLICY for policy in seeded}
+    assert all(_left(policy) == [False, False] for policy in seeded)
+    assert batches == [3, 3, 1] * len(seeded)
+    assert removed["compacted_bytes"] >= 0
+
+
+def test_a_run_stops_after_the_batch_limit_and_the_next_one_carries_on(seeded, monkeypatch):
+    monkeypatch.setattr(retention.settings, "retention_max_batches", 2)
+
+    first = retention.enforce_retention()
+    second = retention.enforce_retention()
+
+    assert all(first[policy.name] == 6 and second[policy.name] == 1 for policy in seeded)
+    assert all(_left(policy) == [False, False] for policy in seeded)
+
+
+def test_a_failing_policy_is_logged_and_the_others_still_run(seeded, monkeypatch, caplog):
+    expire = retention._expire
+
+    def failing(policy):
+        if policy.collection == "rollups":
+            raise ConnectionError("rollups unavailable")
+        return expire(policy)
+
+    monkeypatch.setattr(retention, "_expire", failing)
+
+    with caplog.at_level(logging.ERROR, logger=retention.__name__):
+        removed = retention.enforce_retention()
+
+    failed = sorted(policy.name for policy in seeded if policy.collection == "rollups")
+    assert sorted(record.getMessage().split()[2] for record in caplog.records) == failed
+    assert all("rollups unavailable" in record.exc_text for record in caplog.records)
+    assert all(removed[policy.name] == EXPIRED_PER_POLICY for policy in seeded if policy.collection != "rollups")
@@ -0,0 +1,112 @@
+from __future__ import annotations
+
+import math
+import random
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.services import rolling
+from app.services.rolling import NOWCAST_HOURS, NowCast, RollingWindow
+
+
+@pytest.mark.parametrize("size", [1, 3, 12])
+def test_window_matches_the_last_values_recomputed_from_scratch(size):
+    rng = random.Random(size)
+    window = RollingWindow(size)
+    values: list[float] = []
+    assert window.stats() is None
+
+    # Small integers repeat often, which is where monotonic deques go wrong.
+    for _ in range(200):
+        value = float(rng.choice([rng.randrange(5), rng.uniform(-50, 50)]))
+        window.push(value)
+        values.append(value)
+        last = values[-size:]
+        assert window.stats() == {
+            "mean": round(sum(last) / len(last), 2),
+            "min": round(min(last), 2),
+            "max": round(max(last), 2),
+            "count": len(last),
+        }
+
+
+def _epa_nowcast(readings: list[tuple[int, float]]) -> float | None:
+    """NowCast from scratch: hourly means for the newest reading's hour and the 11 before it"""
+    current = readings[-1][0]
+    hourly = []
+    for age in range(NOWCAST_HOURS):
+        values = [value for hour, value in readings if hour == current - age]
+        hourly.append(sum(values) / len(values) if values else None)
+    if sum(value is not None for value in hourly[:3]) < 2:
+        return None
+    valid = [value for value in hourly if value is not None]
+    weight = max(min(valid) / max(valid), 0.5) if max(valid) > 0 else 1.0
+    weights = [weight**age for age, value in enumerate(hourly) if value is not None]
+    return round(sum(w * value for w, value in zip(weights, valid)) / sum(weights), 2)
+
+
+@pytest.mark.parametrize("seed", range(6))
+def test_nowcast_matches_the_epa_formula_with_missing_hours(seed):
+    rng = random.Random(seed)
+    nowcast = NowCast()
+    readings: list[tuple[int, float]] = []
+    hour = 1000
+    for _ in range(300):
+        # Mostly the same or next hour, sometimes a gap of several hours or longer than the window.
+        hour += rng.choice([0, 0, 0, 1, 1, 2, 4, 15] if seed % 2 else [0, 1])
+        value = rng.uniform(0, 300) if rng.random() > 0.1 else 0.0
+        nowcast.push(hour, value)
+        readings.append((hour, value))
+        expected = _epa_nowcast(readings)
+        actual = nowcast.value()
+        assert actual == expected or math.isclose(actual, expected, abs_tol=0.011)
+
+
+def test_nowcast_weights_a_steady_series_evenly_and_a_rising_one_towards_now():
+    steady, rising = NowCast(), NowCast()
+    for hour in range(12):
+        steady.push(hour, 40.0)
+        rising.push(hour, 10.0 * (hour + 1))
+
+    assert steady.value() == 40.0
+    # Weight floors at 0.5: sum(0.5**i * (120 - 10 * i)) / sum(0.5**i) over 12 hours.
+    weights = [0.5**age for age in range(12)]
+    assert rising.value() == round(sum(w * (120 - 10 * age) for age, w in enumerate(weights)) / sum(weights), 2)
+
+
+def test_nowcast_needs_two_of_the_last_three_hours():
+    nowcast = NowCast()
+    nowcast.push(0, 30.0)
+    assert nowcast.value() is None
+    nowcast.push(2, 30.0)
+    assert nowcast.value() == 30.0
+    nowcast.push(5, 30.0)
+    assert nowcast.value() is None
+
+
+def _reading(city: str, minutes_ago: int, pm25: float) -> dict:
+    return {"city": city, "state": "Telangana", "pm25": pm25, "pm10": 20.0, "co2": 400.0, "no2": 5.0,
+            "timestamp": (datetime.utcnow() - timedelta(minutes=minutes_ago)).isoformat()}
+
+
+def test_the_first_reading_of_a_city_is_counted_once(client):
+    assert client.post("/api/ingest", json=_reading("Rolling-A", 1, 10.0)).status_code == 201
+
+    assert rolling.rolling_stats("Rolling-A")["pm25"] == {"mean": 10.0, "min": 10.0, "max": 10.0, "count": 1}
+
+
+def test_a_failed_seed_is_retried_rather_than_cached(client, monkeypatch):
+    for minutes_ago, pm25 in ((30, 10.0), (20, 20.0)):
+        assert client.post("/api/ingest", json=_reading("Rolling-B", minutes_ago, pm25)).status_code == 201
+    monkeypatch.delitem(rolling._cities, "Rolling-B")
+
+    def unavailable(name):
+        raise ConnectionError("store down")
+
+    with monkeypatch.context() as patch:
+        patch.setattr(rolling, "get_collection", unavailable)
+        assert rolling.rolling_stats("Rolling-B") is None
+    assert "Rolling-B" not in rolling._cities
+
+    assert rolling.rolling_stats("Rolling-B")["pm25"]["count"] == 2
@@ -0,0 +1,194 @@
+from __future__ import annotations
+
+import threading
+from datetime import datetime, timedelta
+
+import pandas as pd
+import pytest
+
+from app.config import get_settings
+from app.db import get_collection
+from app.services import rollups
+
+
+def _history(city: str, start: datetime, minutes: int) -> list[dict]:
+    return [
+        {
+            "city": city,
+            "timestamp": start + timedelta(minutes=minute),
+            "pm25": float(10 + minute % 17),
+            "pm10": float(40 + minute % 23),
+            "co2": 400.0,
+            "no2": float(minute % 5),
+        }
+        for minute in range(minutes)
+    ]
+
+
+def _expected(rows: list[dict], rule: str) -> pd.DataFrame:
+    frame = pd.DataFrame(rows).set_index("timestamp")
+    return frame["pm25"].resample(rule).agg(["count", "min", "max", "mean"]).query("count > 0")
+
+
+def test_backfill_buckets_match_resampled_history(monkeypatch):
+    # Small chunks make buckets straddle chunk boundaries.
+    monkeypatch.setattr(get_settings(), "training_chunk_size", 37)
+    start = datetime(2024, 3, 1, 22, 50)
+    rows = _history("Rollup-A", start, 200)
+    get_collection("readings").insert_many([dict(row) for row in rows])
+
+    assert rollups.backfill_rollups() >= 1
+    rollups.flush_rollups()
+
+    for resolution, rule in (("5m", "5min"), ("1h", "1h"), ("1d", "1D")):
+        buckets = rollups.get_rollups("Rollup-A", resolution, start - timedelta(days=1), start + timedelta(days=2))
+        expected = _expected(rows, rule)
+        assert [bucket["count"] for bucket in buckets] == expected["count"].tolist()
+        assert [bucket["start"] for bucket in buckets] == [stamp.isoformat() for stamp in expected.index]
+        assert [bucket["pm25"]["min"] for bucket in buckets] == expected["min"].tolist()
+        assert [bucket["pm25"]["max"] for bucket in buckets] == expected["max"].tolist()
+        assert [bucket["pm25"]["mean"] for bucket in buckets] == pytest.approx(expected["mean"].round(2).tolist())
+
+
+def test_backfill_is_idempotent_after_an_interrupted_attempt(monkeypatch):
+    start = datetime(2024, 3, 5)
+    rows = _history("Rollup-B", start, 120)
+    get_collection("readings").insert_many([dict(row) for row in rows])
+    cutoff = datetime.utcnow()
+    rollups._backfill("Rollup-B", cutoff)
+    rollups._backfill_cutoffs["Rollup-B"] = cutoff
+
+    rollups.backfill_rollups()
+
+    buckets = rollups.get_rollups("Rollup-B", "1h", start, start + timedelta(hours=3))
+    assert [bucket["count"] for bucket in buckets] == [60, 60]
+
+
+def test_ingest_never_backfills_and_backfill_counts_each_reading_once(client, monkeypatch):
+    def refuse(*args, **kwargs):
+        raise AssertionError("ingest must not backfill")
+
+    monkeypatch.setattr(rollups, "_backfill", refuse)
+    now = datetime.utcnow().replace(second=0, microsecond=0)
+    history = _history("Rollup-C", now - timedelta(minutes=30), 3)
+    for row in history:
+        row["timestamp"] = row["timestamp"].isoformat()
+
+    assert client.post("/api/ingest", json=history).status_code == 201
+    assert rollups.get_rollups("Rollup-C", "1d", now - timedelta(days=1), now + timedelta(days=1)) == []
+
+    monkeypatch.undo()
+    rollups.backfill_rollups()
+    later = _history("Rollup-C", now, 1)[0]
+    later["timestamp"] = later["timestamp"].isoformat()
+    assert client.post("/api/ingest", json=later).status_code == 201
+    rollups.flush_rollups()
+
+    buckets = rollups.get_rollups("Rollup-C", "1d", now - timedelta(days=1), now + timedelta(days=1))
+    assert sum(bucket["count"] for bucket in buckets) == 4
+
+
+@pytest.fixture
+def tracked(monkeypatch):
+    """Cities treated as already backfilled, so `observe` folds their readings in"""
+    cities: set[str] = set()
+    monkeypatch.setattr(rollups, "_backfilled", cities)
+    return cities
+
+
+def test_readings_land_in_the_bucket_containing_them(tracked):
+    tracked.add("Bucket-A")
+    edge = datetime(2024, 4, 2, 11, 0)
+    for timestamp in (edge - timedelta(microseconds=1), edge, edge + timedelta(minutes=4, seconds=59)):
+        rollups.observe({"city": "Bucket-A", "timestamp": timestamp, "pm25": 10.0})
+
+    five = rollups.get_rollups("Bucket-A", "5m", edge - timedelta(hours=1), edge + timedelta(hours=1))
+    hourly = rollups.get_rollups("Bucket-A", "1h", edge - timedelta(hours=1), edge + timedelta(hours=1))
+    daily = rollups.get_rollups("Bucket-A", "1d", edge - timedelta(days=1), edge + timedelta(days=1))
+
+    assert [(row["start"], row["count"]) for row in five] == [("2024-04-02T10:55:00", 1), ("2024-04-02T11:00:00", 2)]
+    assert [(row["start"], row["count"]) for row in hourly] == [("2024-04-02T10:00:00", 1), ("2024-04-02T11:00:00", 2)]
+    assert [(row["start"], row["count"]) for row in daily] == [("2024-04-02T00:00:00", 3)]
+
+
+def test_missing_values_count_the_reading_but_not_the_field(tracked):
+    tracked.add("Bucket-B")
+    start = datetime(2024, 4, 3, 6, 0)
+    rollups.observe({"city": "Bucket-B", "timestamp": start, "pm25": 12.0, "pm10": None})
+    rollups.observe({"city": "Bucket-B", "timestamp": start + timedelta(minutes=1), "pm25": 30.0, "pm10": 80.0})
+
+    (bucket,) = rollups.get_rollups("Bucket-B", "1h", start, start + timedelta(hours=1))
+
+    assert bucket["count"] == 2
+    assert bucket["pm25"] == {"min": 12.0, "max": 30.0, "mean": 21.0}
+    assert bucket["pm10"] == {"min": 80.0, "max": 80.0, "mean": 80.0}
+    assert bucket["co2"] is None
+
+
+def test_flushed_and_pending_deltas_merge_like_one_pass(tracked):
+    tracked.add("Bucket-C")
+    start = datetime(2024, 4, 4)
+    rows = _history("Bucket-C", start, 240)
+    for row in rows[:100]:
+        rollups.observe(row)
+    rollups.flush_rollups()
+    for row in rows[100:170]:
+        rollups.observe(row)
+    rollups.flush_rollups()
+    for row in rows[170:]:
+        rollups.observe(row)
+
+    buckets = rollups.get_rollups("Bucket-C", "1h", start, start + timedelta(hours=4))
+
+    expected = _expected(rows, "1h")
+    assert [bucket["count"] for bucket in buckets] == expected["count"].tolist()
+    assert [bucket["pm25"]["min"] for bucket in buckets] == expected["min"].tolist()
+    assert [bucket["pm25"]["max"] for bucket in buckets] == expected["max"].tolist()
+    assert [bucket["pm25"]["mean"] for bucket in buckets] == pytest.approx(expected["mean"].round(2).tolist())
+
+
+def test_a_failed_flush_keeps_its_deltas(tracked, monkeypatch):
+    tracked.add("Bucket-D")
+    start = datetime(2024, 4, 5)
+    for row in _history("Bucket-D", start, 30):
+        rollups.observe(row)
+
+    def unavailable(*args, **kwargs):
+        raise ConnectionError("store unavailable")
+
+    with monkeypatch.context() as patched:
+        patched.setattr(rollups, "_write", unavailable)
+        rollups.flush_rollups()
+    rollups.flush_rollups()
+
+    (bucket,) = rollups.get_rollups("Bucket-D", "1h", start, start + timedelta(hours=1))
+    assert bucket["count"] == 30
+
+
+def test_reads_during_a_flush_count_each_bucket_once(tracked, monkeypatch):
+    tracked.add("Bucket-E")
+    start = datetime(2024, 4, 6)
+    for row in _history("Bucket-E", start, 180):
+        rollups.observe(row)
+    window = (start, start + timedelta(hours=3))
+    write = rollups._write
+    readers: list[threading.Thread] = []
+    counts: list[int] = []
+
+    def write_then_read(*key):
+        write(*key)
+        # A reader arriving between two buckets' writes, while the rest are still unflushed.
+        reader = threading.Thread(
+            target=lambda: counts.append(sum(row["count"] for row in rollups.get_rollups("Bucket-E", "1h", *window)))
+        )
+        reader.start()
+        reader.join(timeout=0.01)
+        readers.append(reader)
+
+    monkeypatch.setattr(rollups, "_write", write_then_read)
+    rollups.flush_rollups()
+    for reader in readers:
+        reader.join(timeout=5)
+
+    assert counts and set(counts) == {180}
+    assert sum(row["count"] for row in rollups.get_rollups("Bucket-E", "1h", *window)) == 180
@@ -0,0 +1,132 @@
+from __future__ import annotations
+
+import copy
+from datetime import datetime, timedelta
+
+import pytest
+from pymongo import ASCENDING, DESCENDING
+from pymongo.errors import BulkWriteError
+
+from app.config import get_settings
+from app.db import get_collection
+from app.mock_db import MockCollection
+from app.sqlite_db import _MAX_IN_PARAMS, SqliteClient
+from tests.query_cases import START, documents, filters, ids
+
+
+def _plan(cursor) -> str:
+    sql, params, _, _ = cursor._sql()
+    rows = cursor._collection._connection().execute(f"EXPLAIN QUERY PLAN {sql}", params).fetchall()
+    return " | ".join(row[-1] for row in rows)
+
+
+def _rows(count: int, city: str = "Sqlite-A") -> list[dict]:
+    start = datetime(2024, 1, 1)
+    return [{"city": city, "timestamp": start + timedelta(minutes=minute % 50), "pm25": float(minute)} for minute in range(count)]
+
+
+def test_history_and_latest_sorts_come_from_the_index(sqlite):
+    readings = get_collection("readings")
+    readings.insert_many(_rows(10))
+
+    history = readings.find({"city": "Sqlite-A"}).sort("timestamp", DESCENDING).limit(5)
+    oldest = readings.find({"city": "Sqlite-A", "timestamp": {"$gte": datetime(2024, 1, 1)}}).sort("timestamp", ASCENDING)
+    recent = readings.find({}).sort("timestamp", DESCENDING).limit(5)
+
+    for cursor in (history, oldest, recent):
+        plan = _plan(cursor)
+        assert "USING INDEX" in plan and "TEMP B-TREE" not in plan
+
+
+def test_descending_sort_breaks_ties_newest_insert_first(sqlite):
+    readings = get_collection("readings")
+    readings.insert_many(_rows(100))
+
+    docs = list(readings.find({"city": "Sqlite-A"}).sort("timestamp", DESCENDING))
+
+    keys = [(doc["timestamp"], doc["pm25"]) for doc in docs]
+    assert keys == sorted(keys, reverse=True)
+
+
+def test_compact_reports_bytes_freed_and_never_a_negative(sqlite):
+    readings = get_collection("readings")
+    assert sqlite.compact() >= 0
+    readings.insert_many([{**row, "pad": "x" * 500} for row in _rows(5000)])
+    readings.delete_many({"city": "Sqlite-A"})
+
+    assert sqlite.compact() > 1_000_000
+    # Only the WAL written by the previous pass is left to fold back in.
+    assert sqlite.compact() < 65_536
+
+
+def test_ingest_with_a_duplicate_rejects_only_that_reading(sqlite, client):
+    get_collection("readings").insert_one({"_id": "sqlite-b-1", "city": "Sqlite-B", "timestamp": datetime(2024, 1, 1)})
+    batch = [{"city": "Sqlite-B", "pm25": float(minute), "timestamp": f"2024-01-02T00:0{minute}:00"} for minute in range(3)]
+    batch[1]["_id"] = "sqlite-b-1"
+
+    response = client.post("/api/ingest", json=batch)
+
+    body = response.get_json()
+    assert response.status_code == 201
+    assert len(body["inserted_ids"]) == 2
+    assert [error["index"] for error in body["errors"]] == [1]
+    assert get_collection("readings").count_documents({"city": "Sqlite-B"}) == 3
+
+
+def test_ordered_inserts_stop_at_the_first_duplicate(sqlite):
+    readings = get_collection("readings")
+    readings.insert_one({"_id": "dup", "city": "Sqlite-C"})
+    rows = _rows(5, city="Sqlite-C")
+    rows[2]["_id"] = "dup"
+
+    with pytest.raises(BulkWriteError) as raised:
+        readings.insert_many(rows)
+
+    assert [error["index"] for error in raised.value.details["writeErrors"]] == [2]
+    assert raised.value.details["nInserted"] == 2
+    assert readings.count_documents({"city": "Sqlite-C"}) == 3
+
+
+DOCS = documents()
+
+
+@pytest.fixture(scope="module")
+def stores(tmp_path_factory):
+    reference = MockCollection("readings", [])
+    reference.insert_many(copy.deepcopy(DOCS))
+    client = SqliteClient(tmp_path_factory.mktemp("parity") / "aerosense.db", batch_size=64)
+    stored = client[get_settings().mongo_db]["readings"]
+    stored.insert_many(copy.deepcopy(DOCS))
+    return reference, stored
+
+
+@pytest.mark.parametrize("filter", filters(DOCS), ids=repr)
+def test_filters_match_the_reference_store(stores, filter):
+    reference, stored = stores
+
+    assert ids(stored.find(filter)) == ids(reference.find(filter))
+    assert stored.count_documents(filter) == reference.count_documents(filter)
+    assert sorted(map(repr, stored.distinct("city", filter))) == sorted(map(repr, reference.distinct("city", filter)))
+
+
+def test_documents_come_back_unchanged(stores):
+    reference, stored = stores
+
+    assert sorted(stored.find({}), key=lambda doc: doc["_id"]) == sorted(reference.find({}), key=lambda doc: doc["_id"])
+
+
+def test_large_in_lists_fall_back_to_python_and_still_match(stores):
+    reference, stored = stores
+    wanted = {"_id": {"$in": [doc["_id"] for doc in DOCS[::2]] * 5}}
+    assert len(wanted["_id"]["$in"]) > _MAX_IN_PARAMS
+
+    assert ids(stored.find(wanted)) == ids(reference.find(wanted))
+
+
+def test_newest_first_with_a_limit_matches_the_reference(stores):
+    reference, stored = stores
+    filter = {"city": "Hyderabad", "timestamp": {"$gte": START}, "flagged": {"$ne": True}}
+
+    expected = [doc["_id"] for doc in reference.find(filter).sort("timestamp", -1).limit(10)]
+
+    assert [doc["_id"] for doc in stored.find(filter).sort("timestamp", -1).limit(10)] == expected
@@ -0,0 +1,57 @@
+from __future__ import annotations
+
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from app.services.stations import StationIndex, haversine_km
+
+
+def _reading(city: str, latitude: float, longitude: float, minute: int, pm25: float = 20.0) -> dict:
+    return {
+        "city": city,
+        "state": "Telangana",
+        "latitude": latitude,
+        "longitude": longitude,
+        "pm25": pm25,
+        "pm10": 40.0,
+        "co2": 400.0,
+        "no2": 10.0,
+        "timestamp": (datetime.utcnow().replace(microsecond=0) - timedelta(minutes=60 - minute)).isoformat(),
+    }
+
+
+def test_two_stations_in_one_city_are_both_found(client):
+    readings = [_reading("Twin", -40.0, -60.0, 1, pm25=11.0), _reading("Twin", -40.1, -60.1, 2, pm25=22.0)]
+    assert client.post("/api/ingest", json=readings).status_code == 201
+
+    found = client.get("/api/nearby", query_string={"lat": -40.0, "lon": -60.0, "radius_km": 50}).get_json()
+
+    assert [(row["latitude"], row["pm25"]) for row in found["readings"]] == [(-40.0, 11.0), (-40.1, 22.0)]
+    assert found["readings"][0]["distance_km"] == 0.0
+
+
+def test_flagged_readings_do_not_move_stations(client):
+    warmup = [_reading("Steady", -45.0, -65.0, minute, pm25=20.0 + minute % 3) for minute in range(40)]
+    assert client.post("/api/ingest", json=warmup).status_code == 201
+    spike = _reading("Steady", -47.0, -67.0, 45, pm25=5000.0)
+    assert client.post("/api/ingest", json=spike).get_json()["anomalies"][0] == "spike:pm25"
+
+    found = client.get("/api/nearby", query_string={"lat": -47.0, "lon": -67.0, "radius_km": 50}).get_json()
+    assert found["readings"] == []
+
+
+def test_radius_queries_match_brute_force_haversine():
+    rng = np.random.default_rng(7)
+    latitude, longitude = rng.uniform(15, 20, 300), rng.uniform(76, 82, 300)
+    index = StationIndex()
+    index.observe(
+        {"city": f"S{i}", "latitude": lat, "longitude": lon, "timestamp": "2024-01-01T00:00:00"}
+        for i, (lat, lon) in enumerate(zip(latitude, longitude))
+    )
+
+    found = index.nearest(17.4, 78.5, k=300, radius_km=120)
+
+    distances = haversine_km(17.4, 78.5, latitude, longitude)
+    assert sorted(reading["city"] for reading, _ in found) == sorted(f"S{i}" for i in np.flatnonzero(distances <= 120))
+    assert [distance for _, distance in found] == sorted(distance for _, distance in found)
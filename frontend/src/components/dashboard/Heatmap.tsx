@@ -1,14 +1,20 @@
-import { useMemo } from "react";
+import { useCallback, useMemo, useState } from "react";
 import {
   CircleMarker,
   GeoJSON,
   MapContainer,
   TileLayer,
   Tooltip,
+  useMap,
+  useMapEvents,
 } from "react-leaflet";
-import type { FeatureCollection } from "geojson";
+import type { Feature } from "geojson";
 import "leaflet/dist/leaflet.css";
 
+import {
+  useDistrictBoundaries,
+  useDistricts,
+} from "../../hooks/useAeroSenseData";
 import type { MapCity, MapData } from "../../types";
 import { Card } from "../ui/Card";
 
@@ -18,9 +24,54 @@ interface HeatmapProps {
 
 const DEFAULT_CENTER: [number, number] = [17.5, 79.5];
 
+function DistrictBoundaryLayer() {
+  const map = useMap();
+  const [zoom, setZoom] = useState(() => map.getZoom());
+  useMapEvents({ zoomend: () => setZoom(map.getZoom()) });
+  const { data } = useDistrictBoundaries(zoom);
+  const { data: districts } = useDistricts();
+
+  const colors = useMemo(
+    () =>
+      new Map(
+        (districts?.districts ?? []).map((district) => [
+          district.district,
+          district.color,
+        ]),
+      ),
+    [districts],
+  );
+
+  const style = useCallback(
+    (feature?: Feature) => {
+      const aqiColor = colors.get(feature?.properties?.district);
+      return {
+        color: "#1f2937",
+        weight: 1,
+        fillOpacity: aqiColor ? 0.35 : 0.05,
+        fillColor:
+          aqiColor ??
+          (feature?.properties?.state === "Telangana"
+            ? "rgba(96, 165, 250, 0.12)"
+            : "rgba(249, 115, 22, 0.12)"),
+      };
+    },
+    [colors],
+  );
+
+  if (!data) return null;
+  return (
+    // GeoJSON layers ignore new data, so remount when the variant changes.
+    <GeoJSON
+      key={data.hash}
+      data={data.collection}
+      style={style}
+    />
+  );
+}
+
 export function Heatmap({ data }: HeatmapProps) {
   const cities = data?.cities ?? [];
-  const geojson = data?.geojson as FeatureCollection | undefined;
 
   const center = useMemo(() => {
     if (!cities.length) return DEFAULT_CENTER;
@@ -44,20 +95,7 @@ export function Heatmap({ data }: HeatmapProps) {
           attribution='&copy; <a href="https://www.openstreetmap.org/">OpenStreetMap</a>'
           url="https://{s}.tile.openstreetmap.org/{z}/{x}/{y}.png"
         />
-        {geojson && (
-          <GeoJSON
-            data={geojson}
-            style={(feature) => ({
-              color: "#1f2937",
-              weight: 1,
-              fillOpacity: 0.05,
-              fillColor:
-                feature?.properties?.state === "Telangana"
-                  ? "rgba(96, 165, 250, 0.12)"
-                  : "rgba(249, 115, 22, 0.12)",
-            })}
-          />
-        )}
+        <DistrictBoundaryLayer />
         {cities.map((city: MapCity) => (
           <CircleMarker
             key={city.city}
@@ -1,7 +1,11 @@
-import { useQuery } from "@tanstack/react-query";
+import { useEffect, useState } from "react";
+import { useQuery, useQueryClient } from "@tanstack/react-query";
 
-import { fetcher } from "../lib/api";
+import { fetcher, STREAM_URL } from "../lib/api";
 import type {
+  BoundaryManifest,
+  DistrictBoundaries,
+  DistrictsPayload,
   LatestPayload,
   MapData,
   ForecastResponse,
@@ -11,11 +15,54 @@ import type {
 const FIVE_SECONDS = 5000;
 const ONE_MINUTE = 60000;
 
+function mergeDelta(current: LatestPayload, delta: LatestPayload): LatestPayload {
+  const cities = new Set(delta.readings.map((reading) => reading.city));
+  const alertCities = new Set(delta.alerts.map((alert) => alert.city));
+  return {
+    ...current,
+    updated_at: delta.updated_at,
+    readings: [
+      ...current.readings.filter((reading) => !cities.has(reading.city)),
+      ...delta.readings,
+    ],
+    alerts: [
+      ...delta.alerts,
+      ...current.alerts.filter((alert) => !alertCities.has(alert.city)),
+    ],
+  };
+}
+
 export function useLatest() {
+  const queryClient = useQueryClient();
+  const [streaming, setStreaming] = useState(false);
+
+  useEffect(() => {
+    if (!STREAM_URL) return;
+    // EventSource reconnects on its own and resumes via Last-Event-ID.
+    const source = new EventSource(STREAM_URL);
+    source.addEventListener("snapshot", (event) => {
+      queryClient.setQueryData<LatestPayload>(
+        ["latest"],
+        JSON.parse((event as MessageEvent<string>).data),
+      );
+    });
+    // Deltas carry only the cities whose readings or alerts changed since the previous event.
+    source.addEventListener("delta", (event) => {
+      const delta: LatestPayload = JSON.parse((event as MessageEvent<string>).data);
+      queryClient.setQueryData<LatestPayload>(["latest"], (current) =>
+        current ? mergeDelta(current, delta) : current,
+      );
+    });
+    source.onopen = () => setStreaming(true);
+    source.onerror = () => setStreaming(false);
+    return () => source.close();
+  }, [queryClient]);
+
   return useQuery<LatestPayload>({
     queryKey: ["latest"],
     queryFn: () => fetcher<LatestPayload>("/latest"),
-    refetchInterval: FIVE_SECONDS,
+    // Fall back to polling only while the stream is down.
+    refetchInterval: streaming ? false : FIVE_SECONDS,
     retry: 1,
     refetchOnWindowFocus: false,
   });
@@ -61,3 +108,45 @@ export function useMapData() {
   });
 }
 
+
+export function useDistricts() {
+  return useQuery<DistrictsPayload>({
+    queryKey: ["districts"],
+    queryFn: () => fetcher<DistrictsPayload>("/districts"),
+    refetchInterval: ONE_MINUTE,
+    retry: 1,
+  });
+}
+
+// Degrees spanned by one screen pixel at a Web Mercator zoom level.
+const degreesPerPixel = (zoom: number) => 360 / (256 * 2 ** zoom);
+
+export function useDistrictBoundaries(zoom: number) {
+  const manifest = useQuery<BoundaryManifest>({
+    queryKey: ["geojson"],
+    queryFn: () => fetcher<BoundaryManifest>("/geojson"),
+    staleTime: Infinity,
+    retry: 1,
+  });
+
+  // Levels are finest first; take the coarsest one that stays under a pixel.
+  const levels = manifest.data?.levels ?? [];
+  const fitting = levels.filter(
+    (level) => level.tolerance <= degreesPerPixel(zoom),
+  );
+  const level = fitting[fitting.length - 1] ?? levels[0];
+
+  return useQuery<DistrictBoundaries>({
+    queryKey: ["geojson", level?.hash],
+    enabled: Boolean(level),
+    queryFn: async () => ({
+      hash: level.hash,
+      collection: await fetcher<GeoJSON.FeatureCollection>(
+        `/geojson/${level.hash}.json`,
+      ),
+    }),
+    // Variants are content-addressed and never change.
+    staleTime: Infinity,
+    retry: 1,
+  });
+}
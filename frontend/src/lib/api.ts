@@ -19,6 +19,12 @@ const getApiUrl = () => {
 const API_BASE_URL = getApiUrl();
 const USE_MOCK_DATA = !API_BASE_URL || API_BASE_URL === "";
 
+// Server-Sent Events endpoint for live snapshots (null when running on mock data)
+export const STREAM_URL =
+  !USE_MOCK_DATA && typeof EventSource !== "undefined"
+    ? `${API_BASE_URL}/stream`
+    : null;
+
 export const apiClient = axios.create({
   baseURL: API_BASE_URL,
   timeout: 10000,
@@ -38,7 +44,15 @@ apiClient.interceptors.response.use(
 export const fetcher = async <T>(url: string): Promise<T> => {
   // If no API URL, use mock data
   if (USE_MOCK_DATA) {
-    const { getMockLatest, getMockHistory, getMockForecast, getMockMapData } = await import("./mockData");
+    const {
+      getMockLatest,
+      getMockHistory,
+      getMockForecast,
+      getMockMapData,
+      getMockDistricts,
+      getMockBoundaryManifest,
+      getMockBoundaries,
+    } = await import("./mockData");
     
     // Simulate network delay
     await new Promise((resolve) => setTimeout(resolve, 300));
@@ -60,6 +74,15 @@ export const fetcher = async <T>(url: string): Promise<T> => {
     if (url === "/mapdata") {
       return getMockMapData() as T;
     }
+    if (url === "/districts") {
+      return getMockDistricts() as T;
+    }
+    if (url === "/geojson") {
+      return getMockBoundaryManifest() as T;
+    }
+    if (url.startsWith("/geojson/")) {
+      return getMockBoundaries() as T;
+    }
     
     throw new Error(`Mock data not available for ${url}`);
   }
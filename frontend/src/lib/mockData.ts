@@ -1,4 +1,6 @@
 import type {
+  BoundaryManifest,
+  DistrictsPayload,
   LatestPayload,
   MapData,
   ForecastResponse,
@@ -245,12 +247,27 @@ export function getMockMapData(): MapData {
   }));
 
   return {
+    version: 0,
     updated_at: new Date().toISOString(),
     cities,
-    geojson: {
-      type: "FeatureCollection",
-      features: [],
-    },
   };
 }
 
+// Mock district aggregates (no boundaries to colour)
+export function getMockDistricts(): DistrictsPayload {
+  return { version: 0, districts: [] };
+}
+
+// Mock district boundaries (a single empty level)
+export function getMockBoundaryManifest(): BoundaryManifest {
+  return {
+    levels: [
+      { level: 0, tolerance: 0, hash: "mock", bytes: 0, url: "/geojson/mock.json" },
+    ],
+  };
+}
+
+export function getMockBoundaries(): GeoJSON.FeatureCollection {
+  return { type: "FeatureCollection", features: [] };
+}
+
@@ -103,8 +103,41 @@ export interface MapCity {
 }
 
 export interface MapData {
+  version: number;
   updated_at: string;
   cities: MapCity[];
-  geojson: GeoJSON.FeatureCollection;
+}
+
+export interface DistrictSummary {
+  district: string;
+  state: string | null;
+  aqi: number | null;
+  max_aqi: number | null;
+  stations: number;
+  category: string | null;
+  color: string | null;
+  updated_at: string | null;
+}
+
+export interface DistrictsPayload {
+  version: number;
+  districts: DistrictSummary[];
+}
+
+export interface BoundaryLevel {
+  level: number;
+  tolerance: number;
+  hash: string;
+  bytes: number;
+  url: string;
+}
+
+export interface BoundaryManifest {
+  levels: BoundaryLevel[];
+}
+
+export interface DistrictBoundaries {
+  hash: string;
+  collection: GeoJSON.FeatureCollection;
 }
 